@@ -0,0 +1,672 @@
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+import uuid
+import requests
+from .callback_receiver import CallbackReceiver
+from .config import MTNMoMoConfig
+from .deadline import Deadline
+from .exceptions import TimeoutException
+from .instrumentation import Instrumentation, MetricsCollector
+from .ledger import SQLiteLedger
+from .models import Transaction, TransactionTable
+from .mtn_momo_collection import MTNMoMoCollection
+from .mtn_momo_collection_async import AsyncMTNMoMoCollection
+from .mtn_momo_disbursement import MTNMoMoDisbursement
+from .payout import BulkPayout
+from .requestss import BaseTransport, RequestTemplate, Transport
+from .resilience import HedgingTransport
+from .stub_server import StubHandler, StubServer
+from .tenant_registry import TenantRegistry
+from .token_manager import TokenCache, TokenManager
+from .token_store import MemoryTokenStore
+from .utilities import Helpers
+
+class UnpooledTransport(Transport):
+    """
+    A Transport that opens a fresh connection for every call, matching the behaviour of the
+    module-level requests.get/requests.post helpers. Only used as a benchmark baseline.
+    """
+
+    def send(self, method, url, headers, body=None):
+        return requests.request(method, url, headers=headers, json=body, timeout=self.timeout)
+
+
+class NullTransport(BaseTransport):
+    """
+    A Transport answering every request locally with a canned JSON response, used to measure
+    the client-side overhead of a call without any network I/O.
+    """
+
+    def send(self, method, url, headers, body=None):
+        response = requests.Response()
+        response.status_code = 202 if method == 'POST' and not url.endswith('/token/') else 200
+        response.headers['Content-Type'] = 'application/json'
+        response._content = b'{"access_token": "null-token", "expires_in": 3600, "availableBalance": "0", "currency": "EUR"}'
+        return response
+
+
+class UncompiledTemplates:
+    """
+    Builds the request template of an operation from the configuration on every lookup.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def __getitem__(self, operation):
+        client = self.client
+        return RequestTemplate(client.get_url() + client.OPERATIONS[operation], {
+            "Ocp-Apim-Subscription-Key": client.config.collection['primary_key'],
+            "X-Target-Environment": client.config.target,
+            'Content-Type': 'application/json'
+        })
+
+
+class UncompiledCollection(MTNMoMoCollection):
+    """
+    A collection client that rebuilds its URLs and headers and looks its token cache key up on
+    every call, as clients did before request templates. Only used as a benchmark baseline.
+    """
+
+    def compile_templates(self):
+        self.templates = UncompiledTemplates(self)
+        self.token_key = self.token_request = None
+
+
+def bench_transport(transport, url, count):
+    """
+    Sends `count` sequential GET requests and measures the throughput.
+
+    :param transport: The Transport to exercise.
+    :param url: The URL to request.
+    :param count: The number of requests to send.
+    :return: The number of requests per second.
+    """
+
+    headers = {'Content-Type': 'application/json'}
+    start = time.perf_counter()
+    for _ in range(count):
+        transport.get(url, headers)
+    return count / (time.perf_counter() - start)
+
+
+def _token_worker(host, token_dir, duration):
+    os.environ['RA_BASE_URL'] = host
+    config = MTNMoMoConfig()
+    token_manager = TokenManager(token_dir, transport=Transport(), cache=TokenCache(), refresh_ahead=0)
+
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        token_manager.get_token(config, 'collection')
+        time.sleep(0.001)
+
+
+def stress_token_store(processes=8, duration=5.0, expires_in=1):
+    """
+    Spawns processes sharing one FileTokenStore that all request tokens in a tight loop, and
+    counts the token fetches received by the stub server.
+
+    :param processes: The number of worker processes.
+    :param duration: Seconds each worker keeps requesting tokens.
+    :param expires_in: The token lifetime, in seconds, announced by the stub server.
+    :return: A tuple (fetches, windows) of the token fetches observed and the expiry windows elapsed.
+    """
+
+    handler = type('ShortLivedTokenHandler', (StubHandler,), {'token_expires_in': expires_in})
+
+    with StubServer(handler=handler) as server, tempfile.TemporaryDirectory() as token_dir:
+        workers = [
+            multiprocessing.Process(target=_token_worker, args=(server.host, token_dir, duration))
+            for _ in range(processes)
+        ]
+        start = time.monotonic()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.monotonic() - start
+
+        return server.counts[('POST', '/token/')], math.ceil(elapsed / expires_in)
+
+
+async def bench_async_collection(host, count, concurrency):
+    """
+    Runs `count` request-to-pay calls concurrently on one event loop.
+
+    :param host: The base URL of the stub server.
+    :param count: The number of transactions to create.
+    :param concurrency: The client's maximum number of calls in flight.
+    :return: The number of requests per second.
+    """
+
+    os.environ['RA_BASE_URL'] = host
+    params = {'amount': '100', 'referenceExternalID': '1', 'numberMoMo': '46733123450', 'description': 'bench', 'note': 'bench'}
+
+    with tempfile.TemporaryDirectory() as token_dir:
+        token_manager = TokenManager(token_dir, cache=TokenCache())
+        async with AsyncMTNMoMoCollection(MTNMoMoConfig(), token_manager=token_manager, max_concurrency=concurrency) as client:
+            start = time.perf_counter()
+            await asyncio.gather(*(client.create_transaction(params) for _ in range(count)))
+            return count / (time.perf_counter() - start)
+
+
+async def bench_callbacks(count, concurrency):
+    """
+    Posts `count` distinct callbacks to a local CallbackReceiver and waits until all are dispatched.
+
+    :param count: The number of callbacks to send.
+    :param concurrency: The number of keep-alive client connections sending them.
+    :return: The number of callbacks dispatched per second.
+    """
+
+    async def sender(url, references):
+        reader, writer = await asyncio.open_connection(*url)
+        for reference_id in references:
+            body = json.dumps({'referenceId': reference_id, 'status': 'SUCCESSFUL'}).encode()
+            writer.write(
+                f"PUT /callback HTTP/1.1\r\nHost: {url[0]}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+            while (await reader.readline()) not in (b'\r\n', b''):
+                pass
+        writer.close()
+
+    received = asyncio.Event()
+    dispatched = 0
+
+    async def handler(event):
+        nonlocal dispatched
+        dispatched += 1
+        if dispatched == count:
+            received.set()
+
+    async with CallbackReceiver('127.0.0.1', 0) as receiver:
+        receiver.add_handler(handler)
+        address = receiver.server.sockets[0].getsockname()[:2]
+
+        start = time.perf_counter()
+        await asyncio.gather(*(sender(address, [f"{i}-{n}" for n in range(i, count, concurrency)]) for i in range(concurrency)))
+        await received.wait()
+        return count / (time.perf_counter() - start)
+
+
+def bench_tenants(tenant_count, calls):
+    """
+    Measures the per-call overhead of looking up a tenant's client and calling get_account_balance.
+
+    :param tenant_count: The number of registered tenants.
+    :param calls: The number of calls, spread randomly over the tenants.
+    :return: The mean overhead per call, in microseconds.
+    """
+
+    registry = TenantRegistry(transport=NullTransport(), store=MemoryTokenStore())
+    tenant_ids = [f"merchant-{i}" for i in range(tenant_count)]
+    for tenant_id in tenant_ids:
+        registry.register(tenant_id, host='http://localhost/', collection={'user_id': tenant_id})
+        registry.get(tenant_id).get_account_balance()
+
+    picks = [random.choice(tenant_ids) for _ in range(calls)]
+    start = time.perf_counter()
+    for tenant_id in picks:
+        registry.get(tenant_id).get_account_balance()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def bench_payout(host, count, concurrency):
+    """
+    Pays `count` transfers out against the stub, checkpointed in an SQLite ledger.
+
+    :return: The BulkPayout statistics of the run.
+    """
+
+    directory = tempfile.mkdtemp()
+    config = MTNMoMoConfig(host=host, token_dir=directory, disbursement={'api_key_secret': 'bench', 'primary_key': 'bench', 'user_id': 'bench'})
+    transfers = (dict(PARAMS, referenceExternalID=str(i)) for i in range(count))
+
+    with SQLiteLedger(os.path.join(directory, 'payout.ledger')) as ledger:
+        payout = BulkPayout(MTNMoMoDisbursement(config, ledger=ledger), concurrency)
+        for _ in payout.run(transfers):
+            pass
+    return payout.stats()
+
+
+def bench_instrumentation(calls):
+    """
+    Measures the cost of the instrumentation on get_account_balance over a NullTransport, with no
+    hook registered, with a no-op hook and with a MetricsCollector.
+
+    :param calls: The number of calls per mode.
+    :return: A dictionary mapping each mode to the mean time per call, in microseconds.
+    """
+
+    config = MTNMoMoConfig(host='http://localhost/', token_dir=tempfile.mkdtemp())
+    transport = NullTransport()
+    client = MTNMoMoCollection(config, transport=transport, token_manager=TokenManager(transport=transport, cache=TokenCache(), store=MemoryTokenStore()))
+    client.get_account_balance()
+
+    def measure():
+        start = time.perf_counter()
+        for _ in range(calls):
+            client.get_account_balance()
+        return (time.perf_counter() - start) / calls * 1e6
+
+    # Modes are measured in turns and the best round is kept, to even out machine noise.
+    modes = {'disabled': None, 'no-op hook': lambda event, info: None, 'collector': MetricsCollector()}
+    results = dict.fromkeys(modes, float('inf'))
+    for _ in range(5):
+        for mode, hook in modes.items():
+            if hook is not None:
+                Instrumentation.add_hook(hook)
+            try:
+                results[mode] = min(results[mode], measure())
+            finally:
+                if hook is not None:
+                    Instrumentation.remove_hook(hook)
+    return results
+
+
+def bench_templates(calls):
+    """
+    Measures the client-side CPU cost per call of the collection operations over a
+    NullTransport, with precompiled request templates and with the uncompiled baseline.
+
+    :param calls: The number of calls per operation and mode.
+    :return: A list of (operation, uncompiled, compiled) tuples, in microseconds per call.
+    """
+
+    config = MTNMoMoConfig(host='http://localhost/', token_dir=tempfile.mkdtemp())
+    transport = NullTransport()
+    clients = {}
+    for mode, client_class in (('uncompiled', UncompiledCollection), ('compiled', MTNMoMoCollection)):
+        token_manager = TokenManager(transport=transport, cache=TokenCache(), store=MemoryTokenStore())
+        clients[mode] = client_class(config, transport=transport, token_manager=token_manager)
+        clients[mode].get_token()
+
+    operations = {
+        'create_transaction': lambda client: client.create_transaction(PARAMS),
+        'get_transaction': lambda client: client.get_transaction('00000000-0000-0000-0000-000000000000'),
+        'get_account_balance': lambda client: client.get_account_balance(),
+        'get_basic_user_info': lambda client: client.get_basic_user_info('46733123450')
+    }
+
+    def measure(call, client):
+        start = time.perf_counter()
+        for _ in range(calls):
+            call(client)
+        return (time.perf_counter() - start) / calls * 1e6
+
+    results = []
+    for name, call in operations.items():
+        # Modes are measured in turns and the best round is kept, to even out machine noise.
+        best = dict.fromkeys(clients, float('inf'))
+        for _ in range(5):
+            for mode, client in clients.items():
+                best[mode] = min(best[mode], measure(call, client))
+        results.append((name, best['uncompiled'], best['compiled']))
+    return results
+
+
+def bench_hedging(host, count, concurrency, budget):
+    """
+    Calls get_transaction `count` times against a stub answering some requests late, without
+    and with a HedgingTransport.
+
+    :param budget: The hedging budget, as a fraction of the requests.
+    :return: A list of (mode, summary, hedging stats) tuples; the stats are None without hedging.
+    """
+
+    results = []
+    for mode in ('plain', 'hedged'):
+        # A HedgingTransport leaves the transport it wraps open, so both are closed.
+        with Transport(pool_maxsize=2 * concurrency) as pooled:
+            transport = HedgingTransport(pooled, budget=budget, max_workers=2 * concurrency) if mode == 'hedged' else pooled
+            with transport:
+                config = MTNMoMoConfig(host=host, token_dir=tempfile.mkdtemp())
+                client = MTNMoMoCollection(config, transport=transport)
+                references = [client.create_transaction(PARAMS)['transactionId'] for _ in range(10)]
+                summary = run_sync(lambda i: client.get_transaction(references[i % len(references)]), count, concurrency)
+                results.append((mode, summary, transport.stats() if mode == 'hedged' else None))
+    return results
+
+
+def bench_deadlines(host, count, concurrency, timeout):
+    """
+    Calls get_account_balance `count` times against a slow stub under a per-call deadline.
+
+    :param timeout: The per-call deadline, in seconds.
+    :return: A tuple (summary, timeouts, slowest), where slowest is the longest call in seconds.
+    """
+
+    config = MTNMoMoConfig(host=host, token_dir=tempfile.mkdtemp())
+    client = MTNMoMoCollection(config, timeout=timeout, token_manager=TokenManager(config.token_dir, cache=TokenCache()))
+    with Deadline(30):
+        client.get_token()
+
+    latencies = []
+    timeouts = 0
+
+    def call(i):
+        start = time.perf_counter()
+        try:
+            client.get_account_balance()
+            return time.perf_counter() - start, False
+        except TimeoutException:
+            return time.perf_counter() - start, True
+
+    start = time.perf_counter()
+    for _, future in Helpers.imap_unordered(call, range(count), concurrency):
+        latency, timed_out = future.result()
+        latencies.append(latency)
+        timeouts += timed_out
+    return summarize(latencies, time.perf_counter() - start, timeouts), timeouts, max(latencies)
+
+
+PARAMS = {'amount': '100', 'referenceExternalID': '1', 'numberMoMo': '46733123450', 'description': 'bench', 'note': 'bench'}
+
+
+def summarize(latencies, elapsed, errors=0):
+    """
+    Summarizes a run.
+
+    :param latencies: The latency of every call, in seconds.
+    :param elapsed: The wall-clock duration of the run, in seconds.
+    :param errors: The number of calls that raised.
+    :return: A dictionary with 'count', 'errors', 'rps', and the 'p50', 'p95' and 'p99' latencies in milliseconds.
+    """
+
+    latencies = sorted(latencies)
+
+    def percentile(p):
+        if not latencies:
+            return 0.0
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000
+
+    count = len(latencies)
+    return {
+        'count': count,
+        'errors': errors,
+        'rps': count / elapsed if elapsed else 0.0,
+        'p50': percentile(50),
+        'p95': percentile(95),
+        'p99': percentile(99)
+    }
+
+
+def collection_operations(client, references):
+    """
+    Returns the benchmarked operations of a collection client, keyed by name. Each operation
+    takes the call index; created transaction IDs are appended to `references`.
+    """
+
+    def create_transaction(i):
+        result = client.create_transaction(PARAMS)
+        references.append(result['transactionId'])
+        return result
+
+    return {
+        'create_transaction': create_transaction,
+        'get_transaction': lambda i: client.get_transaction(references[i % len(references)]),
+        'get_account_balance': lambda i: client.get_account_balance(),
+        'get_basic_user_info': lambda i: client.get_basic_user_info(PARAMS['numberMoMo'])
+    }
+
+
+def run_sync(operation, count, concurrency=1):
+    """
+    Calls a synchronous operation `count` times, sequentially or from a thread pool.
+    """
+
+    latencies = []
+    errors = 0
+
+    def timed(i):
+        start = time.perf_counter()
+        operation(i)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _, future in Helpers.imap_unordered(timed, range(count), concurrency):
+        if future.exception() is not None:
+            errors += 1
+        else:
+            latencies.append(future.result())
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+
+async def run_async(operation, count):
+    """
+    Awaits an asynchronous operation `count` times concurrently; the client bounds the concurrency.
+    """
+
+    async def timed(i):
+        start = time.perf_counter()
+        await operation(i)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(timed(i) for i in range(count)), return_exceptions=True)
+    latencies = [result for result in results if not isinstance(result, BaseException)]
+    return summarize(latencies, time.perf_counter() - start, len(results) - len(latencies))
+
+
+def bench_models(records, sample=100000):
+    """
+    Measures the memory held by `records` get_transaction responses kept for reporting: as the
+    decoded dictionaries keyed by reference ID, as parsed Transaction models keyed by reference
+    ID, and in a TransactionTable.
+
+    Tracing allocations slows loading down several times, so the memory is traced while loading
+    the first `sample` records only and the load time is measured untraced over all of them.
+
+    :param records: The number of transactions.
+    :param sample: The number of transactions whose memory is traced.
+    :return: A dictionary mapping each mode to a tuple (bytes per record, seconds to load).
+    """
+
+    def responses(records):
+        for i in range(records):
+            reference_id = str(uuid.UUID(int=i))
+            body = json.dumps({
+                'amount': str(100 + i % 900), 'currency': 'EUR', 'financialTransactionId': str(10 ** 9 + i),
+                'externalId': f"order-{i}", 'payer': {'partyIdType': 'MSISDN', 'partyId': f"46733{i:07d}"},
+                'payerMessage': 'Payment', 'payeeNote': 'Thank you', 'status': ('SUCCESSFUL', 'FAILED', 'PENDING')[i % 3]
+            }).encode()
+            yield reference_id, body
+
+    def dictionaries(records):
+        return {reference_id: json.loads(body) for reference_id, body in responses(records)}
+
+    def models(records):
+        transactions = {}
+        for reference_id, body in responses(records):
+            transaction = transactions[reference_id] = Transaction(body)
+            transaction.status
+        return transactions
+
+    def table(records):
+        transactions = TransactionTable()
+        for reference_id, body in responses(records):
+            transactions.append(reference_id, Transaction(body))
+        return transactions
+
+    results = {}
+    for mode, load in (('dict', dictionaries), ('model', models), ('table', table)):
+        sample = min(sample, records)
+        tracemalloc.start()
+        held = load(sample)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del held
+
+        start = time.perf_counter()
+        held = load(records)
+        elapsed = time.perf_counter() - start
+        del held
+        results[mode] = (size / sample, elapsed)
+    return results
+
+
+def bench_operations(host, count, concurrency):
+    """
+    Benchmarks every MTNMoMoCollection operation sequentially, from a thread pool, and with
+    AsyncMTNMoMoCollection.
+
+    :param host: The base URL of the stub server.
+    :param count: The number of calls per operation and mode.
+    :param concurrency: The number of calls in flight in the concurrent modes.
+    :return: A list of (mode, operation, summary) tuples.
+    """
+
+    os.environ['RA_BASE_URL'] = host
+    results = []
+
+    with tempfile.TemporaryDirectory() as token_dir:
+        for mode, workers in (('sync', 1), ('threads', concurrency)):
+            with Transport(pool_maxsize=workers) as transport:
+                token_manager = TokenManager(token_dir, transport=transport, cache=TokenCache())
+                client = MTNMoMoCollection(MTNMoMoConfig(), transport=transport, token_manager=token_manager)
+                references = []
+                for name, operation in collection_operations(client, references).items():
+                    results.append((mode, name, run_sync(operation, count, workers)))
+
+        async def run_all():
+            token_manager = TokenManager(token_dir, cache=TokenCache())
+            async with AsyncMTNMoMoCollection(MTNMoMoConfig(), token_manager=token_manager, max_concurrency=concurrency) as client:
+                references = []
+
+                async def create_transaction(i):
+                    result = await client.create_transaction(PARAMS)
+                    references.append(result['transactionId'])
+
+                operations = {
+                    'create_transaction': create_transaction,
+                    'get_transaction': lambda i: client.get_transaction(references[i % len(references)]),
+                    'get_account_balance': lambda i: client.get_account_balance(),
+                    'get_basic_user_info': lambda i: client.get_basic_user_info(PARAMS['numberMoMo'])
+                }
+                for name, operation in operations.items():
+                    results.append(('async', name, await run_async(operation, count)))
+
+        asyncio.run(run_all())
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the MTN MoMo client against a local stub server')
+    parser.add_argument('suite', nargs='?', default='operations', choices=['operations', 'transport', 'tokens', 'async', 'callbacks', 'tenants', 'payout', 'instrumentation', 'deadlines', 'models', 'templates', 'hedging'], help='Benchmark to run')
+    parser.add_argument('--count', type=int, default=1000, help='Number of requests per run')
+    parser.add_argument('--processes', type=int, default=8, help='Number of processes for the tokens suite')
+    parser.add_argument('--concurrency', type=int, default=100, help='Calls in flight for the concurrent modes')
+    parser.add_argument('--latency', type=float, default=0.0, help='Stub server latency, in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of stub responses answered with 500')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Stub server random extra latency, in seconds')
+    parser.add_argument('--timeout', type=float, default=0.5, help='Per-call deadline for the deadlines suite, in seconds')
+    parser.add_argument('--budget', type=float, default=15.0, help='Maximum collector overhead per call, in microseconds')
+    parser.add_argument('--records', type=int, default=1000000, help='Transactions held in memory for the models suite')
+    parser.add_argument('--slow-rate', type=float, default=0.02, help='Fraction of stub responses answered late, for the hedging suite')
+    parser.add_argument('--slow-latency', type=float, default=0.5, help='Seconds added to the late stub responses')
+    parser.add_argument('--hedge-budget', type=float, default=0.05, help='Fraction of the requests that may be hedged')
+    args = parser.parse_args()
+
+    if args.suite == 'hedging':
+        with StubServer(latency=args.latency, jitter=args.jitter, slow_rate=args.slow_rate, slow_latency=args.slow_latency) as server:
+            results = bench_hedging(server.host, args.count, args.concurrency, args.hedge_budget)
+
+        print(f"{'mode':<8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for mode, summary, stats in results:
+            print(f"{mode:<8} {summary['rps']:>8.0f} {summary['p50']:>8.2f} {summary['p95']:>8.2f} {summary['p99']:>8.2f} {summary['errors']:>7}")
+        stats = results[-1][2]
+        print(f"{stats['hedged']} of {stats['requests']} reads hedged ({stats['hedge_rate']:.1%}), {stats['hedge_wins']} won, "
+              f"saving {stats['saved']:.1f} ms each ({stats['saved_total']:.2f}s in total)")
+        return
+
+    if args.suite == 'templates':
+        print(f"{'operation':<20} {'uncompiled us':>14} {'compiled us':>12} {'saved':>7}")
+        for name, uncompiled, compiled in bench_templates(args.count):
+            print(f"{name:<20} {uncompiled:>14.1f} {compiled:>12.1f} {1 - compiled / uncompiled:>7.0%}")
+        return
+
+    if args.suite == 'models':
+        results = bench_models(args.records)
+        for mode, (per_record, elapsed) in results.items():
+            print(f"{mode:<6} {per_record:>7.0f} bytes per record, {per_record * 1e6 / 2 ** 20:>7.0f} MiB per 1M ({results['dict'][0] / per_record:.1f}x smaller), loaded in {elapsed:.1f}s")
+        return
+
+    if args.suite == 'instrumentation':
+        results = bench_instrumentation(args.count)
+        for mode, per_call in results.items():
+            print(f"{mode:<12} {per_call:>8.1f} us per call (+{per_call - results['disabled']:.1f})")
+        if results['collector'] - results['disabled'] > args.budget:
+            raise SystemExit(f"Instrumentation overhead above the {args.budget} us budget")
+        return
+
+    if args.suite == 'deadlines':
+        with StubServer(latency=args.latency, jitter=args.jitter) as server:
+            summary, timeouts, slowest = bench_deadlines(server.host, args.count, args.concurrency, args.timeout)
+        print(f"{summary['count']} calls, {timeouts} timed out: p50 {summary['p50']:.1f} ms, p99 {summary['p99']:.1f} ms, max {slowest * 1000:.1f} ms")
+        if slowest > args.timeout * 1.2 + 0.05:
+            raise SystemExit(f"A call outlived its {args.timeout}s deadline")
+        return
+
+    if args.suite == 'operations':
+        with StubServer(latency=args.latency, error_rate=args.error_rate) as server:
+            results = bench_operations(server.host, args.count, args.concurrency)
+
+        print(f"{'mode':<8} {'operation':<20} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for mode, name, summary in results:
+            print(f"{mode:<8} {name:<20} {summary['rps']:>8.0f} {summary['p50']:>8.2f} {summary['p95']:>8.2f} {summary['p99']:>8.2f} {summary['errors']:>7}")
+        return
+
+    if args.suite == 'payout':
+        with StubServer(latency=args.latency, error_rate=args.error_rate) as server:
+            stats = bench_payout(server.host, args.count, args.concurrency)
+        print(f"{stats['sent']} transfers paid out in {stats['elapsed']:.2f}s: {stats['throughput']:.0f} transfers/s, {stats['failed']} failed")
+        return
+
+    if args.suite == 'tenants':
+        for tenant_count in (1, 10, 100, 1000, 10000):
+            overhead = bench_tenants(tenant_count, args.count)
+            print(f"{tenant_count:>6} tenants: {overhead:.1f} us per call")
+        return
+
+    if args.suite == 'callbacks':
+        rate = asyncio.run(bench_callbacks(args.count, args.concurrency))
+        print(f"{args.count} callbacks received and dispatched: {rate:.0f} callbacks/s")
+        return
+
+    if args.suite == 'async':
+        with StubServer() as server:
+            rate = asyncio.run(bench_async_collection(server.host, args.count, args.concurrency))
+        print(f"{args.count} concurrent request-to-pay calls: {rate:.0f} req/s")
+        return
+
+    if args.suite == 'tokens':
+        fetches, windows = stress_token_store(args.processes)
+        print(f"{args.processes} processes: {fetches} token fetches over {windows} expiry windows")
+        if fetches > windows:
+            raise SystemExit("More than one token fetch per expiry window")
+        return
+
+    with StubServer() as server:
+        url = f"{server.host}collection/v1_0/account/balance"
+
+        with UnpooledTransport() as transport:
+            unpooled = bench_transport(transport, url, args.count)
+        with Transport() as transport:
+            pooled = bench_transport(transport, url, args.count)
+
+    print(f"Without pooling: {unpooled:.0f} req/s")
+    print(f"With pooling:    {pooled:.0f} req/s ({pooled / unpooled:.1f}x)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from .deadline import Deadline
+from .exceptions import TimeoutException
+
+def _fresh(error):
+    """
+    Returns a new instance of a cached failure, with the same type, arguments and attributes but
+    no traceback. Raising the cached instance itself would grow its traceback on every hit and
+    share it between the threads raising it.
+    """
+
+    try:
+        return copy.copy(error)
+    except Exception:
+        return error.with_traceback(None)
+
+
+class _Flight:
+    """
+    A load in progress that concurrent callers of the same key wait on.
+    """
+
+    __slots__ = ('event', 'value', 'error', 'generation')
+
+    def __init__(self, generation):
+        self.event = threading.Event()
+        self.generation = generation
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    A thread-safe, size-bounded LRU cache whose entries expire after a time-to-live.
+
+    Failures raised as one of `negative_exceptions` are cached too, for `negative_ttl` seconds,
+    and a fresh copy of them is raised on each hit. Concurrent misses of the same key are coalesced into a single load.
+    """
+
+    def __init__(self, maxsize=10000, ttl=300.0, negative_ttl=60.0, negative_exceptions=()):
+        """
+        :param maxsize: The maximum number of entries kept; the least recently used entry is evicted first.
+        :param ttl: Seconds a loaded value is served from the cache.
+        :param negative_ttl: Seconds a cached failure is re-raised without loading again.
+        :param negative_exceptions: The exception types whose failures are cached.
+        """
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.negative_exceptions = tuple(negative_exceptions)
+        self.entries = OrderedDict()
+        self.flights = {}
+        self.generation = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def stats(self):
+        """
+        Returns a snapshot of the cache counters.
+
+        :return: A dictionary with 'size', 'hits', 'negative_hits', 'misses', 'coalesced' and 'hit_rate'.
+        """
+
+        lookups = self.hits + self.negative_hits + self.misses + self.coalesced
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'hit_rate': (self.hits + self.negative_hits) / lookups if lookups else 0.0
+        }
+
+    def get_or_load(self, key, loader):
+        """
+        Returns the cached value of a key, calling `loader` on a miss.
+
+        :param key: The cache key.
+        :param loader: A callable returning the value of the key.
+        :return: The value.
+        :raises Exception: The cached or raised failure of the loader.
+        :raises TimeoutException: If a concurrent load of the key outlasts the current deadline.
+        """
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires_at, value, error = entry
+                if time.monotonic() < expires_at:
+                    self.entries.move_to_end(key)
+                    if error is not None:
+                        self.negative_hits += 1
+                        raise _fresh(error)
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = _Flight(self.generation)
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            deadline = Deadline.current()
+            if not flight.event.wait(deadline.check() if deadline is not None else None):
+                raise TimeoutException("Deadline exceeded waiting for a concurrent load")
+            if flight.error is not None:
+                raise _fresh(flight.error)
+            return flight.value
+
+        try:
+            flight.value = loader()
+            self.set(key, flight.value, generation=flight.generation)
+            return flight.value
+        except Exception as e:
+            flight.error = _fresh(e)
+            if isinstance(e, self.negative_exceptions):
+                self.set(key, None, flight.error, flight.generation)
+            raise
+        finally:
+            with self.lock:
+                if self.flights.get(key) is flight:
+                    del self.flights[key]
+            flight.event.set()
+
+    def set(self, key, value, error=None, generation=None):
+        """
+        Stores a value, or a failure when `error` is given.
+
+        :param generation: Optional; The generation the value was loaded in. The value is
+                           dropped if the cache was invalidated since, as it may be stale.
+        """
+
+        ttl = self.ttl if error is None else self.negative_ttl
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+            self.entries[key] = (time.monotonic() + ttl, value, error)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """
+        Drops the entry of a key, or every entry when no key is given. Loads already in
+        flight still answer their waiting callers but are not cached, and later callers
+        start a fresh load instead of joining them.
+        """
+
+        with self.lock:
+            self.generation += 1
+            if key is None:
+                self.entries.clear()
+                self.flights.clear()
+            else:
+                self.entries.pop(key, None)
+                self.flights.pop(key, None)
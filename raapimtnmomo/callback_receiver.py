@@ -0,0 +1,343 @@
+import asyncio
+import hmac
+import inspect
+import json
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+from .exceptions import NotFoundException
+
+class CallbackEvent:
+    """
+    A request-to-pay notification received from the provider.
+    """
+
+    __slots__ = ('reference_id', 'status', 'data', 'received_at')
+
+    def __init__(self, reference_id, status, data):
+        self.reference_id = reference_id
+        self.status = status
+        self.data = data
+        self.received_at = time.time()
+
+    def __repr__(self):
+        return f"CallbackEvent(reference_id={self.reference_id!r}, status={self.status!r})"
+
+
+class CallbackReceiver:
+    """
+    An embeddable asyncio HTTP server receiving the provider's asynchronous request-to-pay callbacks.
+
+    Callbacks are parsed, deduplicated by reference ID and pushed onto a bounded queue consumed by
+    worker tasks that dispatch them to the registered handlers. When the queue stays full the
+    receiver answers 503 so the provider retries later, which keeps memory bounded under bursts.
+
+    The reference ID is read from the 'referenceId' field of the body, the X-Reference-Id header,
+    or a 'referenceId' query parameter of the callback URL, in that order. Only callbacks
+    carrying a terminal status (SUCCESSFUL or FAILED) end a transaction: they are deduplicated
+    and, when a TransactionPoller is given, untrack the transaction from it, so polling only
+    remains as the fallback for transactions that never get a final callback. Other callbacks,
+    e.g. PENDING, are dispatched every time they arrive.
+
+    The provider does not sign its callbacks. To keep a forged or premature final status from
+    ending a transaction, give the receiver a `secret` that the callback URL carries, e.g.
+    'https://example.com/momo?token=<secret>', and/or a `verifier` confirming every final status
+    with get_transaction before it is dispatched and the transaction is untracked.
+    """
+
+    REASONS = {200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 411: 'Length Required', 413: 'Payload Too Large',
+               503: 'Service Unavailable'}
+    TERMINAL_STATUSES = ('SUCCESSFUL', 'FAILED')
+
+    def __init__(self, host='127.0.0.1', port=8000, queue_size=1000, workers=4, dedup_size=100000, enqueue_timeout=5.0, poller=None,
+                 max_body_size=65536, secret=None, verifier=None):
+        """
+        Initializes the receiver without starting it.
+
+        :param host: The interface to listen on. Defaults to the loopback interface; pass '0.0.0.0'
+                     to accept callbacks from other hosts, e.g. behind a reverse proxy.
+        :param port: The port to listen on. 0 picks a free port.
+        :param queue_size: The maximum number of callbacks waiting to be dispatched.
+        :param workers: The number of tasks dispatching callbacks to handlers.
+        :param dedup_size: The number of recent reference IDs remembered for deduplication.
+        :param enqueue_timeout: Seconds to wait for room in a full queue before answering 503.
+        :param poller: Optional; A TransactionPoller to untrack transactions from when their final callback arrives.
+        :param max_body_size: The largest request body accepted, in bytes; larger ones are answered with 413.
+        :param secret: Optional; A token every callback must carry, in a 'token' query parameter of
+                       the callback URL or an X-Callback-Token header. Others are answered with 401.
+        :param verifier: Optional; An MTNMoMoCollection or AsyncMTNMoMoCollection whose get_transaction
+                         must report the same final status before a callback is dispatched.
+        """
+
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.workers = workers
+        self.dedup_size = dedup_size
+        self.enqueue_timeout = enqueue_timeout
+        self.poller = poller
+        self.max_body_size = max_body_size
+        self.secret = secret
+        self.verifier = verifier
+
+        self.handlers = []
+        self.seen = OrderedDict()
+        self.queue = None
+        self.server = None
+        self.tasks = []
+
+        self.received = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.rejected = 0
+        self.too_large = 0
+        self.unauthorized = 0
+        self.unconfirmed = 0
+        self.dispatched = 0
+        self.handler_errors = 0
+
+    def add_handler(self, handler):
+        """
+        Registers a handler called with each CallbackEvent. Coroutine functions are awaited;
+        plain functions are run in a thread so they cannot block the event loop.
+
+        Usable as a decorator.
+
+        :param handler: The callable to register.
+        :return: The handler, unchanged.
+        """
+
+        self.handlers.append(handler)
+        return handler
+
+    def stats(self):
+        """
+        Returns a snapshot of the receiver counters.
+
+        :return: A dictionary of counters.
+        """
+
+        return {
+            'received': self.received,
+            'duplicates': self.duplicates,
+            'invalid': self.invalid,
+            'rejected': self.rejected,
+            'too_large': self.too_large,
+            'unauthorized': self.unauthorized,
+            'unconfirmed': self.unconfirmed,
+            'dispatched': self.dispatched,
+            'handler_errors': self.handler_errors,
+            'queued': self.queue.qsize() if self.queue is not None else 0
+        }
+
+    @property
+    def url(self):
+        """
+        The base URL the receiver listens on.
+        """
+
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}/"
+
+    async def start(self):
+        """
+        Starts listening and spawns the dispatch workers.
+        """
+
+        self.queue = asyncio.Queue(self.queue_size)
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.tasks = [asyncio.create_task(self.dispatch()) for _ in range(self.workers)]
+        return self
+
+    async def stop(self):
+        """
+        Stops accepting callbacks, dispatches the queued ones and stops the workers.
+        """
+
+        self.server.close()
+        await self.server.wait_closed()
+        await self.queue.join()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.stop()
+
+    async def serve_forever(self):
+        """
+        Starts the receiver and serves until cancelled.
+        """
+
+        await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def handle_connection(self, reader, writer):
+        """
+        Serves the HTTP/1.1 requests of one connection, keeping it alive between requests.
+        """
+
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length') or 0)
+                if 'transfer-encoding' in headers:
+                    # Only Content-Length framed bodies are read; the body is left unread.
+                    self.invalid += 1
+                    status_code, keep_alive = 411, False
+                elif length > self.max_body_size:
+                    # The body is left unread, so the connection cannot be reused.
+                    self.too_large += 1
+                    status_code, keep_alive = 413, False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+
+                    parts = request_line.decode('latin-1').split()
+                    target = parts[1] if len(parts) > 1 else '/'
+                    status_code = await self.receive(target, headers, body)
+
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(
+                    f"HTTP/1.1 {status_code} {self.REASONS[status_code]}\r\n"
+                    f"Content-Length: 0\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode()
+                )
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def receive(self, target, headers, body):
+        """
+        Parses, deduplicates and enqueues one callback.
+
+        :param target: The request target, including any query string.
+        :param headers: The request headers, with lower-cased names.
+        :param body: The raw request body.
+        :return: The HTTP status code to answer with.
+        """
+
+        self.received += 1
+
+        query = parse_qs(urlsplit(target).query)
+        if self.secret is not None:
+            token = headers.get('x-callback-token') or query.get('token', [''])[0]
+            if not hmac.compare_digest(token.encode(), self.secret.encode()):
+                self.unauthorized += 1
+                return 401
+
+        try:
+            data = json.loads(body) if body else {}
+        except ValueError:
+            data = None
+
+        reference_id = None
+        if isinstance(data, dict):
+            reference_id = data.get('referenceId') or headers.get('x-reference-id') or query.get('referenceId', [None])[0]
+
+        if not reference_id:
+            self.invalid += 1
+            return 400
+
+        # Once the final callback of a transaction was taken, any later one is a duplicate.
+        if reference_id in self.seen:
+            self.duplicates += 1
+            return 200
+
+        status = data.get('status')
+        terminal = status in self.TERMINAL_STATUSES
+        if terminal:
+            self.remember(reference_id)
+            if self.verifier is not None:
+                try:
+                    confirmed = await self.confirm(reference_id, status)
+                except Exception:
+                    # The provider retries a callback answered with 503.
+                    self.seen.pop(reference_id, None)
+                    return 503
+                if not confirmed:
+                    # Forged or ahead of the provider's own records: polling carries on.
+                    self.seen.pop(reference_id, None)
+                    self.unconfirmed += 1
+                    return 200
+        event = CallbackEvent(reference_id, status, data)
+
+        try:
+            await asyncio.wait_for(self.queue.put(event), self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            if terminal:
+                self.seen.pop(reference_id, None)
+            self.rejected += 1
+            return 503
+
+        if terminal and self.poller is not None:
+            self.poller.untrack(reference_id)
+
+        return 200
+
+    async def confirm(self, reference_id, status):
+        """
+        Checks a final status against get_transaction of the verifier.
+
+        :return: True if the provider reports the same status.
+        """
+
+        get_transaction = self.verifier.get_transaction
+        try:
+            if inspect.iscoroutinefunction(get_transaction):
+                transaction = await get_transaction(reference_id)
+            else:
+                transaction = await asyncio.to_thread(get_transaction, reference_id)
+        except NotFoundException:
+            return False
+        return transaction is not None and transaction.get('status') == status
+
+    def remember(self, reference_id):
+        """
+        Adds a reference ID to the bounded deduplication window.
+        """
+
+        self.seen[reference_id] = None
+        if len(self.seen) > self.dedup_size:
+            self.seen.popitem(last=False)
+
+    async def dispatch(self):
+        """
+        Worker task delivering queued callbacks to every handler.
+        """
+
+        while True:
+            event = await self.queue.get()
+            try:
+                for handler in self.handlers:
+                    try:
+                        if inspect.iscoroutinefunction(handler):
+                            await handler(event)
+                        else:
+                            await asyncio.to_thread(handler, event)
+                    except Exception:
+                        self.handler_errors += 1
+                self.dispatched += 1
+            finally:
+                self.queue.task_done()
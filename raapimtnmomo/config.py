@@ -1,4 +1,5 @@
 import os
+from types import MappingProxyType
 
 class MTNMoMoConfig:
     """
@@ -9,10 +10,16 @@ class MTNMoMoConfig:
     and API keys.
     """
     
-    def __init__(self):
+    PRODUCTS = ('collection', 'disbursement', 'remittance')
+    _frozen = False
+    _lookup = None
+
+    def __init__(self, host=None, currency=None, target=None, callback_url=None, collection=None, token_dir=None, disbursement=None, remittance=None):
         """
         Initializes the configuration by loading environment variables or
-        setting default values. 
+        setting default values. Values passed as arguments take precedence
+        over the environment, which lets one process hold a configuration
+        per merchant account.
         
         Environment variables:
             - RA_BASE_URL: The base URL of the MTN MoMo API.
@@ -22,19 +29,55 @@ class MTNMoMoConfig:
             - RA_COLLECTION_API_KEY_SECRET: The API key secret for the collection service.
             - RA_COLLECTION_PRIMARY_KEY: The primary subscription key for the collection service.
             - RA_COLLECTION_USER_ID: The user ID for the collection service.
+            - RA_DISBURSEMENT_API_KEY_SECRET: The API key secret for the disbursement service.
+            - RA_DISBURSEMENT_PRIMARY_KEY: The primary subscription key for the disbursement service.
+            - RA_DISBURSEMENT_USER_ID: The user ID for the disbursement service.
+            - RA_REMITTANCE_API_KEY_SECRET: The API key secret for the remittance service.
+            - RA_REMITTANCE_PRIMARY_KEY: The primary subscription key for the remittance service.
+            - RA_REMITTANCE_USER_ID: The user ID for the remittance service.
+            - RA_TOKEN_DIR: Directory where access tokens are shared between processes
+              (default: a directory private to the current user under the system temporary directory).
         
         If the environment variables are not found, default values will be used.
+
+        :param host: Optional; Overrides RA_BASE_URL.
+        :param currency: Optional; Overrides RA_CURRENCY.
+        :param target: Optional; Overrides RA_TARGET_ENVIRONMENT.
+        :param callback_url: Optional; Overrides RA_CALLBACK_URL.
+        :param collection: Optional; A dictionary with 'api_key_secret', 'primary_key' and 'user_id'
+                           overriding the RA_COLLECTION_* variables.
+        :param token_dir: Optional; Overrides RA_TOKEN_DIR.
+        :param disbursement: Optional; A dictionary with 'api_key_secret', 'primary_key' and 'user_id'
+                             overriding the RA_DISBURSEMENT_* variables.
+        :param remittance: Optional; A dictionary with 'api_key_secret', 'primary_key' and 'user_id'
+                           overriding the RA_REMITTANCE_* variables.
         """
         
-        self.host = os.getenv('RA_BASE_URL', 'https://sandbox.momodeveloper.mtn.com/')
-        self.currency = os.getenv('RA_CURRENCY', 'EUR')
-        self.target = os.getenv('RA_TARGET_ENVIRONMENT', 'sandbox')
-        self.callback_url = os.getenv('RA_CALLBACK_URL', 'http://localhost:8000')
+        self.host = host or os.getenv('RA_BASE_URL', 'https://sandbox.momodeveloper.mtn.com/')
+        self.currency = currency or os.getenv('RA_CURRENCY', 'EUR')
+        self.target = target or os.getenv('RA_TARGET_ENVIRONMENT', 'sandbox')
+        self.callback_url = callback_url or os.getenv('RA_CALLBACK_URL', 'http://localhost:8000')
+        self.token_dir = token_dir or os.getenv('RA_TOKEN_DIR')
         
+        collection = collection or {}
         self.collection = {
-            'api_key_secret': os.getenv('RA_COLLECTION_API_KEY_SECRET', 'df7c71c3c5ac4d3e9433daf43a6e2987'),
-            'primary_key': os.getenv('RA_COLLECTION_PRIMARY_KEY', '57ca5f1907074bf590090041688d781d'),
-            'user_id': os.getenv('RA_COLLECTION_USER_ID', 'd9097d11-90f4-411c-8c28-b2f97ad7ef61')
+            'api_key_secret': collection.get('api_key_secret') or os.getenv('RA_COLLECTION_API_KEY_SECRET', 'df7c71c3c5ac4d3e9433daf43a6e2987'),
+            'primary_key': collection.get('primary_key') or os.getenv('RA_COLLECTION_PRIMARY_KEY', '57ca5f1907074bf590090041688d781d'),
+            'user_id': collection.get('user_id') or os.getenv('RA_COLLECTION_USER_ID', 'd9097d11-90f4-411c-8c28-b2f97ad7ef61')
+        }
+
+        disbursement = disbursement or {}
+        self.disbursement = {
+            'api_key_secret': disbursement.get('api_key_secret') or os.getenv('RA_DISBURSEMENT_API_KEY_SECRET', ''),
+            'primary_key': disbursement.get('primary_key') or os.getenv('RA_DISBURSEMENT_PRIMARY_KEY', ''),
+            'user_id': disbursement.get('user_id') or os.getenv('RA_DISBURSEMENT_USER_ID', '')
+        }
+
+        remittance = remittance or {}
+        self.remittance = {
+            'api_key_secret': remittance.get('api_key_secret') or os.getenv('RA_REMITTANCE_API_KEY_SECRET', ''),
+            'primary_key': remittance.get('primary_key') or os.getenv('RA_REMITTANCE_PRIMARY_KEY', ''),
+            'user_id': remittance.get('user_id') or os.getenv('RA_REMITTANCE_USER_ID', '')
         }
         
         self.config = {
@@ -45,7 +88,13 @@ class MTNMoMoConfig:
             'callbackUrl': self.callback_url,
             'collectionApiKeySecret': self.collection['api_key_secret'],
             'collectionPrimaryKey': self.collection['primary_key'],
-            'collectionUserId': self.collection['user_id']
+            'collectionUserId': self.collection['user_id'],
+            'disbursementApiKeySecret': self.disbursement['api_key_secret'],
+            'disbursementPrimaryKey': self.disbursement['primary_key'],
+            'disbursementUserId': self.disbursement['user_id'],
+            'remittanceApiKeySecret': self.remittance['api_key_secret'],
+            'remittancePrimaryKey': self.remittance['primary_key'],
+            'remittanceUserId': self.remittance['user_id']
         }
         
     def retrieve_value(self, product: str = "", config_key: str = ""):
@@ -63,7 +112,13 @@ class MTNMoMoConfig:
         Raises:
             Exception: If the requested key does not exist in the configuration.
         """
-        
+
+        if self._lookup is not None:
+            try:
+                return self._lookup[(product, config_key)]
+            except KeyError:
+                pass
+
         filtered_nocoll = [key for key in self.config.keys() if not key.startswith(product)]
 
         key = config_key if config_key in filtered_nocoll else f"{product.lower()}{config_key[0].upper()}{config_key[1:]}"
@@ -72,3 +127,35 @@ class MTNMoMoConfig:
             raise Exception(f"{key} does not exist in config credentials")
 
         return self.config[key]
+
+    def freeze(self):
+        """
+        Makes the configuration immutable and precompiles value lookups.
+
+        After freezing, attributes can no longer be assigned, the credential dictionaries become
+        read-only, and retrieve_value answers the keys used by the clients with a single
+        dictionary lookup.
+
+        :return: The configuration itself.
+        """
+
+        lookup = {}
+        for product in self.PRODUCTS:
+            for config_key in ('host', 'currency', 'target', 'callbackUrl', 'PrimaryKey', 'ApiKeySecret', 'userId'):
+                try:
+                    lookup[(product, config_key)] = self.retrieve_value(product, config_key)
+                except Exception:
+                    pass
+
+        self._lookup = lookup
+        self.collection = MappingProxyType(self.collection)
+        self.disbursement = MappingProxyType(self.disbursement)
+        self.remittance = MappingProxyType(self.remittance)
+        self.config = MappingProxyType(self.config)
+        self._frozen = True
+        return self
+
+    def __setattr__(self, name, value):
+        if self._frozen:
+            raise AttributeError(f"Cannot set '{name}': the configuration is frozen")
+        super().__setattr__(name, value)
@@ -1,33 +1,62 @@
 import argparse
+import sys
 from .sandbox_user_provisioning import SandboxUserProvisioning
 from .utilities import Helpers
 import json
 
 def main():
-    parser = argparse.ArgumentParser(description='Creates a Momo API user in the sandbox environment')
+    parser = argparse.ArgumentParser(description='Creates Momo API users in the sandbox environment')
     parser.add_argument('baseurl', type=str, help='Base URL for the API')
     parser.add_argument('primarykey', type=str, help='Primary Key for the API')
     parser.add_argument('callbackurl', type=str, help='Callback URL for the API')
+    parser.add_argument('--count', type=int, default=1, help='Number of users to create')
+    parser.add_argument('--concurrency', type=int, default=10, help='Users provisioned at once')
+    parser.add_argument('--output', type=str, help='JSONL file receiving one line per created user, '
+                                                   'loadable with TenantRegistry.load_jsonl (default: standard output)')
 
     args = parser.parse_args()
 
-    print('Creating API and API Key Secrete user with the following details:')
-    print(f"Base URL: {args.baseurl}")
-    print(f"Primary Key: {args.primarykey}")
-    print(f"Callback URL: {args.callbackurl}")
+    if args.count == 1 and args.output is None:
+        print('Creating API and API Key Secrete user with the following details:')
+        print(f"Base URL: {args.baseurl}")
+        print(f"Primary Key: {args.primarykey}")
+        print(f"Callback URL: {args.callbackurl}")
 
+        try:
+            user = SandboxUserProvisioning({
+                'baseURL': args.baseurl,
+                'userID': Helpers.uuid4(),
+                'primaryKey': args.primarykey,
+                'providerCallbackHost': args.callbackurl
+            })
+            result = user.create()
+            print("API User and API Key Secrete created successfully.")
+            print(json.dumps(result, indent=2))
+        except Exception as e:
+            print(f"Error creating API user: {e}")
+            sys.exit(1)
+        return
+
+    # Users are written as they are created, so a partial failure keeps every user that succeeded.
+    output = open(args.output, 'a') if args.output else sys.stdout
+    created = failed = 0
     try:
-        user = SandboxUserProvisioning({
-            'baseURL': args.baseurl,
-            'userID': Helpers.uuid4(),
-            'primaryKey': args.primarykey,
-            'providerCallbackHost': args.callbackurl
-        })
-        result = user.create()
-        print("API User and API Key Secrete created successfully.")
-        print(json.dumps(result, indent=2))
-    except Exception as e:
-        print(f"Error creating API user: {e}")
+        for result in SandboxUserProvisioning.create_many(args.baseurl, args.primarykey, args.callbackurl,
+                                                          args.count, args.concurrency):
+            if result.ok:
+                created += 1
+                output.write(json.dumps(result.credentials) + '\n')
+                output.flush()
+            else:
+                failed += 1
+                print(f"Error creating API user {result.user_id}: {result.error}", file=sys.stderr)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(f"{created} API users created, {failed} failed.", file=sys.stderr)
+    if failed:
+        sys.exit(1)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,149 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+from .exceptions import TimeoutException
+
+_current = contextvars.ContextVar('raapimtnmomo_deadline', default=None)
+
+class Deadline:
+    """
+    A point in time by which an API call, including its token acquisition, retries and HTTP
+    exchanges, must complete.
+
+    Used as a context manager, a deadline applies to every call made in the block, on the
+    current thread or task and in the worker threads of the bulk operations started from it.
+    Nested deadlines never extend an enclosing one: the earliest wins.
+
+        with Deadline(2.0):
+            collection.get_transaction(reference_id)
+    """
+
+    __slots__ = ('expires_at', 'tokens')
+
+    def __init__(self, timeout):
+        """
+        :param timeout: Seconds from now until the deadline.
+        """
+
+        self.expires_at = time.monotonic() + timeout
+        self.tokens = []
+
+    @staticmethod
+    def current():
+        """
+        Returns the deadline applying to the current context, or None.
+        """
+
+        return _current.get()
+
+    def remaining(self):
+        """
+        Returns the seconds left before the deadline, negative once it has passed.
+        """
+
+        return self.expires_at - time.monotonic()
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def check(self):
+        """
+        Raises if the deadline has passed.
+
+        :return: The seconds left before the deadline.
+        :raises TimeoutException: If the deadline has passed.
+        """
+
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise TimeoutException("Deadline exceeded")
+        return remaining
+
+    def __enter__(self):
+        current = _current.get()
+        effective = self if current is None or self.expires_at < current.expires_at else current
+        self.tokens.append(_current.set(effective))
+        return effective
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _current.reset(self.tokens.pop())
+
+
+def bind(fn, deadline=None):
+    """
+    Wraps a callable so that it runs in a copy of the current context, with `deadline` applied
+    and checked first. Work queued on a thread pool then fails fast once the deadline has passed
+    instead of starting a call that cannot complete in time.
+
+    :param fn: The callable to wrap.
+    :param deadline: Optional; The Deadline to apply. The current one applies if it is earlier.
+    :return: The wrapped callable.
+    """
+
+    current = _current.get()
+    if deadline is None or (current is not None and current.expires_at < deadline.expires_at):
+        deadline = current
+    context = contextvars.copy_context()
+
+    def run(*args):
+        if deadline is not None:
+            deadline.check()
+            _current.set(deadline)
+        return fn(*args)
+
+    def call(*args):
+        # A context can only be entered by one thread at a time, so each call gets its own copy.
+        return context.copy().run(run, *args)
+
+    return call
+
+
+@contextmanager
+def acquire(lock):
+    """
+    Holds a lock, waiting at most until the current deadline.
+
+    :param lock: A threading.Lock.
+    :raises TimeoutException: If the lock could not be acquired before the deadline.
+    """
+
+    deadline = _current.get()
+    if not lock.acquire(timeout=deadline.check() if deadline is not None else -1):
+        raise TimeoutException("Deadline exceeded while waiting for a lock")
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+def bounded(method):
+    """
+    Decorates a client method so that each call runs under the client's `timeout`, if it has one.
+    Coroutine methods are supported; they are cancelled as a whole when the deadline passes.
+    """
+
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def async_wrapper(self, *args, **kwargs):
+            if self.timeout is None:
+                return await method(self, *args, **kwargs)
+            with Deadline(self.timeout) as deadline:
+                try:
+                    return await asyncio.wait_for(method(self, *args, **kwargs), deadline.check())
+                except asyncio.TimeoutError as e:
+                    raise TimeoutException("Deadline exceeded") from e
+
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.timeout is None:
+            return method(self, *args, **kwargs)
+        with Deadline(self.timeout):
+            return method(self, *args, **kwargs)
+
+    return wrapper
@@ -7,8 +7,20 @@ class BadRequestException(MTNMoMoException):
 class UnauthorizedException(MTNMoMoException):
     pass
 
+class NotFoundException(MTNMoMoException):
+    pass
+
 class ConflictException(MTNMoMoException):
     pass
 
 class InternalServerErrorException(MTNMoMoException):
     pass
+
+class CircuitOpenException(MTNMoMoException):
+    pass
+
+class RateLimitExceededException(MTNMoMoException):
+    pass
+
+class TimeoutException(MTNMoMoException):
+    pass
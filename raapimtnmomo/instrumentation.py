@@ -0,0 +1,307 @@
+import asyncio
+import bisect
+import functools
+import inspect
+import threading
+import time
+from collections import Counter
+
+class Instrumentation:
+    """
+    The process-wide registry of instrumentation hooks.
+
+    A hook is a callable receiving (event, info), like the ResilientTransport listener. The
+    library emits:
+
+        - 'token.cache': {'product', 'hit'} on every TokenManager lookup of the in-memory cache.
+        - 'token.load': {'product', 'duration', 'found'} when a token is read from the TokenStore.
+        - 'token.fetch': {'product', 'duration', 'error'} when a new token is requested.
+        - 'http.request': {'method', 'url', 'status', 'duration', 'decode', 'error'} for every
+          request sent by a synchronous transport or an AsyncTransport; 'duration' is the round
+          trip, body included, and 'decode' the time spent decoding the body.
+        - 'operation': {'product', 'operation', 'duration', 'error'} for every client operation,
+          synchronous or async.
+
+    Durations are in seconds and 'error' is the exception class name, or None; an async request
+    cancelled by its operation's deadline reports 'CancelledError'. When no hook is
+    registered, instrumented code only checks `Instrumentation.hooks` and skips the timing.
+    """
+
+    hooks = ()
+    _lock = threading.Lock()
+
+    @classmethod
+    def add_hook(cls, hook):
+        """
+        Registers a hook.
+
+        :param hook: A callable receiving (event, info).
+        :return: The hook, so that this method can be used as a decorator.
+        """
+
+        with cls._lock:
+            cls.hooks = cls.hooks + (hook,)
+        return hook
+
+    @classmethod
+    def remove_hook(cls, hook):
+        """
+        Unregisters a hook.
+
+        :param hook: A previously registered hook.
+        """
+
+        with cls._lock:
+            cls.hooks = tuple(h for h in cls.hooks if h is not hook)
+
+    @classmethod
+    def emit(cls, event, **info):
+        """
+        Calls every registered hook with an event.
+
+        :param event: The event name.
+        :param info: The event details.
+        """
+
+        for hook in cls.hooks:
+            hook(event, info)
+
+
+def instrumented(operation):
+    """
+    Decorates a client method so that each call emits an 'operation' event. Coroutine methods
+    are supported; their event is emitted once they complete.
+
+    :param operation: The operation name reported in the event.
+    :return: The decorator.
+    """
+
+    def decorate(method):
+        if inspect.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def async_wrapper(self, *args, **kwargs):
+                if not Instrumentation.hooks:
+                    return await method(self, *args, **kwargs)
+
+                error = None
+                start = time.perf_counter()
+                try:
+                    return await method(self, *args, **kwargs)
+                except (Exception, asyncio.CancelledError) as e:
+                    error = type(e).__name__
+                    raise
+                finally:
+                    Instrumentation.emit('operation', product=self.product, operation=operation,
+                                         duration=time.perf_counter() - start, error=error)
+
+            return async_wrapper
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not Instrumentation.hooks:
+                return method(self, *args, **kwargs)
+
+            error = None
+            start = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            except Exception as e:
+                error = type(e).__name__
+                raise
+            finally:
+                Instrumentation.emit('operation', product=self.product, operation=operation,
+                                     duration=time.perf_counter() - start, error=error)
+
+        return wrapper
+
+    return decorate
+
+
+class Histogram:
+    """
+    A cumulative histogram with fixed bucket upper bounds, in the OpenMetrics sense.
+    """
+
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        if i < len(self.counts):
+            self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """
+        :return: A list of (upper bound, cumulative count) pairs, ending with '+Inf'.
+        """
+
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            pairs.append((bound, total))
+        pairs.append(('+Inf', self.count))
+        return pairs
+
+
+class MetricsCollector:
+    """
+    A hook aggregating the instrumentation events into metrics:
+
+        - per-operation and per-request latency histograms,
+        - HTTP status code and operation error counters,
+        - token fetches, store loads and in-memory cache hits per product.
+
+    Register it with Instrumentation.add_hook(collector) and read it with `stats()` or
+    `to_openmetrics()`.
+    """
+
+    DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, prefix='momo'):
+        """
+        :param buckets: The upper bounds of the histogram buckets, in seconds.
+        :param prefix: The prefix of the exported metric names.
+        """
+
+        self.buckets = tuple(buckets)
+        self.prefix = prefix
+        self.operations = {}
+        self.requests = {}
+        self.decode = Histogram(self.buckets)
+        self.statuses = Counter()
+        self.errors = Counter()
+        self.token_fetches = Counter()
+        self.token_loads = Counter()
+        self.token_cache = Counter()
+        self.lock = threading.Lock()
+
+    def __call__(self, event, info):
+        with self.lock:
+            if event == 'operation':
+                key = (info['product'], info['operation'])
+                self.histogram(self.operations, key).observe(info['duration'])
+                if info['error']:
+                    self.errors[key + (info['error'],)] += 1
+            elif event == 'http.request':
+                self.histogram(self.requests, info['method']).observe(info['duration'])
+                self.statuses[(info['method'], info['status'] or info['error'])] += 1
+                if info['decode'] is not None:
+                    self.decode.observe(info['decode'])
+            elif event == 'token.cache':
+                self.token_cache[(info['product'], info['hit'])] += 1
+            elif event == 'token.load':
+                self.token_loads[(info['product'], info['found'])] += 1
+            elif event == 'token.fetch':
+                self.token_fetches[(info['product'], info['error'] is None)] += 1
+
+    def histogram(self, histograms, key):
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(self.buckets)
+        return histogram
+
+    def stats(self):
+        """
+        Returns a summary of the metrics.
+
+        :return: A dictionary with the 'operations' (count, mean and error count per
+                 (product, operation)), the 'statuses' counts per (method, status), the
+                 'token_fetches' count and the token 'cache_hit_rate' per product.
+        """
+
+        with self.lock:
+            operations = {}
+            for key, histogram in self.operations.items():
+                errors = sum(count for error_key, count in self.errors.items() if error_key[:2] == key)
+                operations[key] = {
+                    'count': histogram.count,
+                    'mean': histogram.sum / histogram.count if histogram.count else 0.0,
+                    'errors': errors
+                }
+
+            products = {product for product, _ in self.token_cache}
+            hit_rates = {}
+            for product in products:
+                hits = self.token_cache[(product, True)]
+                lookups = hits + self.token_cache[(product, False)]
+                hit_rates[product] = hits / lookups if lookups else 0.0
+
+            return {
+                'operations': operations,
+                'statuses': dict(self.statuses),
+                'token_fetches': {product: count for (product, ok), count in self.token_fetches.items() if ok},
+                'cache_hit_rate': hit_rates
+            }
+
+    def to_openmetrics(self):
+        """
+        Renders the metrics in the OpenMetrics text exposition format.
+
+        :return: The exposition as a string, terminated by '# EOF'.
+        """
+
+        lines = []
+        prefix = self.prefix
+
+        def histogram_family(name, help_text, histograms, label_names):
+            lines.append(f"# TYPE {name} histogram")
+            lines.append(f"# UNIT {name} seconds")
+            lines.append(f"# HELP {name} {help_text}")
+            for key, histogram in sorted(histograms.items()):
+                pairs = list(zip(label_names, key if isinstance(key, tuple) else (key,)))
+                for bound, count in histogram.cumulative():
+                    lines.append(f"{name}_bucket{format_labels(pairs + [('le', bound)])} {count}")
+                lines.append(f"{name}_count{format_labels(pairs)} {histogram.count}")
+                lines.append(f"{name}_sum{format_labels(pairs)} {histogram.sum}")
+
+        def counter_family(name, help_text, counter, label_names):
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"# HELP {name} {help_text}")
+            for key, count in sorted(counter.items(), key=lambda item: tuple(map(str, item[0]))):
+                lines.append(f"{name}_total{format_labels(zip(label_names, key))} {count}")
+
+        with self.lock:
+            histogram_family(f"{prefix}_operation_duration_seconds", "Duration of the client operations.",
+                             self.operations, ('product', 'operation'))
+            histogram_family(f"{prefix}_http_request_duration_seconds", "Round trip of the HTTP requests.",
+                             self.requests, ('method',))
+            histogram_family(f"{prefix}_http_decode_duration_seconds", "Time spent decoding the response bodies.",
+                             {(): self.decode} if self.decode.count else {}, ())
+            counter_family(f"{prefix}_http_responses", "HTTP responses by method and status code.",
+                           self.statuses, ('method', 'code'))
+            counter_family(f"{prefix}_operation_errors", "Client operations that raised.",
+                           self.errors, ('product', 'operation', 'error'))
+            counter_family(f"{prefix}_token_fetches", "Access token requests.",
+                           Counter({(product, 'success' if ok else 'failure'): count for (product, ok), count in self.token_fetches.items()}),
+                           ('product', 'outcome'))
+            counter_family(f"{prefix}_token_store_loads", "Access tokens read from the token store.",
+                           Counter({(product, 'found' if found else 'missing'): count for (product, found), count in self.token_loads.items()}),
+                           ('product', 'result'))
+            counter_family(f"{prefix}_token_cache_lookups", "In-memory token cache lookups.",
+                           Counter({(product, 'hit' if hit else 'miss'): count for (product, hit), count in self.token_cache.items()}),
+                           ('product', 'result'))
+
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(pairs):
+    """
+    Formats label pairs as an OpenMetrics label set.
+
+    :return: The label set in braces, or an empty string when there are no labels.
+    """
+
+    labels = []
+    for name, value in pairs:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        labels.append(f'{name}="{value}"')
+    return '{' + ','.join(labels) + '}' if labels else ''
@@ -0,0 +1,332 @@
+import queue
+import sqlite3
+import threading
+import time
+import weakref
+from .deadline import Deadline
+from .exceptions import TimeoutException
+from .utilities import Helpers
+
+class Ledger:
+    """
+    Base class of the idempotency ledgers mapping a transaction externalId to its X-Reference-Id.
+
+    An entry is reserved before the request-to-pay is sent, so a retry of the same externalId
+    after a crash or a timeout reuses the same X-Reference-Id instead of charging the payer twice.
+    """
+
+    RESERVED = 'RESERVED'
+    PENDING = 'PENDING'
+
+    def reserve(self, external_id):
+        """
+        Returns the entry of an externalId, creating it with a new X-Reference-Id if needed.
+
+        :param external_id: The externalId of the transaction.
+        :return: A tuple (reference_id, status).
+        """
+
+        raise NotImplementedError
+
+    def update(self, external_id, status):
+        """
+        Records the last known status of a transaction.
+
+        :param external_id: The externalId of the transaction.
+        :param status: The status, e.g. 'PENDING', 'SUCCESSFUL' or 'FAILED'.
+        """
+
+        raise NotImplementedError
+
+    def get(self, external_id):
+        """
+        Looks an externalId up.
+
+        :param external_id: The externalId of the transaction.
+        :return: A tuple (reference_id, status), or None if the externalId is unknown.
+        """
+
+        raise NotImplementedError
+
+    def get_by_reference(self, reference_id):
+        """
+        Looks an X-Reference-Id up.
+
+        :param reference_id: The X-Reference-Id of the transaction.
+        :return: A tuple (external_id, status), or None if the reference is unknown.
+        """
+
+        raise NotImplementedError
+
+    def iter_entries(self):
+        """
+        Streams every entry of the ledger.
+
+        :return: A generator of (external_id, reference_id, status) tuples.
+        """
+
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class MemoryLedger(Ledger):
+    """
+    A ledger kept in the memory of the current process.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.references = {}
+        self.lock = threading.Lock()
+
+    def reserve(self, external_id):
+        with self.lock:
+            entry = self.entries.get(external_id)
+            if entry is None:
+                entry = self.entries[external_id] = (Helpers.uuid4(), self.RESERVED)
+                self.references[entry[0]] = external_id
+            return entry
+
+    def update(self, external_id, status):
+        with self.lock:
+            reference_id, _ = self.entries[external_id]
+            self.entries[external_id] = (reference_id, status)
+
+    def get(self, external_id):
+        return self.entries.get(external_id)
+
+    def get_by_reference(self, reference_id):
+        external_id = self.references.get(reference_id)
+        if external_id is None:
+            return None
+        return external_id, self.entries[external_id][1]
+
+    def iter_entries(self):
+        for external_id, (reference_id, status) in list(self.entries.items()):
+            yield external_id, reference_id, status
+
+
+class _Reader:
+    """
+    Holds the read connection of one thread. The connection is closed when the holder is
+    released, i.e. when its thread exits, or when the ledger is closed.
+    """
+
+    __slots__ = ('connection', 'finalizer', '__weakref__')
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.finalizer = weakref.finalize(self, connection.close)
+
+
+class SQLiteLedger(Ledger):
+    """
+    A ledger persisted in an SQLite database.
+
+    externalId is the primary key of a WITHOUT ROWID table, so lookups stay a single B-tree
+    search however many rows the ledger holds. All writes go through one writer thread that
+    commits the operations queued by concurrent callers together (group commit): each caller
+    still returns only once its own write is durable, but a burst of writes costs a single
+    transaction; `commits` and `writes_committed` count the transactions and the writes they
+    held. Reads use a per-thread connection, closed when its thread exits, and run concurrently
+    in WAL mode.
+    """
+
+    def __init__(self, path, synchronous='NORMAL', max_batch=500):
+        """
+        Opens (and creates if needed) the ledger database.
+
+        :param path: The path of the SQLite database file.
+        :param synchronous: The SQLite synchronous pragma. 'NORMAL' survives process crashes;
+                            'FULL' also survives power loss, at a throughput cost.
+        :param max_batch: The maximum number of writes committed in one transaction.
+        """
+
+        self.path = path
+        self.synchronous = synchronous
+        self.max_batch = max_batch
+        self.local = threading.local()
+        self.readers = weakref.WeakSet()
+        self.writes = queue.Queue()
+        self.closed = False
+        self.writes_committed = 0
+        self.commits = 0
+        self.lock = threading.Lock()
+
+        connection = self.connect()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS ledger ("
+            "external_id TEXT PRIMARY KEY, "
+            "reference_id TEXT NOT NULL, "
+            "status TEXT NOT NULL, "
+            "updated_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        connection.execute("CREATE UNIQUE INDEX IF NOT EXISTS ledger_reference_id ON ledger (reference_id)")
+        connection.commit()
+        connection.close()
+
+        self.writer = threading.Thread(target=self.write_loop, daemon=True)
+        self.writer.start()
+
+    def connect(self):
+        connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(f"PRAGMA synchronous={self.synchronous}")
+        return connection
+
+    def reader(self):
+        if self.closed:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed ledger")
+        reader = getattr(self.local, 'reader', None)
+        if reader is None:
+            # The holder lives in the thread's local storage only, so the connection is closed
+            # when the thread exits: pools started per bulk call do not leak connections.
+            reader = self.local.reader = _Reader(self.connect())
+            with self.lock:
+                self.readers.add(reader)
+        return reader.connection
+
+    def reserve(self, external_id):
+        entry = self.get(external_id)
+        if entry is not None:
+            return entry
+        return self.submit('reserve', external_id, Helpers.uuid4())
+
+    def update(self, external_id, status):
+        if not self.submit('update', external_id, status):
+            raise KeyError(f"Unknown externalId: {external_id}")
+
+    def get(self, external_id):
+        row = self.reader().execute(
+            "SELECT reference_id, status FROM ledger WHERE external_id = ?", (external_id,)
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def get_by_reference(self, reference_id):
+        row = self.reader().execute(
+            "SELECT external_id, status FROM ledger WHERE reference_id = ?", (reference_id,)
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def iter_entries(self, batch_size=1000):
+        last = ''
+        while True:
+            rows = self.reader().execute(
+                "SELECT external_id, reference_id, status FROM ledger WHERE external_id > ? ORDER BY external_id LIMIT ?",
+                (last, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield tuple(row)
+            last = rows[-1][0]
+
+    def submit(self, operation, *args):
+        """
+        Queues a write for the writer thread and waits until it is committed, at most until the
+        current deadline. A write that times out may still be committed later; reserving the
+        same externalId again then returns its entry.
+
+        :return: The result of the write.
+        :raises TimeoutException: If the write is not committed before the current deadline.
+        :raises sqlite3.ProgrammingError: If the ledger is closed.
+        """
+
+        deadline = Deadline.current()
+        timeout = deadline.check() if deadline is not None else None
+
+        done = threading.Event()
+        outcome = {}
+        with self.lock:
+            # Checked under the lock so no write is queued behind the writer's stop marker.
+            if self.closed:
+                raise sqlite3.ProgrammingError("Cannot operate on a closed ledger")
+            self.writes.put((operation, args, done, outcome))
+        if not done.wait(timeout):
+            raise TimeoutException(f"Deadline exceeded waiting for the ledger {operation} to commit")
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome.get('result')
+
+    def write_loop(self):
+        """
+        Writer thread committing queued writes in batches.
+        """
+
+        connection = self.connect()
+
+        while True:
+            batch = [self.writes.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.writes.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = None in batch
+            batch = [write for write in batch if write is not None]
+
+            try:
+                now = time.time()
+                connection.execute("BEGIN IMMEDIATE")
+                results = [self.apply(connection, operation, args, now) for operation, args, _, _ in batch]
+                connection.execute("COMMIT")
+                self.commits += 1
+                self.writes_committed += len(batch)
+                for (_, _, done, outcome), result in zip(batch, results):
+                    outcome['result'] = result
+                    done.set()
+            except Exception as e:
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                for _, _, done, outcome in batch:
+                    outcome['error'] = e
+                    done.set()
+
+            if stop:
+                connection.close()
+                return
+
+    def apply(self, connection, operation, args, now):
+        if operation == 'reserve':
+            external_id, reference_id = args
+            connection.execute(
+                "INSERT OR IGNORE INTO ledger (external_id, reference_id, status, updated_at) VALUES (?, ?, ?, ?)",
+                (external_id, reference_id, self.RESERVED, now)
+            )
+            row = connection.execute(
+                "SELECT reference_id, status FROM ledger WHERE external_id = ?", (external_id,)
+            ).fetchone()
+            return tuple(row)
+
+        external_id, status = args
+        cursor = connection.execute(
+            "UPDATE ledger SET status = ?, updated_at = ? WHERE external_id = ?", (status, now, external_id)
+        )
+        return cursor.rowcount > 0
+
+    def close(self):
+        """
+        Commits the pending writes, stops the writer thread and closes the read connections of
+        every thread. Later reads and writes raise sqlite3.ProgrammingError.
+        """
+
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.writes.put(None)
+            readers = list(self.readers)
+
+        self.writer.join()
+        for reader in readers:
+            reader.finalizer()
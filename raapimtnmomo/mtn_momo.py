@@ -1,5 +1,39 @@
 from .config import MTNMoMoConfig
 from .exceptions import *
+from .models import Transaction
+from .requestss import Request, RequestTemplate
+from .token_manager import TokenManager
+
+class TransactionResult:
+    """
+    The outcome of one item of a bulk request-to-pay or transfer.
+
+    Exactly one of `transaction_id` and `error` is set.
+    """
+
+    __slots__ = ('index', 'params', 'transaction_id', 'error')
+
+    def __init__(self, index, params, transaction_id=None, error=None):
+        """
+        :param index: The position of the item in the input iterable.
+        :param params: The transaction parameters of the item.
+        :param transaction_id: The X-Reference-Id of the created transaction, if it succeeded.
+        :param error: The exception raised for the item, if it failed.
+        """
+
+        self.index = index
+        self.params = params
+        self.transaction_id = transaction_id
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        outcome = f"transaction_id={self.transaction_id!r}" if self.ok else f"error={self.error!r}"
+        return f"TransactionResult(index={self.index}, {outcome})"
+
 
 class MTNMoMo:
     """
@@ -8,14 +42,110 @@ class MTNMoMo:
     """
     
     
-    def __init__(self, config):
+    product = None
+    OPERATIONS = {}
+
+    def __init__(self, config, transport=None, token_manager=None, timeout=None, models=False):
         """
         Initializes the MTNMoMo instance with the given configuration.
         
         :param config: An instance of MTNMoMoConfig containing API configuration details.
+        :param transport: Optional; The Transport used for every HTTP call. Defaults to the shared pooled transport.
+        :param token_manager: Optional; The TokenManager used to obtain access tokens. One sharing the transport is created by default.
+        :param timeout: Optional; Seconds each operation may take, token acquisition and retries included.
+                        A TimeoutException is raised past it. A Deadline set by the caller still applies if earlier.
+        :param models: If True, read operations return lazily parsed models (see raapimtnmomo.models)
+                       instead of dictionaries.
         """
         
         self.config = config
+        self.timeout = timeout
+        self.models = models
+        self.transport = transport or Request.default_transport()
+        self.token_manager = token_manager or TokenManager(config.token_dir, transport=self.transport)
+        self.compile_templates()
+
+    def compile_templates(self):
+        """
+        Precompiles a RequestTemplate per operation listed in OPERATIONS, holding its URL and
+        static headers, and the token cache key and token request of the client's credentials,
+        so that calls only fill in the bearer token and their own fields.
+
+        Runs at construction; call it again after changing the configuration of a live client.
+        """
+
+        self.templates = {}
+        self.token_key = self.token_request = None
+        if self.product is None:
+            return
+
+        base_url = self.get_url()
+        headers = {
+            "Ocp-Apim-Subscription-Key": self.config.retrieve_value(self.product, 'PrimaryKey'),
+            "X-Target-Environment": self.config.target,
+            'Content-Type': 'application/json'
+        }
+        self.templates = {operation: RequestTemplate(base_url + uri, headers) for operation, uri in self.OPERATIONS.items()}
+        self.token_key = self.token_manager.cache_key(self.config, self.product)
+        self.token_request = self.token_manager.token_request(self.config, self.product)
+
+    def get_url(self) -> str:
+        """
+        Constructs the base URL of the product API by appending the product to the host.
+
+        :return: Full URL as a string.
+        """
+        
+        return f"{self.config.host}{self.product}"
+
+    def get_token(self):
+        """
+        Retrieves the access token of the product using the TokenManager.
+
+        :return: The access token as a string.
+        """
+        
+        return self.token_manager.get_token(self.config, self.product, self.token_key, self.token_request)
+
+    def read(self, url, headers, model):
+        """
+        Sends a GET request and returns its data, as a dictionary or, when the client was created
+        with models=True, as an instance of `model` that decodes the body on first access.
+
+        :param url: The target URL.
+        :param headers: A dictionary of HTTP headers.
+        :param model: The Model subclass describing the response.
+        :return: The response data.
+        """
+
+        if not self.models:
+            response = Request.request_get(url, headers, self.transport)
+            if response[0] != 200:
+                self.verif_exception(response)
+            return response[1]
+
+        status, raw = Request.request_get_raw(url, headers, self.transport)
+        if status != 200:
+            self.verif_exception((status, raw.decode(errors='replace')))
+        return model(raw)
+
+    def record_status(self, data):
+        """
+        Records the status of a retrieved transaction in the client's ledger.
+
+        :param data: The transaction, as a dictionary or a Transaction model.
+        """
+
+        if not isinstance(data, (dict, Transaction)):
+            return
+
+        external_id, status = data.get('externalId'), data.get('status')
+
+        if external_id and status:
+            try:
+                self.ledger.update(external_id, status)
+            except KeyError:
+                pass
 
     def verif_exception(self, response):
         """
@@ -24,6 +154,7 @@ class MTNMoMo:
         :param response: A tuple containing the status code and response data from an API request.
         :raises BadRequestException: If the status code is 400, indicating a bad request.
         :raises UnauthorizedException: If the status code is 401, indicating unauthorized access.
+        :raises NotFoundException: If the status code is 404, e.g. an unknown transaction or account holder.
         :raises ConflictException: If the status code is 409, indicating a conflict, such as a duplicated reference ID.
         :raises InternalServerErrorException: If the status code is 500, indicating a server error.
         :raises MTNMoMoException: For other status codes, indicating an unspecified error.
@@ -34,6 +165,8 @@ class MTNMoMo:
             raise BadRequestException("Bad request, e.g. invalid data was sent in the request.")
         elif status_code == 401:
             raise UnauthorizedException("Unauthorized")
+        elif status_code == 404:
+            raise NotFoundException(f"Not found: {data}")
         elif status_code == 409:
             raise ConflictException(f"Conflict, duplicated reference id: {data}")
         elif status_code == 500:
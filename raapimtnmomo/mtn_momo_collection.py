@@ -1,8 +1,10 @@
-from .mtn_momo import MTNMoMo
+from .mtn_momo import MTNMoMo, TransactionResult
 from .utilities import Helpers
 from .requestss import *
 from .exceptions import *
-from .token_manager import TokenManager
+from .deadline import bounded
+from .instrumentation import instrumented
+from .models import AccountBalance, BasicUserInfo, Transaction
 
 class MTNMoMoCollection(MTNMoMo):
     """
@@ -16,48 +18,74 @@ class MTNMoMoCollection(MTNMoMo):
     ACCOUNT_BALANCE_URI = '/v1_0/account/balance'
     GET_BASIC_USER_INFO_URI = '/v1_0/accountholder'
 
-    def get_url(self) -> str:
-        """
-        Constructs the base URL for the MTN MoMo Collection API by appending the product to the host.
+    OPERATIONS = {
+        'create_transaction': REQUEST_TO_PAY_URI,
+        'get_transaction': REQUEST_TO_PAY_URI,
+        'get_account_balance': ACCOUNT_BALANCE_URI,
+        'get_basic_user_info': GET_BASIC_USER_INFO_URI
+    }
 
-        :return: Full URL as a string.
+    def __init__(self, config, transport=None, token_manager=None, payer_cache=None, balance_cache=None, ledger=None, timeout=None, models=False):
         """
-        
-        return f"{self.config.host}{self.product}"
+        Initializes the collection client.
+
+        :param config: An instance of MTNMoMoConfig containing API configuration details.
+        :param transport: Optional; The Transport used for every HTTP call.
+        :param token_manager: Optional; The TokenManager used to obtain access tokens. One sharing the transport is created by default.
+        :param payer_cache: Optional; A TTLCache serving get_basic_user_info results, e.g.
+                            TTLCache(ttl=300, negative_ttl=60, negative_exceptions=(NotFoundException,)).
+                            It may be shared between clients: entries are keyed by (user_id, MSISDN).
+        :param balance_cache: Optional; A TTLCache serving get_account_balance results, e.g.
+                              TTLCache(maxsize=16, ttl=1.0). Concurrent reads are merged into one call,
+                              results are reused for the cache TTL, and the cache is cleared whenever
+                              this client creates a transaction.
+        :param ledger: Optional; A Ledger recording externalId -> X-Reference-Id before each request-to-pay,
+                       so that creating a transaction again with the same referenceExternalID reuses its reference.
+        :param timeout: Optional; Seconds each operation may take, token acquisition and retries included.
+        :param models: If True, get_transaction, get_account_balance and get_basic_user_info return
+                       Transaction, AccountBalance and BasicUserInfo models instead of dictionaries.
+        """
+
+        super().__init__(config, transport, token_manager, timeout, models)
+        self.payer_cache = payer_cache
+        self.balance_cache = balance_cache
+        self.ledger = ledger
 
+    @instrumented('create_transaction')
+    @bounded
     def create_transaction(self, params, custom_params=None):
         """
         Creates a new payment transaction with the required parameters.
         
         :param params: A dictionary containing transaction details such as amount, referenceExternalID, numberMoMo, etc.
+                       An optional 'callbackUrl' is sent as X-Callback-Url so the provider notifies it of the outcome.
         :param custom_params: Optional custom parameters for the transaction.
         :return: A dictionary containing the transaction ID and any custom parameters.
         :raises ValueError: If any required parameter is missing.
+
+        With a ledger, the X-Reference-Id is reserved for the referenceExternalID before the
+        request is sent. A retry reuses it: a transaction the provider already accepted is not
+        sent again, and a 409 for the reused reference is treated as that earlier acceptance.
         """
         
-        required_keys = ['amount', 'referenceExternalID', 'numberMoMo', 'description', 'note']
-        missing_keys = [key for key in required_keys if key not in params]
+        self.validate_transaction_params(params)
 
-        if missing_keys:
-            raise ValueError(f"The missing keys are: {', '.join(missing_keys)}")
+        if self.ledger is not None:
+            x_reference_id, status = self.ledger.reserve(params['referenceExternalID'])
+            if status != self.ledger.RESERVED:
+                return {'transactionId': x_reference_id, 'customParams': custom_params}
+        else:
+            x_reference_id = Helpers.uuid4()
 
-        currency = self.config.currency
-        access_token = self.get_token()
-        x_reference_id = Helpers.uuid4()
-        primary_key = self.config.collection['primary_key']
-        target = self.config.target
-
-        headers = {
-            "Ocp-Apim-Subscription-Key": primary_key,
-            "X-Reference-Id": x_reference_id,
-            "Authorization": f"Bearer {access_token}",
-            "X-Target-Environment": target,
-            'Content-Type': 'application/json'
-        }
+        template = self.templates['create_transaction']
+        headers = template.fill(self.get_token(), x_reference_id)
+
+        if params.get('callbackUrl'):
+            headers['X-Callback-Url'] = params['callbackUrl']
 
         body = {
             'amount': params['amount'],
-            'currency': currency,
+            'currency': self.config.currency,
             'externalId': params['referenceExternalID'],
             'payer': {
                 "partyIdType": "MSISDN",
@@ -67,107 +95,147 @@ class MTNMoMoCollection(MTNMoMo):
             "payeeNote": params['note']
         }
 
-        response = Request.request_post(self.get_url() + self.REQUEST_TO_PAY_URI, headers, body)
+        response = Request.request_post(template.url, headers, body, self.transport)
+
+        if self.balance_cache is not None:
+            self.balance_cache.invalidate()
+
+        if self.ledger is not None and response[0] in (202, 409):
+            self.ledger.update(params['referenceExternalID'], self.ledger.PENDING)
+            response = (202, response[1])
 
         if response[0] != 202:
             self.verif_exception(response)
 
         return {'transactionId': x_reference_id, 'customParams': custom_params}
 
-    def get_token(self):
+    def validate_transaction_params(self, params):
         """
-        Retrieves the access token using the TokenManager.
+        Checks that the transaction parameters contain every required key.
 
-        :return: The access token as a string.
+        :param params: A dictionary containing transaction details.
+        :raises ValueError: If any required parameter is missing.
+        """
+
+        required_keys = ['amount', 'referenceExternalID', 'numberMoMo', 'description', 'note']
+        missing_keys = [key for key in required_keys if key not in params]
+
+        if missing_keys:
+            raise ValueError(f"The missing keys are: {', '.join(missing_keys)}")
+
+    def create_transactions(self, transactions, concurrency=10, timeout=None):
+        """
+        Creates many payment transactions in parallel.
+
+        Each item is validated by create_transaction before it is sent; an invalid or failing item
+        produces a TransactionResult carrying the error instead of aborting the run. Items are
+        pulled from the iterable lazily, so arbitrarily large inputs can be streamed.
+
+        :param transactions: An iterable of transaction parameter dictionaries, as accepted by create_transaction.
+        :param concurrency: The maximum number of transactions being created at once.
+        :param timeout: Optional; Seconds the whole run may take. Past it, no further transaction is
+                        started and the outstanding ones fail with a TimeoutException.
+        :return: A generator of TransactionResult objects, in completion order.
         """
-        
-        token_manager = TokenManager()
-        return token_manager.get_token(self.config, self.product)
 
+        def create(item):
+            index, params = item
+            return self.create_transaction(params)['transactionId']
+
+        for (index, params), future in Helpers.imap_unordered(create, enumerate(transactions), concurrency, timeout):
+            error = future.exception()
+            if error is not None:
+                yield TransactionResult(index, params, error=error)
+            else:
+                yield TransactionResult(index, params, transaction_id=future.result())
+
+    @instrumented('get_transaction')
+    @bounded
     def get_transaction(self, x_reference_id):
         """
         Retrieves the details of a specific transaction based on its reference ID.
 
         :param x_reference_id: The reference ID of the transaction.
-        :return: The transaction details as a dictionary.
+        :return: The transaction details as a dictionary, or a Transaction with models=True.
         :raises ValueError: If the transaction reference ID is invalid.
         """
         
         if not x_reference_id:
             raise ValueError("Transaction reference ID is invalid")
 
-        access_token = self.get_token()
-        primary_key = self.config.collection['primary_key']
-        target = self.config.target
+        template = self.templates['get_transaction']
 
-        headers = {
-            "Ocp-Apim-Subscription-Key": primary_key,
-            "Authorization": f"Bearer {access_token}",
-            "X-Target-Environment": target,
-            'Content-Type': 'application/json'
-        }
+        data = self.read(f"{template.url}/{x_reference_id}", template.fill(self.get_token()), Transaction)
 
-        response = Request.request_get(f"{self.get_url()}{self.REQUEST_TO_PAY_URI}/{x_reference_id}", headers)
+        if self.ledger is not None:
+            self.record_status(data)
 
-        if response[0] != 200:
-            self.verif_exception(response)
-
-        return response[1]
+        return data
 
+    @instrumented('get_account_balance')
+    @bounded
     def get_account_balance(self, currency=None):
         """
         Retrieves the account balance.
 
+        Served from the balance cache when one is configured.
+
         :param currency: Optional. The currency for which to retrieve the balance.
-        :return: The account balance as a dictionary.
+        :return: The account balance as a dictionary, or an AccountBalance with models=True.
         """
         
-        access_token = self.get_token()
-        primary_key = self.config.collection['primary_key']
-        target = self.config.target
-
-        headers = {
-            "Ocp-Apim-Subscription-Key": primary_key,
-            "Authorization": f"Bearer {access_token}",
-            "X-Target-Environment": target,
-            'Content-Type': 'application/json'
-        }
+        if self.balance_cache is not None:
+            key = (self.config.collection['user_id'], currency)
+            return self.balance_cache.get_or_load(key, lambda: self.fetch_account_balance(currency))
 
-        url = f"{self.get_url()}{self.ACCOUNT_BALANCE_URI}"
-        if currency:
-            url += f"/{currency}"
+        return self.fetch_account_balance(currency)
 
-        response = Request.request_get(url, headers)
+    def fetch_account_balance(self, currency=None):
+        """
+        Fetches the account balance from the API, bypassing the balance cache.
 
-        if response[0] != 200:
-            self.verif_exception(response)
+        :param currency: Optional. The currency for which to retrieve the balance.
+        :return: The account balance as a dictionary, or an AccountBalance with models=True.
+        """
 
-        return response[1]
+        template = self.templates['get_account_balance']
 
+        url = template.url
+        if currency:
+            url += f"/{currency}"
+
+        return self.read(url, template.fill(self.get_token()), AccountBalance)
+
+    @instrumented('get_basic_user_info')
+    @bounded
     def get_basic_user_info(self, number_momo):
         """
         Retrieves basic user information based on the MoMo number.
 
+        Served from the payer cache when one is configured; unknown numbers are then cached
+        for the cache's negative TTL.
+
         :param number_momo: The MoMo number to query.
-        :return: The basic user information as a dictionary.
+        :return: The basic user information as a dictionary, or a BasicUserInfo with models=True.
+        :raises NotFoundException: If no account holder exists for the number.
         """
         
-        access_token = self.get_token()
-        primary_key = self.config.collection['primary_key']
-        target = self.config.target
-
-        headers = {
-            "Ocp-Apim-Subscription-Key": primary_key,
-            "Authorization": f"Bearer {access_token}",
-            "X-Target-Environment": target,
-            'Content-Type': 'application/json'
-        }
+        if self.payer_cache is not None:
+            key = (self.config.collection['user_id'], number_momo)
+            return self.payer_cache.get_or_load(key, lambda: self.fetch_basic_user_info(number_momo))
 
-        url = f"{self.get_url()}{self.GET_BASIC_USER_INFO_URI}/MSISDN/{number_momo}/basicuserinfo"
+        return self.fetch_basic_user_info(number_momo)
 
-        response = Request.request_get(url, headers)
+    def fetch_basic_user_info(self, number_momo):
+        """
+        Fetches basic user information from the API, bypassing the payer cache.
 
-        if response[0] != 200:
-            self.verif_exception(response)
+        :param number_momo: The MoMo number to query.
+        :return: The basic user information as a dictionary, or a BasicUserInfo with models=True.
+        """
+
+        template = self.templates['get_basic_user_info']
+
+        url = f"{template.url}/MSISDN/{number_momo}/basicuserinfo"
 
-        return response[1]
+        return self.read(url, template.fill(self.get_token()), BasicUserInfo)
@@ -0,0 +1,167 @@
+import asyncio
+from .mtn_momo import MTNMoMo
+from .mtn_momo_collection import MTNMoMoCollection
+from .utilities import Helpers
+from .requestss import AsyncTransport
+from .exceptions import *
+from .token_manager import TokenManager
+from .deadline import bounded
+from .instrumentation import instrumented
+
+class AsyncMTNMoMoCollection(MTNMoMo):
+    """
+    AsyncMTNMoMoCollection is the asyncio counterpart of MTNMoMoCollection. It exposes the same
+    operations as coroutines, sends them over a pooled AsyncTransport and caps the number of
+    requests in flight so a single event loop can drive many concurrent calls.
+    """
+
+    product = 'collection'
+
+    REQUEST_TO_PAY_URI = '/v1_0/requesttopay'
+    ACCOUNT_BALANCE_URI = '/v1_0/account/balance'
+    GET_BASIC_USER_INFO_URI = '/v1_0/accountholder'
+
+    OPERATIONS = {
+        'create_transaction': REQUEST_TO_PAY_URI,
+        'get_transaction': REQUEST_TO_PAY_URI,
+        'get_account_balance': ACCOUNT_BALANCE_URI,
+        'get_basic_user_info': GET_BASIC_USER_INFO_URI
+    }
+
+    validate_transaction_params = MTNMoMoCollection.validate_transaction_params
+
+    def __init__(self, config, transport=None, token_manager=None, max_concurrency=100, timeout=None):
+        """
+        Initializes the async collection client.
+
+        :param config: An instance of MTNMoMoConfig containing API configuration details.
+        :param transport: Optional; The AsyncTransport used for every HTTP call. One sized to `max_concurrency` is created by default.
+        :param token_manager: Optional; The TokenManager whose cache and store hold the access tokens.
+        :param max_concurrency: The maximum number of API calls in flight at once.
+        :param timeout: Optional; Seconds each operation may take, waiting for a concurrency slot included.
+        """
+
+        super().__init__(config, transport or AsyncTransport(pool_maxsize=max_concurrency), token_manager or TokenManager(config.token_dir), timeout)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def close(self):
+        """
+        Closes the underlying transport.
+        """
+
+        await self.transport.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def get_token(self):
+        """
+        Retrieves the access token using the TokenManager.
+
+        :return: The access token as a string.
+        """
+
+        return await self.token_manager.get_token_async(self.config, self.product, self.transport, self.token_key, self.token_request)
+
+    @instrumented('create_transaction')
+    @bounded
+    async def create_transaction(self, params, custom_params=None):
+        """
+        Creates a new payment transaction with the required parameters.
+
+        :param params: A dictionary containing transaction details such as amount, referenceExternalID, numberMoMo, etc.
+                       An optional 'callbackUrl' is sent as X-Callback-Url so the provider notifies it of the outcome.
+        :param custom_params: Optional custom parameters for the transaction.
+        :return: A dictionary containing the transaction ID and any custom parameters.
+        :raises ValueError: If any required parameter is missing.
+        """
+
+        self.validate_transaction_params(params)
+
+        async with self.semaphore:
+            x_reference_id = Helpers.uuid4()
+            template = self.templates['create_transaction']
+            headers = template.fill(await self.get_token(), x_reference_id)
+
+            if params.get('callbackUrl'):
+                headers['X-Callback-Url'] = params['callbackUrl']
+
+            body = {
+                'amount': params['amount'],
+                'currency': self.config.currency,
+                'externalId': params['referenceExternalID'],
+                'payer': {
+                    "partyIdType": "MSISDN",
+                    "partyId": params['numberMoMo']
+                },
+                "payerMessage": params['description'],
+                "payeeNote": params['note']
+            }
+
+            response = await self.transport.post(template.url, headers, body)
+
+        if response[0] != 202:
+            self.verif_exception(response)
+
+        return {'transactionId': x_reference_id, 'customParams': custom_params}
+
+    @instrumented('get_transaction')
+    @bounded
+    async def get_transaction(self, x_reference_id):
+        """
+        Retrieves the details of a specific transaction based on its reference ID.
+
+        :param x_reference_id: The reference ID of the transaction.
+        :return: The transaction details as a dictionary.
+        :raises ValueError: If the transaction reference ID is invalid.
+        """
+
+        if not x_reference_id:
+            raise ValueError("Transaction reference ID is invalid")
+
+        return await self.get(self.templates['get_transaction'], f"/{x_reference_id}")
+
+    @instrumented('get_account_balance')
+    @bounded
+    async def get_account_balance(self, currency=None):
+        """
+        Retrieves the account balance.
+
+        :param currency: Optional. The currency for which to retrieve the balance.
+        :return: The account balance as a dictionary.
+        """
+
+        return await self.get(self.templates['get_account_balance'], f"/{currency}" if currency else '')
+
+    @instrumented('get_basic_user_info')
+    @bounded
+    async def get_basic_user_info(self, number_momo):
+        """
+        Retrieves basic user information based on the MoMo number.
+
+        :param number_momo: The MoMo number to query.
+        :return: The basic user information as a dictionary.
+        """
+
+        return await self.get(self.templates['get_basic_user_info'], f"/MSISDN/{number_momo}/basicuserinfo")
+
+    async def get(self, template, path=''):
+        """
+        Sends an authenticated GET request and checks its response.
+
+        :param template: The RequestTemplate of the operation.
+        :param path: The path parameters appended to the template URL.
+        :return: The response data.
+        """
+
+        async with self.semaphore:
+            headers = template.fill(await self.get_token())
+            response = await self.transport.get(template.url + path, headers)
+
+        if response[0] != 200:
+            self.verif_exception(response)
+
+        return response[1]
@@ -0,0 +1,217 @@
+from .mtn_momo import MTNMoMo, TransactionResult
+from .utilities import Helpers
+from .requestss import *
+from .exceptions import *
+from .deadline import bounded
+from .instrumentation import instrumented
+from .models import AccountBalance, BasicUserInfo, Transaction
+
+class MTNMoMoDisbursement(MTNMoMo):
+    """
+    MTNMoMoDisbursement is a subclass of MTNMoMo that handles MoMo Disbursement API operations,
+    such as transferring money to payees, checking transfer statuses, retrieving the account
+    balance and validating account holders.
+    """
+
+    product = 'disbursement'
+
+    TRANSFER_URI = '/v1_0/transfer'
+    ACCOUNT_BALANCE_URI = '/v1_0/account/balance'
+    ACCOUNT_HOLDER_URI = '/v1_0/accountholder'
+
+    OPERATIONS = {
+        'transfer': TRANSFER_URI,
+        'get_transfer': TRANSFER_URI,
+        'get_account_balance': ACCOUNT_BALANCE_URI,
+        'validate_account_holder': ACCOUNT_HOLDER_URI,
+        'get_basic_user_info': ACCOUNT_HOLDER_URI
+    }
+
+    def __init__(self, config, transport=None, token_manager=None, ledger=None, timeout=None, models=False):
+        """
+        Initializes the disbursement client.
+
+        :param config: An instance of MTNMoMoConfig containing API configuration details.
+        :param transport: Optional; The Transport used for every HTTP call.
+        :param token_manager: Optional; The TokenManager used to obtain access tokens. One sharing the transport is created by default.
+        :param ledger: Optional; A Ledger recording externalId -> X-Reference-Id before each transfer, so that
+                       transferring again with the same referenceExternalID never pays the payee twice.
+                       Use a ledger of its own, not the one of a collection client.
+        :param timeout: Optional; Seconds each operation may take, token acquisition and retries included.
+        :param models: If True, get_transfer, get_account_balance and get_basic_user_info return
+                       Transaction, AccountBalance and BasicUserInfo models instead of dictionaries.
+        """
+
+        super().__init__(config, transport, token_manager, timeout, models)
+        self.ledger = ledger
+
+    @instrumented('transfer')
+    @bounded
+    def transfer(self, params, custom_params=None):
+        """
+        Transfers money from the disbursement account to a payee.
+
+        :param params: A dictionary containing transfer details: amount, referenceExternalID, numberMoMo
+                       (the payee), description and note. An optional 'currency' overrides the configured
+                       one and an optional 'callbackUrl' is sent as X-Callback-Url.
+        :param custom_params: Optional custom parameters for the transfer.
+        :return: A dictionary containing the transaction ID and any custom parameters.
+        :raises ValueError: If any required parameter is missing.
+
+        With a ledger, the X-Reference-Id is reserved for the referenceExternalID before the
+        request is sent. A retry reuses it: a transfer the provider already accepted is not
+        sent again, and a 409 for the reused reference is treated as that earlier acceptance.
+        """
+
+        self.validate_transfer_params(params)
+
+        if self.ledger is not None:
+            x_reference_id, status = self.ledger.reserve(params['referenceExternalID'])
+            if status != self.ledger.RESERVED:
+                return {'transactionId': x_reference_id, 'customParams': custom_params}
+        else:
+            x_reference_id = Helpers.uuid4()
+
+        template = self.templates['transfer']
+        headers = template.fill(self.get_token(), x_reference_id)
+
+        if params.get('callbackUrl'):
+            headers['X-Callback-Url'] = params['callbackUrl']
+
+        body = {
+            'amount': params['amount'],
+            'currency': params.get('currency') or self.config.currency,
+            'externalId': params['referenceExternalID'],
+            'payee': {
+                "partyIdType": "MSISDN",
+                "partyId": params['numberMoMo']
+            },
+            "payerMessage": params['description'],
+            "payeeNote": params['note']
+        }
+
+        response = Request.request_post(template.url, headers, body, self.transport)
+
+        if self.ledger is not None and response[0] in (202, 409):
+            self.ledger.update(params['referenceExternalID'], self.ledger.PENDING)
+            response = (202, response[1])
+
+        if response[0] != 202:
+            self.verif_exception(response)
+
+        return {'transactionId': x_reference_id, 'customParams': custom_params}
+
+    def validate_transfer_params(self, params):
+        """
+        Checks that the transfer parameters contain every required key.
+
+        :param params: A dictionary containing transfer details.
+        :raises ValueError: If any required parameter is missing.
+        """
+
+        required_keys = ['amount', 'referenceExternalID', 'numberMoMo', 'description', 'note']
+        missing_keys = [key for key in required_keys if key not in params]
+
+        if missing_keys:
+            raise ValueError(f"The missing keys are: {', '.join(missing_keys)}")
+
+    def transfers(self, transfers, concurrency=10, timeout=None):
+        """
+        Sends many transfers in parallel.
+
+        Each item is validated before it is sent; an invalid or failing item produces a
+        TransactionResult carrying the error instead of aborting the run. Items are pulled from
+        the iterable lazily, so arbitrarily large inputs can be streamed.
+
+        :param transfers: An iterable of transfer parameter dictionaries, as accepted by transfer.
+        :param concurrency: The maximum number of transfers being sent at once.
+        :param timeout: Optional; Seconds the whole run may take. Past it, no further transfer is
+                        started and the outstanding ones fail with a TimeoutException.
+        :return: A generator of TransactionResult objects, in completion order.
+        """
+
+        def send(item):
+            index, params = item
+            return self.transfer(params)['transactionId']
+
+        for (index, params), future in Helpers.imap_unordered(send, enumerate(transfers), concurrency, timeout):
+            error = future.exception()
+            if error is not None:
+                yield TransactionResult(index, params, error=error)
+            else:
+                yield TransactionResult(index, params, transaction_id=future.result())
+
+    @instrumented('get_transfer')
+    @bounded
+    def get_transfer(self, x_reference_id):
+        """
+        Retrieves the details of a specific transfer based on its reference ID.
+
+        :param x_reference_id: The reference ID of the transfer.
+        :return: The transfer details as a dictionary, or a Transaction with models=True.
+        :raises ValueError: If the transfer reference ID is invalid.
+        """
+
+        if not x_reference_id:
+            raise ValueError("Transfer reference ID is invalid")
+
+        template = self.templates['get_transfer']
+        data = self.read(f"{template.url}/{x_reference_id}", template.fill(self.get_token()), Transaction)
+
+        if self.ledger is not None:
+            self.record_status(data)
+
+        return data
+
+    @instrumented('get_account_balance')
+    @bounded
+    def get_account_balance(self, currency=None):
+        """
+        Retrieves the balance of the disbursement account.
+
+        :param currency: Optional. The currency for which to retrieve the balance.
+        :return: The account balance as a dictionary, or an AccountBalance with models=True.
+        """
+
+        template = self.templates['get_account_balance']
+        url = template.url
+        if currency:
+            url += f"/{currency}"
+
+        return self.read(url, template.fill(self.get_token()), AccountBalance)
+
+    @instrumented('validate_account_holder')
+    @bounded
+    def validate_account_holder(self, number_momo):
+        """
+        Checks that a MoMo number belongs to an active account holder, e.g. before paying it.
+
+        :param number_momo: The MoMo number to query.
+        :return: True if the account holder is active, False otherwise.
+        """
+
+        template = self.templates['validate_account_holder']
+        url = f"{template.url}/msisdn/{number_momo}/active"
+
+        response = Request.request_get(url, template.fill(self.get_token()), self.transport)
+
+        if response[0] != 200:
+            self.verif_exception(response)
+
+        return bool(response[1].get('result'))
+
+    @instrumented('get_basic_user_info')
+    @bounded
+    def get_basic_user_info(self, number_momo):
+        """
+        Retrieves basic user information based on the MoMo number.
+
+        :param number_momo: The MoMo number to query.
+        :return: The basic user information as a dictionary, or a BasicUserInfo with models=True.
+        :raises NotFoundException: If no account holder exists for the number.
+        """
+
+        template = self.templates['get_basic_user_info']
+        url = f"{template.url}/MSISDN/{number_momo}/basicuserinfo"
+
+        return self.read(url, template.fill(self.get_token()), BasicUserInfo)
@@ -0,0 +1,183 @@
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from .deadline import Deadline, bind
+from .exceptions import TimeoutException
+from .mtn_momo import TransactionResult
+from .mtn_momo_disbursement import MTNMoMoDisbursement
+
+class CorridorStats:
+    """
+    Latency and error statistics of the transfers sent in one currency corridor.
+
+    Latencies are kept for the last `sample_size` transfers only, so memory stays bounded on
+    long-running corridors.
+    """
+
+    __slots__ = ('count', 'errors', 'latencies', 'first', 'last')
+
+    def __init__(self, sample_size=10000):
+        self.count = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=sample_size)
+        self.first = None
+        self.last = None
+
+    def record(self, started, finished, error=None):
+        self.count += 1
+        if error is not None:
+            self.errors += 1
+        self.latencies.append(finished - started)
+        if self.first is None:
+            self.first = started
+        self.last = finished
+
+    def snapshot(self):
+        """
+        :return: A dictionary with 'count', 'errors', 'error_rate', 'rps', and the 'mean', 'p50',
+                 'p95' and 'p99' latencies in milliseconds. rps times the mean latency, in seconds,
+                 is the number of workers the corridor kept busy.
+        """
+
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000
+
+        elapsed = (self.last - self.first) if self.count else 0.0
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'error_rate': self.errors / self.count if self.count else 0.0,
+            'rps': self.count / elapsed if elapsed else 0.0,
+            'mean': sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+            'p50': percentile(50),
+            'p95': percentile(95),
+            'p99': percentile(99)
+        }
+
+
+class MTNMoMoRemittance(MTNMoMoDisbursement):
+    """
+    MTNMoMoRemittance handles MoMo Remittance API operations, i.e. cross-border transfers to
+    payees. The Remittance API exposes the same transfer, status, balance and account holder
+    operations as the Disbursement API, under its own product and credentials.
+    """
+
+    product = 'remittance'
+
+    def __init__(self, config, transport=None, token_manager=None, ledger=None, timeout=None, models=False):
+        """
+        Initializes the remittance client.
+
+        :param config: An instance of MTNMoMoConfig containing API configuration details.
+        :param transport: Optional; The Transport used for every HTTP call.
+        :param token_manager: Optional; The TokenManager used to obtain access tokens. One sharing the transport is created by default.
+        :param ledger: Optional; A Ledger recording externalId -> X-Reference-Id before each transfer, so that
+                       transferring again with the same referenceExternalID never pays the payee twice.
+        :param timeout: Optional; Seconds each operation may take, token acquisition and retries included.
+        :param models: If True, the read operations return models instead of dictionaries.
+        """
+
+        super().__init__(config, transport, token_manager, ledger, timeout, models)
+        self.corridors = {}
+        self.corridors_lock = threading.Lock()
+
+    def corridor_stats(self):
+        """
+        Returns the statistics of the transfers sent with transfer_batches, per currency corridor.
+
+        :return: A dictionary mapping each currency to a CorridorStats snapshot.
+        """
+
+        with self.corridors_lock:
+            return {currency: stats.snapshot() for currency, stats in self.corridors.items()}
+
+    def transfer_batches(self, transfers, concurrency=10, timeout=None):
+        """
+        Sends many transfers in parallel, grouped by currency.
+
+        Each currency corridor gets a worker pool of its own, so a slow or failing corridor
+        does not hold the threads of the others. Transfers are pulled from the iterable lazily
+        and each corridor has at most its pool size of transfers in flight; an invalid or
+        failing item produces a TransactionResult carrying the error instead of aborting the run.
+
+        :param transfers: An iterable of transfer parameter dictionaries, as accepted by transfer.
+                          Items without a 'currency' use the configured currency.
+        :param concurrency: The number of workers per corridor: an int, or a dictionary mapping
+                            currencies to their pool size, with None as the key of the default.
+        :param timeout: Optional; Seconds the whole run may take. Past it, no further transfer is
+                        pulled from the iterable and the outstanding ones fail with a TimeoutException.
+        :return: A generator of TransactionResult objects, in completion order.
+        """
+
+        pools = {}
+        pending = {}
+        in_flight = Counter()
+        deadline = Deadline(timeout) if timeout is not None else None
+        send = bind(self.timed_transfer, deadline)
+
+        def drain():
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, params, currency = pending.pop(future)
+                in_flight[currency] -= 1
+                error = future.exception()
+                if error is not None:
+                    yield TransactionResult(index, params, error=error)
+                else:
+                    yield TransactionResult(index, params, transaction_id=future.result())
+
+        try:
+            for index, params in enumerate(transfers):
+                if deadline is not None and deadline.expired:
+                    yield TransactionResult(index, params, error=TimeoutException("Deadline exceeded"))
+                    break
+                currency = params.get('currency') or self.config.currency
+                if isinstance(concurrency, dict):
+                    workers = concurrency.get(currency) or concurrency.get(None) or 10
+                else:
+                    workers = concurrency
+
+                while in_flight[currency] >= workers:
+                    yield from drain()
+
+                pool = pools.get(currency)
+                if pool is None:
+                    pool = pools[currency] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"remittance-{currency}")
+
+                pending[pool.submit(send, currency, params)] = (index, params, currency)
+                in_flight[currency] += 1
+
+            while pending:
+                yield from drain()
+        finally:
+            for future in pending:
+                future.cancel()
+            for pool in pools.values():
+                pool.shutdown()
+
+    def timed_transfer(self, currency, params):
+        """
+        Sends one transfer and records its latency and outcome in the statistics of its corridor.
+
+        :return: The X-Reference-Id of the transfer.
+        """
+
+        started = time.perf_counter()
+        error = None
+        try:
+            return self.transfer(params)['transactionId']
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            finished = time.perf_counter()
+            with self.corridors_lock:
+                stats = self.corridors.get(currency)
+                if stats is None:
+                    stats = self.corridors[currency] = CorridorStats()
+                stats.record(started, finished, error)
@@ -0,0 +1,159 @@
+import argparse
+import json
+import time
+from .config import MTNMoMoConfig
+from .ledger import SQLiteLedger
+from .mtn_momo import TransactionResult
+from .mtn_momo_disbursement import MTNMoMoDisbursement
+from .reconciliation import read_csv, read_jsonl
+from .utilities import Helpers
+
+def read_payouts(path):
+    """
+    Streams the transfers of a payout file.
+
+    A '.jsonl' file holds one JSON object per line; any other file is read as CSV with a header
+    row. Columns: amount, referenceExternalID, numberMoMo, description and note.
+
+    :param path: The path of the payout file.
+    :return: A generator of transfer parameter dictionaries.
+    """
+
+    return read_jsonl(path) if path.endswith('.jsonl') else read_csv(path)
+
+
+class BulkPayout:
+    """
+    Pays a stream of transfers out through a disbursement client, e.g. a payroll or cashback run.
+
+    Transfers are sent concurrently and at most `concurrency` of them are held in memory at
+    once, so the input can be arbitrarily large. The client's ledger is the checkpoint: each
+    referenceExternalID gets its X-Reference-Id recorded before its transfer is sent and is
+    marked PENDING once the provider accepted it. Running the same file again after an
+    interruption skips the transfers already accepted and resends the ones whose outcome is
+    unknown under their original reference, which the provider rejects as duplicates if they
+    had gone through; no payee is paid twice. Without a persistent ledger, e.g. SQLiteLedger,
+    an interrupted run cannot be resumed safely.
+    """
+
+    def __init__(self, disbursement, concurrency=10, limiter=None, validate=False):
+        """
+        :param disbursement: The MTNMoMoDisbursement sending the transfers.
+        :param concurrency: The number of transfers being sent at once.
+        :param limiter: Optional; A TokenBucket capping the transfers per second.
+        :param validate: If True, payees are checked with validate_account_holder before their
+                         first transfer and inactive ones fail without being paid.
+        """
+
+        self.disbursement = disbursement
+        self.concurrency = concurrency
+        self.limiter = limiter
+        self.validate = validate
+
+        self.sent = 0
+        self.skipped = 0
+        self.failed = 0
+        self.started_at = None
+        self.finished_at = None
+
+    def stats(self):
+        """
+        Returns the progress of the run.
+
+        :return: A dictionary with 'sent', 'skipped', 'failed', 'elapsed' and 'throughput',
+                 the number of transfers sent per second.
+        """
+
+        if self.started_at is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        return {
+            'sent': self.sent,
+            'skipped': self.skipped,
+            'failed': self.failed,
+            'elapsed': elapsed,
+            'throughput': self.sent / elapsed if elapsed else 0.0
+        }
+
+    def run(self, transfers, timeout=None):
+        """
+        Pays the transfers out.
+
+        :param transfers: An iterable of transfer parameter dictionaries, as accepted by
+                          MTNMoMoDisbursement.transfer, e.g. read_payouts(path).
+        :param timeout: Optional; Seconds the run may take. Past it, no further transfer is started
+                        and a later run with the same ledger resumes where this one stopped.
+        :return: A generator of TransactionResult objects, in completion order. Transfers
+                 skipped because a previous run already sent them are included.
+        """
+
+        self.started_at = time.monotonic()
+        self.finished_at = None
+
+        for (index, params), future in Helpers.imap_unordered(self.pay, enumerate(transfers), self.concurrency, timeout):
+            error = future.exception()
+            if error is not None:
+                self.failed += 1
+                yield TransactionResult(index, params, error=error)
+                continue
+
+            transaction_id, skipped = future.result()
+            if skipped:
+                self.skipped += 1
+            else:
+                self.sent += 1
+            yield TransactionResult(index, params, transaction_id=transaction_id)
+
+        self.finished_at = time.monotonic()
+
+    def pay(self, item):
+        """
+        Sends one transfer unless a previous run already did.
+
+        :param item: An (index, params) tuple.
+        :return: A tuple (transaction_id, skipped).
+        """
+
+        _, params = item
+        disbursement = self.disbursement
+        disbursement.validate_transfer_params(params)
+
+        ledger = disbursement.ledger
+        if ledger is not None:
+            entry = ledger.get(params['referenceExternalID'])
+            if entry is not None and entry[1] != ledger.RESERVED:
+                return entry[0], True
+
+        if self.validate and not disbursement.validate_account_holder(params['numberMoMo']):
+            raise ValueError(f"{params['numberMoMo']} is not an active account holder")
+
+        if self.limiter is not None:
+            self.limiter.acquire()
+
+        return disbursement.transfer(params)['transactionId'], False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pays out the transfers of a CSV or JSONL file with the Disbursement API')
+    parser.add_argument('path', type=str, help='Payout file: amount, referenceExternalID, numberMoMo, description, note')
+    parser.add_argument('--ledger', type=str, help='SQLite checkpoint (default: the payout file path + .ledger)')
+    parser.add_argument('--concurrency', type=int, default=10, help='Transfers sent at once')
+    parser.add_argument('--validate', action='store_true', help='Check that payees are active account holders first')
+    parser.add_argument('--progress', type=int, default=1000, help='Results between two progress lines')
+    args = parser.parse_args()
+
+    with SQLiteLedger(args.ledger or args.path + '.ledger') as ledger:
+        disbursement = MTNMoMoDisbursement(MTNMoMoConfig(), ledger=ledger)
+        payout = BulkPayout(disbursement, args.concurrency, validate=args.validate)
+
+        for count, result in enumerate(payout.run(read_payouts(args.path)), 1):
+            if not result.ok:
+                print(f"Transfer {result.params.get('referenceExternalID')} failed: {result.error}")
+            if count % args.progress == 0:
+                print(json.dumps(payout.stats()))
+
+        print(json.dumps(payout.stats()))
+
+if __name__ == '__main__':
+    main()
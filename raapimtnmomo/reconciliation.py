@@ -0,0 +1,231 @@
+import csv
+import itertools
+import json
+import os
+import tempfile
+import time
+from decimal import Decimal, InvalidOperation
+import requests
+from .exceptions import (CircuitOpenException, InternalServerErrorException, NotFoundException,
+                         RateLimitExceededException, TimeoutException)
+from .utilities import Helpers
+
+class Discrepancy:
+    """
+    A difference between our books and the provider for one transaction.
+
+    `kind` is one of 'missing', 'status_mismatch', 'amount_mismatch' or 'error'. 'unreachable'
+    is not a difference in the books: the provider could not be asked, and the record should be
+    checked again later.
+    """
+
+    __slots__ = ('kind', 'record', 'actual', 'error')
+
+    MISSING = 'missing'
+    STATUS_MISMATCH = 'status_mismatch'
+    AMOUNT_MISMATCH = 'amount_mismatch'
+    ERROR = 'error'
+    UNREACHABLE = 'unreachable'
+
+    def __init__(self, kind, record, actual=None, error=None):
+        """
+        :param kind: The kind of discrepancy.
+        :param record: The record from our books.
+        :param actual: Optional; The transaction as returned by the provider.
+        :param error: Optional; The exception raised while fetching the transaction.
+        """
+
+        self.kind = kind
+        self.record = record
+        self.actual = actual
+        self.error = error
+
+    def __repr__(self):
+        return f"Discrepancy(kind={self.kind!r}, referenceId={self.record.get('referenceId')!r})"
+
+
+def read_csv(path):
+    """
+    Streams the records of a CSV file with a header row.
+
+    Expected columns: referenceId, and optionally externalId, amount and status.
+
+    :param path: The path of the CSV file.
+    :return: A generator of record dictionaries.
+    """
+
+    with open(path, newline='') as f:
+        yield from csv.DictReader(f)
+
+
+def read_jsonl(path):
+    """
+    Streams the records of a JSON Lines file, one JSON object per line.
+
+    :param path: The path of the JSONL file.
+    :return: A generator of record dictionaries.
+    """
+
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_ledger(ledger):
+    """
+    Streams the entries of a Ledger as records.
+
+    :param ledger: The Ledger to read.
+    :return: A generator of record dictionaries with referenceId, externalId and status.
+    """
+
+    for external_id, reference_id, status in ledger.iter_entries():
+        yield {'referenceId': reference_id, 'externalId': external_id, 'status': status}
+
+
+class Reconciler:
+    """
+    Checks a stream of our transaction records against get_transaction.
+
+    Statuses are fetched concurrently under an optional rate limit, and only discrepancies are
+    yielded. At most `concurrency` records are held in memory at once, so the input can be
+    arbitrarily large. With a checkpoint file, the number of records fully processed is saved
+    as the run progresses and a later run with the same input resumes after it; records that
+    were in flight when a run stopped are checked again.
+
+    A lookup failing with a transient error (TRANSIENT_ERRORS) is retried with exponential
+    backoff. If it still fails, the record is yielded as an 'unreachable' Discrepancy and counted
+    in `unreachable` rather than in `discrepancies`.
+    """
+
+    TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout, InternalServerErrorException,
+                        CircuitOpenException, RateLimitExceededException, TimeoutException)
+
+    def __init__(self, collection, concurrency=10, limiter=None, checkpoint_path=None, checkpoint_every=1000,
+                 retries=3, retry_delay=0.5):
+        """
+        :param collection: The MTNMoMoCollection used to call get_transaction.
+        :param concurrency: The number of status lookups running at once.
+        :param limiter: Optional; A TokenBucket capping the lookups per second.
+        :param checkpoint_path: Optional; The file the progress is saved to and resumed from.
+        :param checkpoint_every: The number of processed records between two checkpoint writes.
+        :param retries: The number of times a lookup failing with a transient error is retried.
+        :param retry_delay: The delay before the first retry, in seconds; it doubles on each retry.
+        """
+
+        self.collection = collection
+        self.concurrency = concurrency
+        self.limiter = limiter
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.retries = retries
+        self.retry_delay = retry_delay
+
+        self.checked = 0
+        self.discrepancies = 0
+        self.unreachable = 0
+
+    def load_checkpoint(self):
+        """
+        Returns the number of records already processed by a previous run.
+        """
+
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return 0
+        with open(self.checkpoint_path) as f:
+            return json.load(f)['processed']
+
+    def save_checkpoint(self, processed):
+        """
+        Atomically writes the number of records processed.
+        """
+
+        directory = os.path.dirname(os.path.abspath(self.checkpoint_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'processed': processed}, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def run(self, records):
+        """
+        Reconciles the records.
+
+        :param records: An iterable of record dictionaries with a 'referenceId' and, optionally,
+                        the expected 'status' and 'amount'.
+        :return: A generator of Discrepancy objects, in completion order.
+        """
+
+        start = self.load_checkpoint()
+        records = itertools.islice(records, start, None)
+
+        # Records complete out of order; the checkpoint only moves past a contiguous prefix.
+        watermark = start
+        completed = set()
+        saved = start
+
+        for (index, record), future in Helpers.imap_unordered(self.check, enumerate(records, start), self.concurrency):
+            discrepancy = future.result()
+            self.checked += 1
+            if discrepancy is not None:
+                if discrepancy.kind == Discrepancy.UNREACHABLE:
+                    self.unreachable += 1
+                else:
+                    self.discrepancies += 1
+                yield discrepancy
+
+            completed.add(index)
+            while watermark in completed:
+                completed.remove(watermark)
+                watermark += 1
+
+            if self.checkpoint_path and watermark - saved >= self.checkpoint_every:
+                self.save_checkpoint(watermark)
+                saved = watermark
+
+        if self.checkpoint_path:
+            self.save_checkpoint(watermark)
+
+    def check(self, item):
+        """
+        Fetches one transaction and compares it with our record.
+
+        :param item: An (index, record) tuple.
+        :return: A Discrepancy, or None if the record matches.
+        """
+
+        _, record = item
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
+            if self.limiter is not None:
+                self.limiter.acquire()
+
+            try:
+                actual = self.collection.get_transaction(record['referenceId'])
+                break
+            except NotFoundException as e:
+                return Discrepancy(Discrepancy.MISSING, record, error=e)
+            except self.TRANSIENT_ERRORS as e:
+                error = e
+            except Exception as e:
+                return Discrepancy(Discrepancy.ERROR, record, error=e)
+        else:
+            return Discrepancy(Discrepancy.UNREACHABLE, record, error=error)
+
+        expected_status = record.get('status')
+        if expected_status and expected_status != actual.get('status'):
+            return Discrepancy(Discrepancy.STATUS_MISMATCH, record, actual)
+
+        expected_amount = record.get('amount')
+        if expected_amount and not self.same_amount(expected_amount, actual.get('amount')):
+            return Discrepancy(Discrepancy.AMOUNT_MISMATCH, record, actual)
+
+        return None
+
+    def same_amount(self, expected, actual):
+        try:
+            return Decimal(str(expected)) == Decimal(str(actual))
+        except InvalidOperation:
+            return str(expected) == str(actual)
@@ -0,0 +1,349 @@
+import argparse
+import gzip
+import json
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit
+from .benchmark import summarize
+from .config import MTNMoMoConfig
+from .mtn_momo_collection import MTNMoMoCollection
+from .requestss import BaseTransport, Request, Transport
+from .stub_server import StubServer
+
+REDACTED = '<redacted>'
+
+# Replaces redacted MSISDNs on replay; a sandbox test number.
+PLACEHOLDER_MSISDN = '46733123450'
+
+# The account holder ID segment of /accountholder/{type}/{id}/..., e.g. an MSISDN.
+ACCOUNT_HOLDER_ID = re.compile(r'(/accountholder/[^/]+/)[^/]+')
+
+def open_log(path, mode):
+    """
+    Opens a traffic log as text, gzip-compressed when the path ends with '.gz'.
+    """
+
+    return gzip.open(path, mode + 't') if path.endswith('.gz') else open(path, mode)
+
+
+def read_recording(path):
+    """
+    Streams the exchanges of a traffic log written by RecordingTransport.
+
+    :param path: The path of the log, optionally gzip-compressed.
+    :return: A generator of exchange dictionaries, in completion order.
+    """
+
+    with open_log(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class RecordingTransport(BaseTransport):
+    """
+    A transport wrapping another one and appending every exchange to a traffic log, one compact
+    JSON object per line: 't' (seconds since the recorder was created, when the request was
+    sent), 'method', 'path', 'headers', 'body', 'status', 'duration', 'response' and 'error'.
+
+    Credentials never reach the log: the Authorization and subscription key headers, matched
+    case-insensitively, and the query string of X-Callback-Url, which may carry the callback
+    secret, are replaced by '<redacted>', as are the JSON fields listed in SECRET_FIELDS, e.g.
+    access tokens, and any field passed as `redact_fields`.
+
+    Personal data is redacted too unless `redact_personal` is False: the account holder IDs
+    (MSISDNs) in request paths and the PERSONAL_FIELDS of bodies, i.e. party IDs and the names,
+    birthdate and gender returned by basicuserinfo. A replay then uses placeholder numbers.
+
+    Give it to a client as its transport; the TokenManager a client creates shares its transport,
+    so token requests are recorded too. Wrapping a ResilientTransport records one exchange per
+    call, while wrapping the transport inside it records every attempt.
+    """
+
+    SECRET_HEADERS = ('authorization', 'ocp-apim-subscription-key')
+    SECRET_FIELDS = ('access_token', 'apiKey')
+    PERSONAL_FIELDS = ('partyId', 'given_name', 'family_name', 'name', 'birthdate', 'gender')
+
+    def __init__(self, path, transport=None, redact_fields=(), record_bodies=True, redact_personal=True):
+        """
+        :param path: The log file, appended to. A path ending with '.gz' is gzip-compressed.
+        :param transport: Optional; The transport sending the requests. Defaults to the shared pooled transport.
+        :param redact_fields: Further JSON fields to redact in request and response bodies.
+        :param record_bodies: If False, request and response bodies are left out of the log.
+        :param redact_personal: If False, account holder IDs and PERSONAL_FIELDS are recorded in clear.
+        """
+
+        self.transport = transport or Request.default_transport()
+        self.file = open_log(path, 'a')
+        self.secret_fields = frozenset(self.SECRET_FIELDS) | frozenset(redact_fields)
+        if redact_personal:
+            self.secret_fields |= frozenset(self.PERSONAL_FIELDS)
+        self.redact_personal = redact_personal
+        self.record_bodies = record_bodies
+        self.started = time.monotonic()
+        self.recorded = 0
+        self.lock = threading.Lock()
+
+    def send(self, method, url, headers, body=None):
+        response = error = None
+        start = time.monotonic()
+        try:
+            response = self.transport.send(method, url, headers, body)
+            return response
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self.record(start, time.monotonic(), method, url, headers, body, response, error)
+
+    def record(self, start, end, method, url, headers, body, response, error):
+        parts = urlsplit(url)
+        path = ACCOUNT_HOLDER_ID.sub(rf'\1{REDACTED}', parts.path) if self.redact_personal else parts.path
+        entry = {
+            't': round(start - self.started, 6),
+            'method': method,
+            'path': path + (f"?{parts.query}" if parts.query else ''),
+            'headers': {name: self.redact_header(name, value) for name, value in headers.items()},
+            'body': self.redact(body) if self.record_bodies else None,
+            'status': response.status_code if response is not None else None,
+            'duration': round(end - start, 6),
+            'response': self.response_data(response) if self.record_bodies else None,
+            'error': error
+        }
+        line = json.dumps(entry, separators=(',', ':')) + '\n'
+
+        with self.lock:
+            self.file.write(line)
+            self.recorded += 1
+
+    def redact_header(self, name, value):
+        name = name.lower()
+        if name in self.SECRET_HEADERS:
+            return REDACTED
+        if name == 'x-callback-url':
+            callback = urlsplit(value)
+            if callback.query:
+                return urlunsplit(callback._replace(query=REDACTED))
+        return value
+
+    def response_data(self, response):
+        if response is None or not response.content:
+            return None
+        try:
+            return self.redact(json.loads(response.content))
+        except ValueError:
+            return response.text
+
+    def redact(self, data):
+        if isinstance(data, dict):
+            return {key: REDACTED if key in self.secret_fields else self.redact(value) for key, value in data.items()}
+        if isinstance(data, list):
+            return [self.redact(value) for value in data]
+        return data
+
+    def close(self):
+        """
+        Flushes and closes the log. The wrapped transport is left open.
+        """
+
+        with self.lock:
+            self.file.close()
+
+
+class Replayer:
+    """
+    Replays a traffic log through an MTNMoMoCollection, at the recorded pace or a multiple of it.
+
+    Recorded request-to-pay creations, status reads, balance reads and account holder lookups
+    are replayed as the matching client operation; the status reads of a replayed creation
+    wait for it and query the transaction it created. Token requests are left to the client's TokenManager and
+    other requests are skipped.
+
+    Calls are started when they are due whether or not earlier ones completed, and latencies
+    are measured from that due time: a client that cannot keep up shows higher latencies rather
+    than a silently stretched schedule.
+    """
+
+    def __init__(self, collection, speed=1.0, concurrency=50):
+        """
+        :param collection: The MTNMoMoCollection driven by the replay, e.g. pointed at a StubServer.
+        :param speed: The replay rate as a multiple of the recorded one.
+        :param concurrency: The maximum number of calls in flight.
+        """
+
+        self.collection = collection
+        self.speed = speed
+        self.concurrency = concurrency
+        self.created = {}
+        self.latencies = {}
+        self.errors = {}
+        self.lag = 0.0
+        self.lock = threading.Lock()
+
+    def operation(self, entry):
+        """
+        Maps a recorded exchange to a collection call.
+
+        :param entry: A recorded exchange.
+        :return: A tuple (operation name, callable), or None if the exchange is not replayed.
+        """
+
+        parts = urlsplit(entry['path']).path.strip('/').split('/')
+        if len(parts) < 3 or parts[0] != self.collection.product or parts[1] != 'v1_0':
+            return None
+
+        method, resource = entry['method'], parts[2]
+        collection = self.collection
+
+        if method == 'POST' and resource == 'requesttopay' and len(parts) == 3:
+            params = self.transaction_params(entry)
+            return 'create_transaction', lambda: collection.create_transaction(params)['transactionId']
+
+        if method == 'GET' and resource == 'requesttopay' and len(parts) == 4:
+            def get_transaction():
+                # Creations are submitted before the reads that follow them, so this never waits on a queued call.
+                creation = self.created.get(parts[3])
+                reference = creation.result() if creation is not None else None
+                return collection.get_transaction(reference or parts[3])
+
+            return 'get_transaction', get_transaction
+
+        if method == 'GET' and resource == 'account' and parts[3:4] == ['balance']:
+            return 'get_account_balance', lambda: collection.get_account_balance(parts[4] if len(parts) > 4 else None)
+
+        if method == 'GET' and resource == 'accountholder' and len(parts) == 6:
+            return 'get_basic_user_info', lambda: collection.get_basic_user_info(self.unredacted(parts[4]))
+
+        return None
+
+    def unredacted(self, msisdn):
+        return PLACEHOLDER_MSISDN if msisdn == REDACTED else msisdn
+
+    def transaction_params(self, entry):
+        body = entry.get('body') or {}
+        payer = body.get('payer') or {}
+        params = {
+            'amount': body.get('amount', '1'),
+            'referenceExternalID': body.get('externalId', 'replay'),
+            'numberMoMo': self.unredacted(payer.get('partyId', '0')),
+            'description': body.get('payerMessage', 'replay'),
+            'note': body.get('payeeNote', 'replay')
+        }
+        if entry['headers'].get('X-Callback-Url'):
+            params['callbackUrl'] = entry['headers']['X-Callback-Url']
+        return params
+
+    def run(self, entries):
+        """
+        Replays the exchanges.
+
+        :param entries: The recorded exchanges, e.g. read_recording(path), in any order.
+        :return: A dictionary with the 'replayed' and 'skipped' counts, the 'target_rps' implied
+                 by the recording and the speed, the achieved 'rps', the 'elapsed' seconds, the
+                 worst 'lag' in seconds behind schedule, and a summary per operation and in 'total'
+                 with 'count', 'errors', 'rps' and the 'p50', 'p95' and 'p99' latencies in milliseconds.
+        """
+
+        self.created, self.latencies, self.errors, self.lag = {}, {}, {}, 0.0
+
+        calls = []
+        skipped = 0
+        for entry in sorted(entries, key=lambda entry: entry['t']):
+            call = self.operation(entry)
+            if call is None:
+                skipped += 1
+            else:
+                calls.append((entry['t'], entry['headers'].get('X-Reference-Id'), call))
+
+        if not calls:
+            return {'replayed': 0, 'skipped': skipped, 'target_rps': 0.0, 'rps': 0.0, 'elapsed': 0.0,
+                    'lag': 0.0, 'operations': {}, 'total': summarize([], 0.0)}
+
+        origin = calls[0][0]
+        span = (calls[-1][0] - origin) / self.speed
+        start = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for t, recorded_reference, (name, call) in calls:
+                due = start + (t - origin) / self.speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                future = executor.submit(self.timed, name, call, due)
+                if name == 'create_transaction' and recorded_reference:
+                    self.created[recorded_reference] = future
+
+        elapsed = time.monotonic() - start
+        operations = {name: summarize(latencies, elapsed, self.errors.get(name, 0)) for name, latencies in self.latencies.items()}
+        for name, errors in self.errors.items():
+            operations.setdefault(name, summarize([], elapsed, errors))
+
+        total = summarize([latency for latencies in self.latencies.values() for latency in latencies], elapsed, sum(self.errors.values()))
+        return {
+            'replayed': len(calls),
+            'skipped': skipped,
+            'target_rps': len(calls) / span if span else 0.0,
+            'rps': total['count'] / elapsed if elapsed else 0.0,
+            'elapsed': elapsed,
+            'lag': self.lag,
+            'operations': operations,
+            'total': total
+        }
+
+    def timed(self, name, call, due):
+        """
+        Runs a call and records its latency from its due time, or its failure.
+
+        :return: The result of the call, or None if it raised.
+        """
+
+        started = time.monotonic()
+        try:
+            result = call()
+        except Exception:
+            with self.lock:
+                self.errors[name] = self.errors.get(name, 0) + 1
+                self.lag = max(self.lag, started - due)
+            return None
+
+        latency = time.monotonic() - due
+        with self.lock:
+            self.latencies.setdefault(name, []).append(latency)
+            self.lag = max(self.lag, started - due)
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replays a recorded traffic log through the collection client')
+    parser.add_argument('path', type=str, help='Traffic log written by RecordingTransport (.jsonl or .jsonl.gz)')
+    parser.add_argument('--speed', type=float, default=1.0, help='Replay rate as a multiple of the recorded one')
+    parser.add_argument('--concurrency', type=int, default=50, help='Calls in flight at most')
+    parser.add_argument('--host', type=str, help='Base URL to replay against (default: a local stub server)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Stub server latency, in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Stub server random extra latency, in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of stub responses answered with 500')
+    args = parser.parse_args()
+
+    def replay(host):
+        config = MTNMoMoConfig(host=host, token_dir=tempfile.mkdtemp())
+        with Transport(pool_maxsize=args.concurrency) as transport:
+            collection = MTNMoMoCollection(config, transport=transport)
+            return Replayer(collection, args.speed, args.concurrency).run(read_recording(args.path))
+
+    if args.host:
+        report = replay(args.host)
+    else:
+        with StubServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate) as server:
+            report = replay(server.host)
+
+    print(f"{report['replayed']} calls replayed at {args.speed}x in {report['elapsed']:.2f}s ({report['skipped']} skipped): "
+          f"{report['rps']:.0f} req/s for a target of {report['target_rps']:.0f}, worst lag {report['lag'] * 1000:.1f} ms")
+    print(f"{'operation':<20} {'count':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for name, summary in list(report['operations'].items()) + [('total', report['total'])]:
+        print(f"{name:<20} {summary['count']:>7} {summary['p50']:>8.2f} {summary['p95']:>8.2f} {summary['p99']:>8.2f} {summary['errors']:>7}")
+
+if __name__ == '__main__':
+    main()
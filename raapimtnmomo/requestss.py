@@ -1,37 +1,461 @@
+import asyncio
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from .deadline import Deadline
+from .exceptions import TimeoutException
+from .instrumentation import Instrumentation
 
-class Request:
+class BaseTransport:
     """
-    A utility class for making HTTP GET and POST requests.
+    Base class of the synchronous transports.
+
+    Subclasses implement `send`; POST and GET responses are decoded the same way for all of them,
+    and a requests.Timeout raised by `send` surfaces as a TimeoutException.
     """
-    
-    @staticmethod
-    def request_post(url, headers, body=None):
+
+    def send(self, method, url, headers, body=None):
         """
-        Sends a POST request to the specified URL with the provided headers and optional body.
-        
+        Sends an HTTP request.
+
+        :param method: The HTTP method, 'GET' or 'POST'.
+        :param url: The target URL.
+        :param headers: A dictionary of HTTP headers to include in the request.
+        :param body: An optional JSON payload to send with the request.
+        :return: The requests.Response.
+        """
+
+        raise NotImplementedError
+
+    def post(self, url, headers, body=None):
+        """
+        Sends a POST request.
+
         :param url: The target URL for the POST request.
         :param headers: A dictionary of HTTP headers to include in the request.
         :param body: An optional JSON payload to send with the request.
         :return: A tuple containing the status code and the response data (JSON or text based on Content-Type).
         """
-        
-        response = requests.post(url, headers=headers, json=body)
-        
+
+        if Instrumentation.hooks:
+            return self.instrumented_exchange('POST', url, headers, body, self.decode_post)
+
+        return self.decode_post(self.transmit('POST', url, headers, body))
+
+    def decode_post(self, response):
         if response.headers.get('Content-Type') == 'application/json':
             return response.status_code, response.json()
         else:
             return response.status_code, response.text
 
+    def get(self, url, headers):
+        """
+        Sends a GET request.
+
+        :param url: The target URL for the GET request.
+        :param headers: A dictionary of HTTP headers to include in the request.
+        :return: A tuple containing the status code and the JSON response data.
+        """
+
+        if Instrumentation.hooks:
+            return self.instrumented_exchange('GET', url, headers, None, self.decode_get)
+
+        return self.decode_get(self.transmit('GET', url, headers))
+
+    def decode_get(self, response):
+        return response.status_code, response.json()
+
+    def get_raw(self, url, headers):
+        """
+        Sends a GET request without decoding the response body, for the lazily parsed models.
+
+        :param url: The target URL for the GET request.
+        :param headers: A dictionary of HTTP headers to include in the request.
+        :return: A tuple containing the status code and the response body as bytes.
+        """
+
+        if Instrumentation.hooks:
+            return self.instrumented_exchange('GET', url, headers, None, self.decode_raw)
+
+        return self.decode_raw(self.transmit('GET', url, headers))
+
+    def decode_raw(self, response):
+        return response.status_code, response.content
+
+    def transmit(self, method, url, headers, body=None):
+        """
+        Sends a request, raising a TimeoutException when the transport times out.
+
+        :return: The requests.Response.
+        :raises TimeoutException: If the connection or the response timed out, or the current deadline passed.
+        """
+
+        try:
+            return self.send(method, url, headers, body)
+        except requests.Timeout as e:
+            raise TimeoutException(f"{method} {url} timed out: {e}") from e
+
+    def instrumented_exchange(self, method, url, headers, body, decode):
+        """
+        Sends a request and decodes its response, emitting an 'http.request' event that
+        separates the round trip from the body decoding.
+
+        :param decode: decode_post or decode_get.
+        :return: A tuple containing the status code and the response data.
+        """
+
+        status = decode_time = error = None
+        start = time.perf_counter()
+        try:
+            response = self.transmit(method, url, headers, body)
+            received = time.perf_counter()
+            status = response.status_code
+            result = decode(response)
+            decode_time = time.perf_counter() - received
+            return result
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            duration = (received if status is not None else time.perf_counter()) - start
+            Instrumentation.emit('http.request', method=method, url=url, status=status,
+                                 duration=duration, decode=decode_time, error=error)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class Transport(BaseTransport):
+    """
+    A pooled keep-alive HTTP transport shared by the MTN MoMo clients and the TokenManager.
+
+    A single Transport keeps one requests.Session whose connection pools are reused across
+    calls, so consecutive requests to the same host skip the TCP and TLS handshakes.
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, connect_timeout=5.0, read_timeout=30.0):
+        """
+        Initializes the transport and its pooled session.
+
+        :param pool_connections: The number of distinct hosts to keep connection pools for.
+        :param pool_maxsize: The maximum number of keep-alive connections kept per host.
+        :param connect_timeout: Seconds to wait for a connection to be established.
+        :param read_timeout: Seconds to wait for the server to send a response.
+        """
+
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.session = self._create_session()
+
+    def _create_session(self):
+        """
+        Builds a requests.Session with HTTP and HTTPS adapters sized from the pool settings.
+
+        :return: The configured requests.Session.
+        """
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    @property
+    def timeout(self):
+        """
+        The (connect, read) timeout tuple passed to requests made without a deadline.
+        """
+
+        return (self.connect_timeout, self.read_timeout)
+
+    def send(self, method, url, headers, body=None):
+        """
+        Sends an HTTP request over the pooled session.
+
+        :param method: The HTTP method, 'GET' or 'POST'.
+        :param url: The target URL.
+        :param headers: A dictionary of HTTP headers to include in the request.
+        :param body: An optional JSON payload to send with the request.
+        :return: The requests.Response.
+        :raises TimeoutException: If the current deadline has already passed.
+
+        Under a Deadline, the connect and read timeouts are capped at the time left.
+        """
+
+        timeout = self.timeout
+        deadline = Deadline.current()
+        if deadline is not None:
+            remaining = deadline.check()
+            timeout = (min(self.connect_timeout, remaining), min(self.read_timeout, remaining))
+
+        return self.session.request(method, url, headers=headers, json=body, timeout=timeout)
+
+    def close(self):
+        """
+        Closes the session and every pooled connection it holds.
+        """
+
+        self.session.close()
+
+
+class AsyncTransport:
+    """
+    A pooled keep-alive HTTP transport for asyncio clients, backed by aiohttp.
+
+    Requires the optional aiohttp dependency. The underlying session is created lazily on the
+    first request, so the transport can be built outside of a running event loop.
+    """
+
+    def __init__(self, pool_maxsize=100, pool_maxsize_per_host=0, connect_timeout=5.0, read_timeout=30.0):
+        """
+        Initializes the transport.
+
+        :param pool_maxsize: The maximum number of simultaneous connections across all hosts.
+        :param pool_maxsize_per_host: The maximum number of simultaneous connections per host. 0 means no per-host limit.
+        :param connect_timeout: Seconds to wait for a connection to be established.
+        :param read_timeout: Seconds to wait for the server to send a response.
+        :raises ImportError: If aiohttp is not installed.
+        """
+
+        try:
+            import aiohttp
+        except ImportError as e:
+            raise ImportError("AsyncTransport requires aiohttp: pip install aiohttp") from e
+
+        self.aiohttp = aiohttp
+        self.pool_maxsize = pool_maxsize
+        self.pool_maxsize_per_host = pool_maxsize_per_host
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.session = None
+
+    def get_session(self):
+        """
+        Returns the aiohttp session, creating it on first use.
+
+        :return: The aiohttp.ClientSession.
+        """
+
+        if self.session is None or self.session.closed:
+            connector = self.aiohttp.TCPConnector(limit=self.pool_maxsize, limit_per_host=self.pool_maxsize_per_host)
+            timeout = self.aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=self.read_timeout)
+            self.session = self.aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self.session
+
+    async def post(self, url, headers, body=None):
+        """
+        Sends a POST request over the pooled session.
+
+        :param url: The target URL for the POST request.
+        :param headers: A dictionary of HTTP headers to include in the request.
+        :param body: An optional JSON payload to send with the request.
+        :return: A tuple containing the status code and the response data (JSON or text based on Content-Type).
+        """
+
+        if Instrumentation.hooks:
+            return await self.instrumented_exchange('POST', url, lambda timing: self.exchange_post(url, headers, body, timing))
+        return await self.within_deadline(self.exchange_post(url, headers, body), 'POST', url)
+
+    async def exchange_post(self, url, headers, body, timing=None):
+        async with self.get_session().post(url, headers=headers, json=body) as response:
+            if timing is not None:
+                await self.receive(response, timing)
+            if response.headers.get('Content-Type') == 'application/json':
+                return response.status, await response.json()
+            else:
+                return response.status, await response.text()
+
+    async def get(self, url, headers):
+        """
+        Sends a GET request over the pooled session.
+
+        :param url: The target URL for the GET request.
+        :param headers: A dictionary of HTTP headers to include in the request.
+        :return: A tuple containing the status code and the JSON response data.
+        """
+
+        if Instrumentation.hooks:
+            return await self.instrumented_exchange('GET', url, lambda timing: self.exchange_get(url, headers, timing))
+        return await self.within_deadline(self.exchange_get(url, headers), 'GET', url)
+
+    async def exchange_get(self, url, headers, timing=None):
+        async with self.get_session().get(url, headers=headers) as response:
+            if timing is not None:
+                await self.receive(response, timing)
+            return response.status, await response.json(content_type=None)
+
+    async def receive(self, response, timing):
+        """
+        Reads a response body ahead of its decoding, recording the status and the time it was
+        fully received in `timing`. The decoding then reads the buffered body.
+        """
+
+        await response.read()
+        timing.extend((response.status, time.perf_counter()))
+
+    async def instrumented_exchange(self, method, url, exchange):
+        """
+        Awaits an exchange within the deadline, emitting an 'http.request' event that separates
+        the round trip from the body decoding, like BaseTransport.instrumented_exchange.
+
+        :param exchange: A callable taking the timing list passed to `receive` and returning the exchange coroutine.
+        :return: A tuple containing the status code and the response data.
+        """
+
+        timing = []
+        decode_time = error = None
+        start = time.perf_counter()
+        try:
+            result = await self.within_deadline(exchange(timing), method, url)
+            decode_time = time.perf_counter() - timing[1]
+            return result
+        except (Exception, asyncio.CancelledError) as e:
+            # A cancellation, e.g. by the deadline of the calling operation, is reported too.
+            error = type(e).__name__
+            raise
+        finally:
+            status, received = timing if timing else (None, time.perf_counter())
+            Instrumentation.emit('http.request', method=method, url=url, status=status,
+                                 duration=received - start, decode=decode_time, error=error)
+
+    async def within_deadline(self, exchange, method, url):
+        """
+        Awaits an exchange, bounded by the current deadline.
+
+        :raises TimeoutException: If the exchange timed out or the deadline passed.
+        """
+
+        deadline = Deadline.current()
+        try:
+            if deadline is None:
+                return await exchange
+            return await asyncio.wait_for(exchange, deadline.check())
+        except asyncio.TimeoutError as e:
+            raise TimeoutException(f"{method} {url} timed out") from e
+        finally:
+            exchange.close()
+
+    async def close(self):
+        """
+        Closes the session and every pooled connection it holds.
+        """
+
+        if self.session is not None:
+            await self.session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+
+class RequestTemplate:
+    """
+    The parts of an API request that are the same on every call of an operation: its URL and
+    its static headers, e.g. the subscription key and the target environment. Templates are
+    compiled once per client; each call copies the headers and fills in the dynamic ones.
+    """
+
+    __slots__ = ('url', 'headers')
+
+    def __init__(self, url, headers):
+        """
+        :param url: The URL of the operation, without path parameters.
+        :param headers: The static headers. They are copied and never modified afterwards.
+        """
+
+        self.url = url
+        self.headers = dict(headers)
+
+    def fill(self, access_token, x_reference_id=None):
+        """
+        Builds the headers of one call.
+
+        :param access_token: The bearer token of the call.
+        :param x_reference_id: Optional; The X-Reference-Id of the call.
+        :return: A new dictionary of HTTP headers.
+        """
+
+        headers = self.headers.copy()
+        headers['Authorization'] = 'Bearer ' + access_token
+        if x_reference_id is not None:
+            headers['X-Reference-Id'] = x_reference_id
+        return headers
+
+
+class Request:
+    """
+    A utility class for making HTTP GET and POST requests.
+
+    Calls go through a process-wide default Transport unless another one is passed explicitly.
+    """
+
+    _default_transport = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def default_transport(cls):
+        """
+        Returns the shared default Transport, creating it on first use.
+
+        :return: The process-wide Transport instance.
+        """
+
+        if cls._default_transport is None:
+            with cls._lock:
+                if cls._default_transport is None:
+                    cls._default_transport = Transport()
+        return cls._default_transport
+
+    @staticmethod
+    def request_post(url, headers, body=None, transport=None):
+        """
+        Sends a POST request to the specified URL with the provided headers and optional body.
+
+        :param url: The target URL for the POST request.
+        :param headers: A dictionary of HTTP headers to include in the request.
+        :param body: An optional JSON payload to send with the request.
+        :param transport: Optional; The Transport to send the request with. Defaults to the shared transport.
+        :return: A tuple containing the status code and the response data (JSON or text based on Content-Type).
+        """
+
+        transport = transport or Request.default_transport()
+        return transport.post(url, headers, body)
+
     @staticmethod
-    def request_get(url, headers):
+    def request_get(url, headers, transport=None):
         """
         Sends a GET request to the specified URL with the provided headers.
-        
+
         :param url: The target URL for the GET request.
         :param headers: A dictionary of HTTP headers to include in the request.
+        :param transport: Optional; The Transport to send the request with. Defaults to the shared transport.
         :return: A tuple containing the status code and the JSON response data.
         """
-        
-        response = requests.get(url, headers=headers)
-        return response.status_code, response.json()
+
+        transport = transport or Request.default_transport()
+        return transport.get(url, headers)
+
+    @staticmethod
+    def request_get_raw(url, headers, transport=None):
+        """
+        Sends a GET request to the specified URL and returns the undecoded response body.
+
+        :param url: The target URL for the GET request.
+        :param headers: A dictionary of HTTP headers to include in the request.
+        :param transport: Optional; The Transport to send the request with. Defaults to the shared transport.
+        :return: A tuple containing the status code and the response body as bytes.
+        """
+
+        transport = transport or Request.default_transport()
+        return transport.get_raw(url, headers)
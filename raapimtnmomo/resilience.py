@@ -0,0 +1,557 @@
+import email.utils
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+import requests
+from .deadline import Deadline, bind
+from .exceptions import CircuitOpenException, RateLimitExceededException, TimeoutException
+from .requestss import BaseTransport, Request
+
+class TokenBucket:
+    """
+    A thread-safe token bucket allowing `rate` operations per second with bursts of up to `burst`.
+    """
+
+    def __init__(self, rate, burst=None):
+        """
+        :param rate: The sustained number of operations per second.
+        :param burst: The bucket capacity. Defaults to `rate`.
+        """
+
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(rate, 1))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Takes one token, possibly going into debt.
+
+        :return: The number of seconds the caller must wait before proceeding.
+        """
+
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def release(self):
+        """
+        Gives back a token taken by reserve() that will not be used.
+        """
+
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+    def acquire(self, max_wait=None):
+        """
+        Takes one token, sleeping until it is available. The wait never runs past the current
+        Deadline: a token that would only come after it is given back straight away.
+
+        :param max_wait: Optional; The maximum number of seconds to wait.
+        :return: The number of seconds waited.
+        :raises RateLimitExceededException: If the token is not available within `max_wait`.
+        :raises TimeoutException: If the token is not available before the current deadline.
+        """
+
+        deadline = Deadline.current()
+        wait = self.reserve()
+        if max_wait is not None and wait > max_wait:
+            self.release()
+            raise RateLimitExceededException(f"Rate limit of {self.rate:g}/s exceeded")
+        if deadline is not None and (deadline.expired or wait >= deadline.remaining()):
+            self.release()
+            raise TimeoutException(f"Deadline exceeded waiting for the rate limit of {self.rate:g}/s")
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class RateLimiter:
+    """
+    A set of token buckets, one per (product, subscription key) pair.
+    """
+
+    def __init__(self, rate, burst=None, rates=None, max_wait=None):
+        """
+        :param rate: The default number of requests per second for each pair.
+        :param burst: The default burst size for each pair.
+        :param rates: Optional; A dictionary mapping a product to its own (rate, burst) tuple.
+        :param max_wait: Optional; The maximum number of seconds a request waits for its turn.
+        """
+
+        self.rate = rate
+        self.burst = burst
+        self.rates = rates or {}
+        self.max_wait = max_wait
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, product, subscription_key):
+        key = (product, subscription_key)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            rate, burst = self.rates.get(product, (self.rate, self.burst))
+            with self.lock:
+                bucket = self.buckets.setdefault(key, TokenBucket(rate, burst))
+        return bucket
+
+    def acquire(self, product, subscription_key):
+        """
+        Waits for the turn of a request.
+
+        :return: The number of seconds waited.
+        :raises RateLimitExceededException: If waiting would exceed `max_wait`.
+        :raises TimeoutException: If waiting would exceed the current deadline.
+        """
+
+        return self.bucket(product, subscription_key).acquire(self.max_wait)
+
+
+class RetryPolicy:
+    """
+    Decides whether and when a failed request is retried.
+
+    GET requests are always retriable. A POST is only retried when resending it cannot create a
+    second resource: when it carries an X-Reference-Id header, which is resent unchanged, or
+    when it targets the token endpoint.
+    """
+
+    def __init__(self, max_attempts=3, base_delay=0.2, max_delay=10.0, retry_statuses=(429, 500, 502, 503, 504), respect_retry_after=True):
+        """
+        :param max_attempts: The maximum number of attempts, including the first one.
+        :param base_delay: The base of the exponential backoff, in seconds.
+        :param max_delay: The upper bound of a single backoff delay, in seconds.
+        :param retry_statuses: The HTTP status codes considered transient.
+        :param respect_retry_after: Whether to wait at least as long as the Retry-After response header asks.
+        """
+
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = frozenset(retry_statuses)
+        self.respect_retry_after = respect_retry_after
+
+    def is_retriable_request(self, method, url, headers):
+        return method == 'GET' or 'X-Reference-Id' in headers or url.endswith('/token/')
+
+    def delay(self, attempt, response=None):
+        """
+        Computes the delay before the next attempt using full-jitter exponential backoff.
+
+        :param attempt: The number of attempts made so far.
+        :param response: Optional; The failed response, whose Retry-After header is honoured.
+        :return: The delay in seconds.
+        """
+
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+        if self.respect_retry_after and response is not None:
+            retry_after = self.retry_after(response)
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+
+        return delay
+
+    def retry_after(self, response):
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class CircuitBreaker:
+    """
+    Fails fast while the upstream is down.
+
+    After `failure_threshold` consecutive failures the circuit opens and requests are rejected
+    for `recovery_timeout` seconds. Then a single trial request is let through: its success
+    closes the circuit, its failure opens it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30.0):
+        """
+        :param failure_threshold: The number of consecutive failures opening the circuit.
+        :param recovery_timeout: Seconds the circuit stays open before a trial request.
+        """
+
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """
+        Checks that a request may be sent.
+
+        :raises CircuitOpenException: If the circuit is open.
+        """
+
+        with self.lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return
+        raise CircuitOpenException("Circuit open: the MTN MoMo API is failing, request not sent")
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.trial_in_flight = False
+
+    def release(self):
+        """
+        Ends a trial request without an outcome, e.g. one whose deadline passed before it was
+        sent. The circuit stays half-open and the next request becomes the trial.
+        """
+
+        with self.lock:
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class ResilientTransport(BaseTransport):
+    """
+    A transport wrapping another one with rate limiting, retries and a circuit breaker.
+
+    Every policy is optional. Counters are available from `stats()`, and an optional listener
+    is called with (event, info) for 'throttled', 'retry', 'rejected', 'failure' and
+    'deduplicated' events. Closing it leaves the wrapped transport open, as it may be shared.
+    """
+
+    def __init__(self, transport=None, limiter=None, retry=None, breaker=None, listener=None):
+        """
+        :param transport: Optional; The transport sending the requests. Defaults to the shared pooled transport.
+        :param limiter: Optional; A RateLimiter throttling requests per product and subscription key.
+        :param retry: Optional; The RetryPolicy. Defaults to RetryPolicy().
+        :param breaker: Optional; A CircuitBreaker.
+        :param listener: Optional; A callable notified of resilience events.
+        """
+
+        self.transport = transport or Request.default_transport()
+        self.limiter = limiter
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.breaker = breaker
+        self.listener = listener
+        self.counters = {'requests': 0, 'retry': 0, 'throttled': 0, 'rejected': 0, 'failure': 0, 'deduplicated': 0}
+        self.lock = threading.Lock()
+
+    def stats(self):
+        """
+        Returns a snapshot of the counters and of the circuit state.
+        """
+
+        stats = dict(self.counters)
+        stats['circuit'] = self.breaker.state if self.breaker is not None else None
+        return stats
+
+    def emit(self, event, **info):
+        with self.lock:
+            self.counters[event] += 1
+        if self.listener is not None:
+            self.listener(event, info)
+
+    def send(self, method, url, headers, body=None):
+        """
+        Sends a request through the configured policies.
+
+        A POST carrying an X-Reference-Id that answers 409 on a retry means an earlier attempt
+        reached the provider; the original 202 Accepted is returned in that case.
+
+        :raises CircuitOpenException: If the circuit breaker is open.
+        :raises RateLimitExceededException: If the limiter cannot grant a slot in time.
+        """
+
+        with self.lock:
+            self.counters['requests'] += 1
+
+        retriable = self.retry.is_retriable_request(method, url, headers)
+        attempt = 0
+
+        while True:
+            attempt += 1
+
+            if self.limiter is not None:
+                product = urlsplit(url).path.split('/')[1]
+                waited = self.limiter.acquire(product, headers.get('Ocp-Apim-Subscription-Key'))
+                if waited:
+                    self.emit('throttled', method=method, url=url, waited=waited)
+
+            if self.breaker is not None:
+                try:
+                    self.breaker.allow()
+                except CircuitOpenException:
+                    self.emit('rejected', method=method, url=url)
+                    raise
+
+            try:
+                response = self.transport.send(method, url, headers, body)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.record_failure(method, url, e)
+                if not retriable or attempt >= self.retry.max_attempts:
+                    raise
+                self.sleep_before_retry(method, url, attempt, error=e)
+                continue
+            except BaseException as e:
+                # Every outcome must reach the breaker, or a half-open trial stays in flight forever.
+                if isinstance(e, Exception) and not isinstance(e, TimeoutException):
+                    self.record_failure(method, url, e)
+                elif self.breaker is not None:
+                    # A deadline that passed before sending, or an interrupt, says nothing about the upstream.
+                    self.breaker.release()
+                raise
+
+            if response.status_code >= 500:
+                self.record_failure(method, url, response.status_code)
+            elif self.breaker is not None:
+                self.breaker.record_success()
+
+            if response.status_code == 409 and method == 'POST' and attempt > 1 and 'X-Reference-Id' in headers:
+                self.emit('deduplicated', method=method, url=url, reference_id=headers['X-Reference-Id'])
+                return self.accepted(response)
+
+            if response.status_code in self.retry.retry_statuses and retriable and attempt < self.retry.max_attempts:
+                self.sleep_before_retry(method, url, attempt, response=response)
+                continue
+
+            return response
+
+    def record_failure(self, method, url, error):
+        if self.breaker is not None:
+            self.breaker.record_failure()
+        self.emit('failure', method=method, url=url, error=error)
+
+    def sleep_before_retry(self, method, url, attempt, response=None, error=None):
+        delay = self.retry.delay(attempt, response)
+        status = response.status_code if response is not None else None
+        deadline = Deadline.current()
+        if deadline is not None and delay >= deadline.check():
+            raise TimeoutException(f"Deadline exceeded before retrying {method} {url}")
+        self.emit('retry', method=method, url=url, attempt=attempt, delay=delay, status=status, error=error)
+        time.sleep(delay)
+
+    def accepted(self, conflict):
+        response = requests.Response()
+        response.status_code = 202
+        response.url = conflict.url
+        response.request = conflict.request
+        response._content = b''
+        return response
+
+
+class EndpointLatency:
+    """
+    The recent latencies of one endpoint and the hedging delay derived from them.
+    """
+
+    __slots__ = ('samples', 'delay', 'fresh')
+
+    def __init__(self, sample_size):
+        self.samples = deque(maxlen=sample_size)
+        self.delay = None
+        self.fresh = 0
+
+
+class HedgingTransport(BaseTransport):
+    """
+    A transport wrapping another one that hedges GET requests, i.e. the read operations such as
+    get_transaction, get_account_balance and get_basic_user_info, which are idempotent.
+
+    When a GET has not answered within the `percentile` latency of the recent requests to the
+    same endpoint, an identical request is sent and whichever answers first is returned. The other
+    one is cancelled if it has not started yet and dropped otherwise. Hedges are paid for from a
+    budget: every GET adds `budget` to a bucket holding at most `burst`, and each hedge takes one,
+    so about `budget` of the requests are hedged at most. Endpoints are not hedged until
+    `min_samples` of their latencies are known. Other methods pass through unchanged.
+
+    Hedges need connections of their own: size the wrapped transport accordingly, e.g.
+    Transport(pool_maxsize=2 * concurrency). Counters, the hedge rate and the latency saved are
+    available from `stats()`.
+    """
+
+    def __init__(self, transport=None, percentile=95, budget=0.05, burst=10, min_delay=0.005, min_samples=50, sample_size=1000, max_workers=64):
+        """
+        :param transport: Optional; The transport sending the requests. Defaults to the shared pooled transport.
+        :param percentile: The latency percentile of an endpoint after which a request is hedged.
+        :param budget: The fraction of GET requests that may be hedged.
+        :param burst: The number of hedges that may be sent in a row.
+        :param min_delay: The shortest hedging delay, in seconds.
+        :param min_samples: The number of latencies of an endpoint needed before hedging it.
+        :param sample_size: The number of recent latencies kept per endpoint.
+        :param max_workers: The number of threads sending hedged requests.
+        """
+
+        self.transport = transport or Request.default_transport()
+        self.percentile = percentile
+        self.budget = budget
+        self.burst = float(burst)
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.sample_size = sample_size
+        self.latencies = {}
+        self.tokens = self.burst
+        self.counters = {'requests': 0, 'hedged': 0, 'hedge_wins': 0}
+        self.saved = 0.0
+        self.saved_count = 0
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hedge')
+        self.lock = threading.Lock()
+
+    def stats(self):
+        """
+        Returns a snapshot of the counters.
+
+        :return: A dictionary with the 'requests' (GETs), 'hedged' and 'hedge_wins' counts, the
+                 'hedge_rate', the mean latency 'saved' per hedge win in milliseconds, the
+                 'saved_total' in seconds, and the current hedging 'delays' per endpoint in milliseconds.
+        """
+
+        with self.lock:
+            stats = dict(self.counters)
+            stats['hedge_rate'] = stats['hedged'] / stats['requests'] if stats['requests'] else 0.0
+            stats['saved'] = self.saved / self.saved_count * 1000 if self.saved_count else 0.0
+            stats['saved_total'] = self.saved
+            stats['delays'] = {'/'.join(endpoint): latency.delay * 1000 for endpoint, latency in self.latencies.items() if latency.delay is not None}
+            return stats
+
+    def endpoint(self, url):
+        """
+        Identifies the endpoint of a URL: its product, version and resource, without path parameters.
+        """
+
+        return tuple(urlsplit(url).path.split('/')[1:4])
+
+    def hedge_delay(self, endpoint):
+        """
+        Counts a GET request, credits the hedging budget and returns the delay after which the
+        request is hedged.
+
+        :return: The delay in seconds, or None if the request must not be hedged.
+        """
+
+        with self.lock:
+            self.counters['requests'] += 1
+            self.tokens = min(self.burst, self.tokens + self.budget)
+            latency = self.latencies.get(endpoint)
+            if latency is None or self.tokens < 1:
+                return None
+            return latency.delay
+
+    def observe(self, endpoint, duration):
+        """
+        Records the latency of one request and refreshes the hedging delay of its endpoint every
+        tenth of `sample_size` observations.
+        """
+
+        with self.lock:
+            latency = self.latencies.get(endpoint)
+            if latency is None:
+                latency = self.latencies[endpoint] = EndpointLatency(self.sample_size)
+            latency.samples.append(duration)
+            latency.fresh += 1
+
+            samples = len(latency.samples)
+            if samples >= self.min_samples and (latency.delay is None or latency.fresh >= max(1, self.sample_size // 10)):
+                ordered = sorted(latency.samples)
+                latency.delay = max(self.min_delay, ordered[min(samples - 1, int(self.percentile / 100 * samples))])
+                latency.fresh = 0
+
+    def attempt(self, endpoint, method, url, headers):
+        start = time.perf_counter()
+        response = self.transport.send(method, url, headers)
+        answered = time.perf_counter()
+        self.observe(endpoint, answered - start)
+        return response, answered
+
+    def send(self, method, url, headers, body=None):
+        if method != 'GET':
+            return self.transport.send(method, url, headers, body)
+
+        endpoint = self.endpoint(url)
+        delay = self.hedge_delay(endpoint)
+        if delay is None:
+            return self.attempt(endpoint, method, url, headers)[0]
+
+        # Attempts run on the pool, under the caller's Deadline.
+        attempt = bind(self.attempt)
+        primary = self.executor.submit(attempt, endpoint, method, url, headers)
+        if wait([primary], timeout=delay).done:
+            return primary.result()[0]
+
+        with self.lock:
+            if self.tokens < 1:
+                hedge = None
+            else:
+                self.tokens -= 1
+                self.counters['hedged'] += 1
+                hedge = self.executor.submit(attempt, endpoint, method, url, headers)
+        if hedge is None:
+            return primary.result()[0]
+
+        winner = None
+        pending = {primary, hedge}
+        while winner is None and pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            succeeded = [future for future in (primary, hedge) if future in done and future.exception() is None]
+            winner = succeeded[0] if succeeded else None
+
+        if winner is None:
+            # Both attempts failed: report the primary's error.
+            return primary.result()[0]
+
+        response, answered = winner.result()
+        if winner is hedge:
+            with self.lock:
+                self.counters['hedge_wins'] += 1
+            primary.add_done_callback(lambda future: self.record_saved(future, answered))
+        else:
+            hedge.cancel()
+        return response
+
+    def record_saved(self, primary, answered):
+        """
+        Accounts the latency saved by a winning hedge once the primary request it beat completed.
+        """
+
+        if primary.cancelled() or primary.exception() is not None:
+            return
+        with self.lock:
+            self.saved += primary.result()[1] - answered
+            self.saved_count += 1
+
+    def close(self):
+        """
+        Stops the hedging threads. The wrapped transport is left open.
+        """
+
+        self.executor.shutdown(wait=False, cancel_futures=True)
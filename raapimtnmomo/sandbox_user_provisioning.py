@@ -1,7 +1,40 @@
-from .requestss import Request
+from .requestss import Request, Transport
 from .exceptions import *
+from .mtn_momo import MTNMoMo
+from .utilities import Helpers
 import json
 
+class ProvisioningResult:
+    """
+    The outcome of provisioning one sandbox user in bulk.
+
+    Exactly one of `credentials` and `error` is set.
+    """
+
+    __slots__ = ('index', 'user_id', 'credentials', 'error')
+
+    def __init__(self, index, user_id, credentials=None, error=None):
+        """
+        :param index: The position of the user in the batch.
+        :param user_id: The X-Reference-Id the user was created with.
+        :param credentials: The dictionary returned by SandboxUserProvisioning.create, if it succeeded.
+        :param error: The exception raised for the user, if it failed.
+        """
+
+        self.index = index
+        self.user_id = user_id
+        self.credentials = credentials
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        outcome = "ok" if self.ok else f"error={self.error!r}"
+        return f"ProvisioningResult(index={self.index}, user_id={self.user_id!r}, {outcome})"
+
+
 class SandboxUserProvisioning:
     """
     A class that handles provisioning sandbox users for the MTN MoMo API.
@@ -9,15 +42,60 @@ class SandboxUserProvisioning:
     
     CREATE_USER_URI = '/v1_0/apiuser'
 
-    def __init__(self, config):
+    def __init__(self, config, transport=None):
         """
         Initializes the SandboxUserProvisioning class with the configuration.
         
         :param config: A dictionary containing the necessary configuration, including 'userID', 'primaryKey', 'baseURL', 
                        and 'providerCallbackHost'.
+        :param transport: Optional; The Transport used for every HTTP call. Defaults to the shared pooled transport.
         """
         
         self.config = config
+        self.transport = transport or Request.default_transport()
+
+    @classmethod
+    def create_many(cls, base_url, primary_key, provider_callback_host, count, concurrency=10, transport=None):
+        """
+        Provisions many sandbox users in parallel.
+
+        Every user gets a fresh X-Reference-Id. All requests share one pooled transport, sized to
+        `concurrency` unless one is given. A user whose provisioning fails produces a
+        ProvisioningResult carrying the error instead of aborting the batch.
+
+        :param base_url: The base URL of the API, without a trailing slash.
+        :param primary_key: The subscription primary key the users are created under.
+        :param provider_callback_host: The callback host registered for the users.
+        :param count: The number of users to create.
+        :param concurrency: The maximum number of users being provisioned at once.
+        :param transport: Optional; The Transport used for every HTTP call.
+        :return: A generator of ProvisioningResult objects, in completion order.
+        """
+
+        own_transport = transport is None
+        if own_transport:
+            transport = Transport(pool_maxsize=concurrency)
+
+        def provision(item):
+            _, user_id = item
+            return cls({
+                'baseURL': base_url,
+                'userID': user_id,
+                'primaryKey': primary_key,
+                'providerCallbackHost': provider_callback_host
+            }, transport).create()
+
+        users = ((index, Helpers.uuid4()) for index in range(count))
+        try:
+            for (index, user_id), future in Helpers.imap_unordered(provision, users, concurrency):
+                error = future.exception()
+                if error is not None:
+                    yield ProvisioningResult(index, user_id, error=error)
+                else:
+                    yield ProvisioningResult(index, user_id, credentials=future.result())
+        finally:
+            if own_transport:
+                transport.close()
 
     def create(self):
         """
@@ -45,24 +123,26 @@ class SandboxUserProvisioning:
             'providerCallbackHost': self.config['providerCallbackHost']
         }
 
-        response0_status, data0 = Request.request_post(base_url + self.CREATE_USER_URI, headers, body)
+        response0_status, data0 = Request.request_post(base_url + self.CREATE_USER_URI, headers, body, self.transport)
 
         if response0_status != 201:
-            self.verif_exception(data0)
+            self.verif_exception((response0_status, data0))
         else:
             headers2 = {
                 "Ocp-Apim-Subscription-Key": primary_key,
                 'Content-Type': 'application/json'
             }
-            response1_status, data1 = Request.request_post(base_url + self.CREATE_USER_URI + f"/{user_id}/apikey", headers2)
-            data1 = json.loads(data1)
+            response1_status, data1 = Request.request_post(base_url + self.CREATE_USER_URI + f"/{user_id}/apikey", headers2, transport=self.transport)
 
             if response1_status != 201:
-                self.verif_exception(data1)
+                self.verif_exception((response1_status, data1))
             else:
-                response2_status, data2 = Request.request_get(base_url + self.CREATE_USER_URI + f"/{user_id}", headers2)
-                
-                if response2_status == 200:
+                data1 = json.loads(data1) if isinstance(data1, str) else data1
+                response2_status, data2 = Request.request_get(base_url + self.CREATE_USER_URI + f"/{user_id}", headers2, self.transport)
+
+                if response2_status != 200:
+                    self.verif_exception((response2_status, data2))
+                else:
                     return {
                         'baseURL': base_url,
                         'userID': user_id,
@@ -72,3 +152,11 @@ class SandboxUserProvisioning:
                         'providerCallbackHost': data2['providerCallbackHost']
                     }
 
+    def verif_exception(self, response):
+        """
+        Raises the exception matching an error response, as MTNMoMo.verif_exception does.
+
+        :param response: A tuple containing the status code and response data from an API request.
+        """
+
+        MTNMoMo.verif_exception(self, response)
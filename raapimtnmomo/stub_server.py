@@ -0,0 +1,284 @@
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Request handler answering the MTN MoMo endpoints used by the library.
+
+    Request-to-pay transactions, transfers and sandbox API users are kept in memory on the server, so
+    status lookups return what was created and duplicated reference IDs answer 409. Latency
+    and error injection are read from the server settings.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    token_expires_in = 3600
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status_code, data=None, content_type='application/json'):
+        """
+        Writes a JSON response, keeping the connection open for the next request.
+
+        :param status_code: The HTTP status code to send.
+        :param data: Optional; The JSON-serializable payload. An empty body is sent when None.
+        :param content_type: The Content-Type sent with a non-empty body.
+        """
+
+        body = json.dumps(data).encode() if data is not None else b''
+        self.send_response(status_code)
+        if body:
+            self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        """
+        Reads the request body.
+
+        :return: The raw request body as bytes.
+        """
+
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def inject(self):
+        """
+        Applies the configured latency, randomly an injected slow response, and randomly an injected error response.
+
+        :return: True if an error response was sent and the request must not be processed further.
+        """
+
+        settings = self.server.settings
+        delay = settings['latency'] + random.uniform(0, settings['jitter'])
+        if settings['slow_rate'] and random.random() < settings['slow_rate']:
+            delay += settings['slow_latency']
+        if delay:
+            time.sleep(delay)
+
+        roll = random.random()
+        if roll < settings['error_rate']:
+            self.send_json(500, {'code': 'INTERNAL_PROCESSING_ERROR', 'message': 'Injected error'})
+            return True
+        if roll < settings['error_rate'] + settings['conflict_rate']:
+            self.send_json(409, {'code': 'RESOURCE_ALREADY_EXIST', 'message': 'Injected conflict'})
+            return True
+        return False
+
+    def do_POST(self):
+        body = self.read_body()
+        product, path = self.split_path()
+        self.server.count(self.command, path)
+
+        if self.inject():
+            return
+
+        if path == '/token/':
+            self.send_json(200, {'access_token': 'stub-token', 'token_type': 'access_token', 'expires_in': self.token_expires_in})
+        elif path == '/v1_0/requesttopay':
+            self.create(self.server.transactions, body, {'status': 'SUCCESSFUL', 'financialTransactionId': str(random.randrange(10 ** 9))}, 202)
+        elif path == '/v1_0/transfer':
+            self.create(self.server.transfers(product), body, {'status': 'SUCCESSFUL', 'financialTransactionId': str(random.randrange(10 ** 9))}, 202)
+        elif product == 'v1_0' and path == '/apiuser':
+            self.create(self.server.api_users, body, {'targetEnvironment': 'sandbox'}, 201)
+        elif product == 'v1_0' and path.startswith('/apiuser/') and path.endswith('/apikey'):
+            if path.split('/')[2] not in self.server.api_users:
+                return self.send_json(404, {'code': 'NOT_FOUND'})
+            self.send_json(201, {'apiKey': random.randbytes(16).hex()}, 'application/json; charset=utf-8')
+        else:
+            self.send_json(404, {'code': 'RESOURCE_NOT_FOUND'})
+
+    def create(self, resources, body, extra, status_code):
+        """
+        Stores a resource under its X-Reference-Id, answering 409 for a reused ID.
+        """
+
+        reference_id = self.headers.get('X-Reference-Id')
+        if not reference_id:
+            return self.send_json(400, {'code': 'INVALID_REFERENCE_ID', 'message': 'Missing X-Reference-Id'})
+
+        data = json.loads(body) if body else {}
+        data.update(extra)
+
+        with self.server.resources_lock:
+            if reference_id in resources:
+                return self.send_json(409, {'code': 'RESOURCE_ALREADY_EXIST', 'message': 'Duplicated reference id'})
+            resources[reference_id] = data
+
+        self.send_json(status_code)
+
+    def do_GET(self):
+        product, path = self.split_path()
+        self.server.count(self.command, path)
+
+        if self.inject():
+            return
+
+        if path.startswith('/v1_0/requesttopay/'):
+            transaction = self.server.transactions.get(path.rsplit('/', 1)[-1])
+            if transaction is None:
+                return self.send_json(404, {'code': 'RESOURCE_NOT_FOUND', 'message': 'Requested resource was not found.'})
+            self.send_json(200, transaction)
+        elif path.startswith('/v1_0/transfer/'):
+            transfer = self.server.transfers(product).get(path.rsplit('/', 1)[-1])
+            if transfer is None:
+                return self.send_json(404, {'code': 'RESOURCE_NOT_FOUND', 'message': 'Requested resource was not found.'})
+            self.send_json(200, transfer)
+        elif path.startswith('/v1_0/account/balance'):
+            currency = path.rsplit('/', 1)[-1] if path.count('/') > 3 else 'EUR'
+            self.send_json(200, {'availableBalance': '1000', 'currency': currency})
+        elif path.startswith('/v1_0/accountholder/') and path.endswith('/active'):
+            self.send_json(200, {'result': True})
+        elif path.startswith('/v1_0/accountholder/'):
+            self.send_json(200, {'given_name': 'Sand', 'family_name': 'Box', 'name': 'Sand Box'})
+        elif product == 'v1_0' and path.startswith('/apiuser/'):
+            api_user = self.server.api_users.get(path.split('/')[2])
+            if api_user is None:
+                return self.send_json(404, {'code': 'NOT_FOUND'})
+            self.send_json(200, api_user)
+        else:
+            self.send_json(404, {'code': 'RESOURCE_NOT_FOUND'})
+
+    def split_path(self):
+        """
+        Splits the request path into the product prefix and the product-relative path.
+
+        :return: A tuple (product, path), e.g. ('collection', '/v1_0/requesttopay').
+        """
+
+        path = '/' + self.path.split('?', 1)[0].lstrip('/')
+        parts = path.split('/', 2)
+        if len(parts) < 3:
+            return '', path
+        return parts[1], '/' + parts[2]
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    """
+    A threading HTTP server holding the stub state and a count of the requests received per method and path.
+    """
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, *args, settings=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.settings = settings
+        self.counts = Counter()
+        self.counts_lock = threading.Lock()
+        self.transactions = {}
+        self.api_users = {}
+        self.product_transfers = {}
+        self.resources_lock = threading.Lock()
+
+    def transfers(self, product):
+        """
+        Returns the transfers of a product, keyed by X-Reference-Id.
+        """
+
+        with self.resources_lock:
+            return self.product_transfers.setdefault(product, {})
+
+    def handle_error(self, request, client_address):
+        # Clients giving up on a slow response (e.g. on a deadline) are expected, not errors.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def count(self, method, path):
+        with self.counts_lock:
+            self.counts[(method, path)] += 1
+
+
+class StubServer:
+    """
+    A local stand-in for the MTN MoMo API, served from a background thread.
+
+    Usable as a context manager; `host` is suitable for RA_BASE_URL.
+    """
+
+    def __init__(self, address='127.0.0.1', port=0, handler=StubHandler, latency=0.0, jitter=0.0, error_rate=0.0, conflict_rate=0.0,
+                 slow_rate=0.0, slow_latency=1.0):
+        """
+        Initializes the server without starting it.
+
+        :param address: The interface to bind.
+        :param port: The port to bind. 0 picks a free port.
+        :param handler: The request handler class.
+        :param latency: Seconds added to every response.
+        :param jitter: Upper bound, in seconds, of a random delay added on top of `latency`.
+        :param error_rate: The fraction of requests answered with an injected 500.
+        :param conflict_rate: The fraction of requests answered with an injected 409.
+        :param slow_rate: The fraction of requests answered `slow_latency` seconds late, e.g. to model a provider's tail latency.
+        :param slow_latency: Seconds added to the slow responses.
+        """
+
+        self.settings = {'latency': latency, 'jitter': jitter, 'error_rate': error_rate, 'conflict_rate': conflict_rate,
+                         'slow_rate': slow_rate, 'slow_latency': slow_latency}
+        self.server = StubHTTPServer((address, port), handler, settings=self.settings)
+        self.thread = None
+
+    @property
+    def host(self):
+        """
+        The base URL of the running server, with a trailing slash.
+        """
+
+        address, port = self.server.server_address[:2]
+        return f"http://{address}:{port}/"
+
+    @property
+    def counts(self):
+        """
+        A Counter of the requests received, keyed by (method, product-relative path).
+        """
+
+        return self.server.counts
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serves a local stand-in of the MTN MoMo API')
+    parser.add_argument('--address', type=str, default='127.0.0.1', help='Interface to bind')
+    parser.add_argument('--port', type=int, default=8080, help='Port to bind')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Maximum random seconds added on top of the latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 500')
+    parser.add_argument('--conflict-rate', type=float, default=0.0, help='Fraction of requests answered with 409')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='Fraction of requests answered late')
+    parser.add_argument('--slow-latency', type=float, default=1.0, help='Seconds added to the late responses')
+    args = parser.parse_args()
+
+    server = StubServer(args.address, args.port, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, conflict_rate=args.conflict_rate,
+                        slow_rate=args.slow_rate, slow_latency=args.slow_latency)
+    print(f"Serving the MTN MoMo stub on {server.host} (RA_BASE_URL)")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+
+if __name__ == '__main__':
+    main()
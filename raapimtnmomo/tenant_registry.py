@@ -0,0 +1,118 @@
+import threading
+from .config import MTNMoMoConfig
+from .mtn_momo_collection import MTNMoMoCollection
+from .reconciliation import read_jsonl
+from .requestss import Request
+from .token_manager import TokenCache, TokenManager
+
+class TenantRegistry:
+    """
+    A registry of per-merchant clients for processes serving many subscription keys.
+
+    Each tenant gets a frozen MTNMoMoConfig, a client built once at registration and its own
+    TokenCache, so tokens never leak between tenants. All clients share one transport and
+    therefore one set of connection pools. Looking a client up is a single dictionary access.
+    """
+
+    def __init__(self, transport=None, client_class=MTNMoMoCollection, store=None):
+        """
+        Initializes an empty registry.
+
+        :param transport: Optional; The transport shared by every tenant. Defaults to the shared pooled transport.
+        :param client_class: The client class built for each tenant.
+        :param store: Optional; The TokenStore shared by the tenants' TokenManagers. Tokens are
+                      keyed by credentials, so tenants never read each other's tokens.
+        """
+
+        self.transport = transport or Request.default_transport()
+        self.client_class = client_class
+        self.store = store
+        self.clients = {}
+        self.lock = threading.Lock()
+
+    def register(self, tenant_id, config=None, **settings):
+        """
+        Registers a tenant and builds its client.
+
+        :param tenant_id: The identifier of the tenant.
+        :param config: Optional; The tenant's MTNMoMoConfig. Built from `settings` when omitted.
+        :param settings: Keyword arguments for MTNMoMoConfig, e.g. host, currency, target and collection.
+        :return: The tenant's client.
+        """
+
+        if config is None:
+            config = MTNMoMoConfig(**settings)
+        if not config._frozen:
+            config.freeze()
+
+        token_manager = TokenManager(config.token_dir, transport=self.transport, cache=TokenCache(), store=self.store)
+        client = self.client_class(config, transport=self.transport, token_manager=token_manager)
+
+        with self.lock:
+            self.clients[tenant_id] = client
+        return client
+
+    def unregister(self, tenant_id):
+        """
+        Removes a tenant.
+
+        :param tenant_id: The identifier of the tenant.
+        :return: True if the tenant was registered, False otherwise.
+        """
+
+        with self.lock:
+            return self.clients.pop(tenant_id, None) is not None
+
+    def get(self, tenant_id):
+        """
+        Returns the client of a tenant.
+
+        :param tenant_id: The identifier of the tenant.
+        :return: The tenant's client.
+        :raises KeyError: If the tenant is not registered.
+        """
+
+        try:
+            return self.clients[tenant_id]
+        except KeyError:
+            raise KeyError(f"Unknown tenant: {tenant_id}") from None
+
+    __getitem__ = get
+
+    def __contains__(self, tenant_id):
+        return tenant_id in self.clients
+
+    def __len__(self):
+        return len(self.clients)
+
+    def tenants(self):
+        """
+        Returns the identifiers of the registered tenants.
+        """
+
+        return list(self.clients)
+
+    def load_jsonl(self, path, product='collection', **settings):
+        """
+        Registers one tenant per sandbox user of a JSONL file written by `create_api_user --output`.
+
+        Each line is a dictionary as returned by SandboxUserProvisioning.create; the user ID is
+        the tenant identifier and the credentials are used for `product`.
+
+        :param path: The path of the JSONL file.
+        :param product: The product the credentials are subscribed to, e.g. 'collection'.
+        :param settings: Further keyword arguments for MTNMoMoConfig shared by every tenant, e.g. currency.
+        :return: The identifiers of the registered tenants, in file order.
+        """
+
+        tenant_ids = []
+        for user in read_jsonl(path):
+            settings[product] = {
+                'api_key_secret': user['apiKeySecret'],
+                'primary_key': user['primaryKey'],
+                'user_id': user['userID']
+            }
+            self.register(user['userID'], host=user['baseURL'].rstrip('/') + '/',
+                          target=user.get('targetEnvironment'), **settings)
+            tenant_ids.append(user['userID'])
+        return tenant_ids
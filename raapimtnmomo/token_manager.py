@@ -1,51 +1,213 @@
+import asyncio
 import json
-import os
 import base64
 import time
-import requests
+import threading
+from .deadline import acquire
+from .instrumentation import Instrumentation
+from .requestss import Request
+from .token_store import FileTokenStore
+
+class TokenCache:
+    """
+    A thread-safe, process-wide in-memory token cache keyed by (host, product, user_id).
+
+    Each key has its own lock so that, when a token is missing or expired, concurrent callers
+    wait on a single fetch instead of each sending their own request to the token endpoint.
+    """
+
+    def __init__(self):
+        self._tokens = {}
+        self._locks = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns the cached token data for a key, or None.
+        """
+
+        return self._tokens.get(key)
+
+    def set(self, key, token_data):
+        """
+        Stores the token data for a key.
+        """
+
+        self._tokens[key] = token_data
+
+    def invalidate(self, key=None):
+        """
+        Drops the cached token for a key, or every cached token when no key is given.
+        """
+
+        if key is None:
+            self._tokens.clear()
+        else:
+            self._tokens.pop(key, None)
+
+    def lock(self, key):
+        """
+        Returns the lock serializing token fetches for a key.
+        """
+
+        lock = self._locks.get(key)
+        if lock is None:
+            with self._lock:
+                lock = self._locks.setdefault(key, threading.Lock())
+        return lock
+
+    def refresh_in_background(self, key, refresh):
+        """
+        Runs `refresh` on a daemon thread unless a refresh for the same key is already running.
+
+        :param key: The cache key being refreshed.
+        :param refresh: A callable returning fresh token data for the key.
+        """
+
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                with self.lock(key):
+                    self.set(key, refresh())
+            except Exception:
+                # The current token is still valid; the next call past expiry fetches in the foreground.
+                pass
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, daemon=True).start()
+
 
 class TokenManager:
     """
     A class to manage API tokens for MTN MoMo.
     """
 
-    def __init__(self, token_dir=None):
+    default_cache = TokenCache()
+
+    def __init__(self, token_dir=None, transport=None, cache=None, refresh_ahead=60, store=None):
         """
         Initialize the class instance.
 
-        This constructor sets up the file path for the token file and defines the URI for token-related requests.
+        This constructor sets up the token storage backend and defines the URI for token-related requests.
 
-        :param token_dir: Optional; The directory where the token file is stored. If not provided, it defaults to the current module's directory.
-        :attribute token_file: The path to the token file, stored in the current module's directory.
+        :param token_dir: Optional; The directory where token files are stored when no store is given. Defaults to a directory under the system temporary directory.
+        :param transport: Optional; The Transport used to fetch tokens. Defaults to the shared pooled transport.
+        :param cache: Optional; The TokenCache holding tokens in memory. Defaults to the process-wide cache.
+        :param refresh_ahead: Seconds before expiry at which a token is refreshed in the background.
+        :param store: Optional; The TokenStore persisting tokens. Defaults to a FileTokenStore in `token_dir`.
+        :attribute store: The TokenStore shared with other processes.
         :attribute TOKEN_URI : The URI used for token-related API requests.
         """
         
-        if token_dir is None:
-            token_dir = os.path.dirname(__file__)
-        
-        self.token_file = os.path.join(token_dir, 'token.json')
+        self.store = store if store is not None else FileTokenStore(token_dir)
         self.TOKEN_URI = "/token/"
+        self.transport = transport or Request.default_transport()
+        self.cache = cache if cache is not None else self.default_cache
+        self.refresh_ahead = refresh_ahead
+        self.async_locks = {}
 
-    def get_token(self, config, product):
+    def get_token(self, config, product, key=None, request=None):
         """
         Retrieves the access token.
 
-        Checks if a valid token exists. If not, fetches a new token.
+        Serves the token from the in-memory cache when it is still valid, scheduling a background
+        refresh once it is within `refresh_ahead` seconds of expiry. Otherwise, a single caller per
+        key loads the token from the store or fetches a new token while concurrent callers wait for its result,
+        for no longer than the current Deadline.
 
         :param config: The configuration object for retrieving API credentials.
         :param product: The product or service name for which the token is requested.
+        :param key: Optional; The precomputed cache_key of the credentials, saving its lookup on every call.
+        :param request: Optional; The precomputed token_request of the credentials.
         :return: The access token.
+        :raises TimeoutException: If the current Deadline passes before a token is available.
         :raises Exception: If fetching the token fails.
         """
         
-        token_data = self.load_token()
+        if key is None:
+            key = self.cache_key(config, product)
+        token_data = self.cache.get(key)
 
         if token_data and self.is_token_valid(token_data):
+            if Instrumentation.hooks:
+                Instrumentation.emit('token.cache', product=product, hit=True)
+            if self.needs_refresh(token_data):
+                self.cache.refresh_in_background(key, lambda: self.refresh_token(config, product, key, request))
             return token_data['access_token']
-        else:
-            new_token_data = self.fetch_new_token(config, product)
-            self.save_token(new_token_data)
-            return new_token_data['access_token']
+
+        if Instrumentation.hooks:
+            Instrumentation.emit('token.cache', product=product, hit=False)
+
+        with acquire(self.cache.lock(key)):
+            token_data = self.cache.get(key)
+            if token_data and self.is_token_valid(token_data):
+                return token_data['access_token']
+
+            token_data = self.load_token(key, product)
+            if not (token_data and self.is_token_valid(token_data)):
+                token_data = self.refresh_token(config, product, key, request)
+
+            self.cache.set(key, token_data)
+            return token_data['access_token']
+
+    def refresh_token(self, config, product, key, request=None, fetch=None):
+        """
+        Fetches a new token and persists it to the store.
+
+        The store lock is held while fetching. Once acquired, the store is read again so that a
+        token already refreshed by another process is reused instead of fetched a second time.
+
+        :param config: The configuration object for retrieving API credentials.
+        :param product: The product or service name for which the token is requested.
+        :param key: The cache key of the token.
+        :param request: Optional; The precomputed token_request of the credentials.
+        :param fetch: Optional; The callable fetching the token, with the signature of fetch_new_token. Defaults to fetch_new_token.
+        :return: The new token data.
+        """
+
+        with self.store.lock(key):
+            token_data = self.load_token(key, product)
+            if token_data and self.is_token_valid(token_data) and not self.needs_refresh(token_data):
+                return token_data
+
+            token_data = (fetch or self.fetch_new_token)(config, product, request)
+            self.store.save(key, token_data)
+            return token_data
+
+    def load_token(self, key, product):
+        """
+        Reads a token from the store, emitting a 'token.load' event when instrumentation is on.
+
+        :param key: The cache key of the token.
+        :param product: The product or service name of the token.
+        :return: The stored token data, or None.
+        """
+
+        if not Instrumentation.hooks:
+            return self.store.load(key)
+
+        start = time.perf_counter()
+        token_data = self.store.load(key)
+        Instrumentation.emit('token.load', product=product, duration=time.perf_counter() - start, found=token_data is not None)
+        return token_data
+
+    def cache_key(self, config, product):
+        """
+        Builds the cache key identifying the credentials a token belongs to.
+
+        :param config: The configuration object for retrieving API credentials.
+        :param product: The product or service name for which the token is requested.
+        :return: A (host, product, user_id) tuple.
+        """
+
+        return (config.host, product, config.retrieve_value(product, 'userId'))
 
     def is_token_valid(self, token_data):
         """
@@ -57,16 +219,29 @@ class TokenManager:
         
         return 'expires_at' in token_data and time.time() < token_data['expires_at']
 
-    def fetch_new_token(self, config, product):
+    def needs_refresh(self, token_data):
         """
-        Fetches a new access token.
+        Checks if a still-valid token is close enough to expiry to be refreshed ahead of time.
+
+        The refresh window is capped at half the token lifetime so short-lived tokens are not
+        refreshed on every call.
+
+        :param token_data: The token data dictionary containing the token and expiration time.
+        :return: True if the token should be refreshed, False otherwise.
+        """
+
+        window = min(self.refresh_ahead, int(token_data.get('expires_in', 3600)) / 2)
+        return time.time() >= token_data['expires_at'] - window
+
+    def token_request(self, config, product):
+        """
+        Builds the URL and headers of a token request.
 
         :param config: The configuration object for retrieving API credentials.
         :param product: The product or service name for which the token is requested.
-        :return: The new token data, including the token and expiration time.
-        :raises Exception: If the request fails with an unauthorized or server error.
+        :return: A tuple (url, headers). The headers must not be modified, as clients reuse them for every fetch.
         """
-        
+
         url = f"{config.retrieve_value(product, 'host')}{product}{self.TOKEN_URI}"
         primary_key = config.retrieve_value(product, 'PrimaryKey')
         api_key_secret = config.retrieve_value(product, 'ApiKeySecret')
@@ -78,37 +253,130 @@ class TokenManager:
             'Content-Type': 'application/json'
         }
 
-        response = requests.post(url, headers=headers)
+        return url, headers
+
+    def parse_token_response(self, response):
+        """
+        Turns a token endpoint response into token data.
+
+        :param response: A tuple containing the status code and response data.
+        :return: The token data, including the token and expiration time.
+        :raises Exception: If the request failed with an unauthorized or server error.
+        """
+
+        status_code, data = response
 
-        if response.status_code != 200:
-            if response.status_code == 401:
-                raise Exception(f"Unauthorized: {response.json().get('error', 'Unknown error')}")
-            elif response.status_code == 500:
-                raise Exception(response.json().get('error', 'Unknown server error'))
+        if status_code != 200:
+            error = data if isinstance(data, dict) else {}
+            if status_code == 401:
+                raise Exception(f"Unauthorized: {error.get('error', 'Unknown error')}")
+            elif status_code == 500:
+                raise Exception(error.get('error', 'Unknown server error'))
             else:
                 raise Exception("Another error occurred")
 
-        token_data = response.json()
-        token_data['expires_at'] = time.time() + 3600  # Token expires in 1 hour
+        token_data = json.loads(data) if isinstance(data, str) else data
+        token_data['expires_at'] = time.time() + int(token_data.get('expires_in', 3600))
 
         return token_data
 
-    def save_token(self, token_data):
+    def fetch_new_token(self, config, product, request=None):
         """
-        Saves the token data to a file.
+        Fetches a new access token.
 
-        :param token_data: The token data to save.
+        :param config: The configuration object for retrieving API credentials.
+        :param product: The product or service name for which the token is requested.
+        :param request: Optional; The precomputed token_request of the credentials.
+        :return: The new token data, including the token and expiration time.
+        :raises Exception: If the request fails with an unauthorized or server error.
         """
-        with open(self.token_file, 'w') as f:
-            json.dump(token_data, f)
+        
+        url, headers = request or self.token_request(config, product)
+        if not Instrumentation.hooks:
+            return self.parse_token_response(Request.request_post(url, headers, transport=self.transport))
 
-    def load_token(self):
+        error = None
+        start = time.perf_counter()
+        try:
+            return self.parse_token_response(Request.request_post(url, headers, transport=self.transport))
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            Instrumentation.emit('token.fetch', product=product, duration=time.perf_counter() - start, error=error)
+
+    async def get_token_async(self, config, product, transport, key=None, request=None):
         """
-        Loads the token data from a file.
+        Retrieves the access token without blocking the event loop.
+
+        Shares the in-memory cache with get_token. On a miss, one coroutine per key refreshes the
+        token while the others await it. The refresh runs in a worker thread holding the store
+        lock, like refresh_token, so processes sharing the store still fetch once; the fetch
+        itself goes through the AsyncTransport on the event loop.
 
-        :return: The token data dictionary, or None if the file does not exist.
+        :param config: The configuration object for retrieving API credentials.
+        :param product: The product or service name for which the token is requested.
+        :param transport: The AsyncTransport used to fetch tokens.
+        :param key: Optional; The precomputed cache_key of the credentials.
+        :param request: Optional; The precomputed token_request of the credentials.
+        :return: The access token.
+        :raises Exception: If fetching the token fails.
         """
-        if os.path.exists(self.token_file):
-            with open(self.token_file, 'r') as f:
-                return json.load(f)
-        return None
+
+        if key is None:
+            key = self.cache_key(config, product)
+        token_data = self.cache.get(key)
+
+        if token_data and self.is_token_valid(token_data) and not self.needs_refresh(token_data):
+            if Instrumentation.hooks:
+                Instrumentation.emit('token.cache', product=product, hit=True)
+            return token_data['access_token']
+
+        if Instrumentation.hooks:
+            Instrumentation.emit('token.cache', product=product, hit=False)
+
+        lock = self.async_locks.setdefault(key, asyncio.Lock())
+        if lock.locked() and token_data and self.is_token_valid(token_data):
+            # A refresh is already in flight; keep serving the current token meanwhile.
+            return token_data['access_token']
+
+        async with lock:
+            token_data = self.cache.get(key)
+            if token_data and self.is_token_valid(token_data) and not self.needs_refresh(token_data):
+                return token_data['access_token']
+
+            loop = asyncio.get_running_loop()
+
+            def fetch(config, product, request):
+                # Called from the worker thread while the event loop awaits it, so the loop is free to run the fetch.
+                return asyncio.run_coroutine_threadsafe(self.fetch_new_token_async(config, product, transport, request), loop).result()
+
+            token_data = await asyncio.to_thread(self.refresh_token, config, product, key, request, fetch)
+            self.cache.set(key, token_data)
+            return token_data['access_token']
+
+    async def fetch_new_token_async(self, config, product, transport, request=None):
+        """
+        Fetches a new access token through an AsyncTransport.
+
+        :param config: The configuration object for retrieving API credentials.
+        :param product: The product or service name for which the token is requested.
+        :param transport: The AsyncTransport used to fetch the token.
+        :param request: Optional; The precomputed token_request of the credentials.
+        :return: The new token data, including the token and expiration time.
+        :raises Exception: If the request fails with an unauthorized or server error.
+        """
+
+        url, headers = request or self.token_request(config, product)
+        if not Instrumentation.hooks:
+            return self.parse_token_response(await transport.post(url, headers))
+
+        error = None
+        start = time.perf_counter()
+        try:
+            return self.parse_token_response(await transport.post(url, headers))
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            Instrumentation.emit('token.fetch', product=product, duration=time.perf_counter() - start, error=error)
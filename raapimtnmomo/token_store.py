@@ -0,0 +1,199 @@
+import contextlib
+import hashlib
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+from .deadline import Deadline
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+class TokenStore:
+    """
+    Base class for TokenManager storage backends.
+
+    A store persists token data per key and provides a lock that serializes token refreshes
+    for that key across every TokenManager sharing the store.
+    """
+
+    def load(self, key):
+        """
+        Loads the token data stored for a key.
+
+        :param key: The (host, product, user_id) key of the token.
+        :return: The token data dictionary, or None if nothing is stored.
+        """
+
+        raise NotImplementedError
+
+    def save(self, key, token_data):
+        """
+        Stores the token data for a key.
+
+        :param key: The (host, product, user_id) key of the token.
+        :param token_data: The token data to store.
+        """
+
+        raise NotImplementedError
+
+    def lock(self, key):
+        """
+        Returns a context manager holding the refresh lock for a key.
+
+        :param key: The (host, product, user_id) key of the token.
+        """
+
+        raise NotImplementedError
+
+
+class MemoryTokenStore(TokenStore):
+    """
+    A store keeping tokens in the memory of the current process.
+    """
+
+    def __init__(self):
+        self._tokens = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def load(self, key):
+        return self._tokens.get(key)
+
+    def save(self, key, token_data):
+        self._tokens[key] = token_data
+
+    def lock(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+
+def default_token_directory():
+    """
+    Returns the default directory of the token files, creating it if needed.
+
+    On POSIX it is a 'raapimtnmomo-<uid>' directory under the system temporary directory, with
+    mode 0700: token file names are predictable, so a shared directory would let other users
+    read the tokens or plant their own. On Windows the temporary directory is already per-user.
+
+    :return: The path of the directory.
+    :raises PermissionError: If the directory exists but is not a directory owned by the current user.
+    """
+
+    if not hasattr(os, 'getuid'):
+        directory = os.path.join(tempfile.gettempdir(), 'raapimtnmomo')
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    uid = os.getuid()
+    directory = os.path.join(tempfile.gettempdir(), f'raapimtnmomo-{uid}')
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    st = os.lstat(directory)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != uid:
+        raise PermissionError(f"The token directory {directory} is not a directory owned by the current user")
+    if stat.S_IMODE(st.st_mode) & 0o077:
+        os.chmod(directory, 0o700)
+    return directory
+
+
+class FileTokenStore(TokenStore):
+    """
+    A store sharing tokens between processes through JSON files in a directory.
+
+    Writes go to a temporary file that is atomically renamed over the token file, so readers
+    never see a partial token. Refreshes are serialized with an advisory lock on a sibling
+    lock file, so one process fetches a new token and the others reuse it.
+    """
+
+    def __init__(self, directory=None):
+        """
+        Initializes the store.
+
+        :param directory: Optional; The directory holding the token files, created with mode
+                          0700 if missing. Defaults to default_token_directory(), private to
+                          the current user.
+        """
+
+        if directory is None:
+            directory = default_token_directory()
+        else:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+
+        self.directory = directory
+
+    def path(self, key):
+        """
+        Returns the token file path for a key.
+
+        :param key: The (host, product, user_id) key of the token.
+        :return: The absolute path of the token file.
+        """
+
+        digest = hashlib.sha256('|'.join(key).encode()).hexdigest()[:32]
+        return os.path.join(self.directory, f"token-{digest}.json")
+
+    def load(self, key):
+        try:
+            with open(self.path(key), 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def save(self, key, token_data):
+        path = self.path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.token-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(token_data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_path)
+            raise
+
+    def acquire(self, f, blocking):
+        """
+        Takes the advisory lock of an open lock file.
+
+        :return: True if the lock was taken, False if it is held elsewhere and `blocking` is False.
+        """
+
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        except OSError:
+            if blocking:
+                raise
+            return False
+        return True
+
+    @contextlib.contextmanager
+    def lock(self, key):
+        with open(self.path(key) + '.lock', 'a+') as f:
+            deadline = Deadline.current()
+            if deadline is None:
+                self.acquire(f, blocking=True)
+            else:
+                # Poll the lock so that waiting on another process never outlives the deadline.
+                while not self.acquire(f, blocking=False):
+                    deadline.check()
+                    time.sleep(0.01)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
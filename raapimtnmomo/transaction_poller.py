@@ -0,0 +1,288 @@
+import heapq
+import itertools
+import logging
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .exceptions import BadRequestException, NotFoundException
+
+logger = logging.getLogger(__name__)
+
+class TrackedTransaction:
+    """
+    Polling state of one pending transaction.
+    """
+
+    __slots__ = ('x_reference_id', 'callback', 'delay', 'attempts', 'errors')
+
+    def __init__(self, x_reference_id, callback, delay):
+        self.x_reference_id = x_reference_id
+        self.callback = callback
+        self.delay = delay
+        self.attempts = 0
+        self.errors = 0
+
+
+class TransactionPoller:
+    """
+    Polls pending request-to-pay transactions until they reach a terminal status.
+
+    Pending X-Reference-Ids are kept in a priority queue ordered by their next check time. Each
+    transaction backs off exponentially between checks, so fresh payments are checked quickly
+    while long-pending ones cost few calls. Checks run on a shared worker pool, and terminal
+    results are delivered to per-transaction callbacks and to the `results()` iterator.
+
+    A transaction whose checks keep failing is given up on: at once when the provider answers
+    that it does not exist or that the request is invalid (PERMANENT_ERRORS), and after
+    `max_errors` consecutive failures otherwise. Its result then carries the exception of the
+    last check in place of the transaction. Exceptions raised by callbacks are logged.
+    """
+
+    TERMINAL_STATUSES = ('SUCCESSFUL', 'FAILED')
+    PERMANENT_ERRORS = (NotFoundException, BadRequestException)
+
+    def __init__(self, collection, workers=10, initial_delay=2.0, max_delay=60.0, backoff=2.0, jitter=0.1, max_errors=10):
+        """
+        Initializes the poller without starting it.
+
+        :param collection: The MTNMoMoCollection used to call get_transaction.
+        :param workers: The number of status checks running at once.
+        :param initial_delay: Seconds before the first check of a newly tracked transaction.
+        :param max_delay: The upper bound, in seconds, of the delay between two checks.
+        :param backoff: The factor applied to the delay after each non-terminal check.
+        :param jitter: The fraction of random jitter added to each delay to spread checks out.
+        :param max_errors: The number of consecutive failed checks after which a transaction is given up on.
+        """
+
+        self.collection = collection
+        self.workers = workers
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.jitter = jitter
+        self.max_errors = max_errors
+
+        self.tracked = {}
+        self.heap = []
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.results_queue = queue.Queue()
+        self.in_flight = 0
+        self.running = False
+        self.thread = None
+        self.executor = None
+
+        self.api_calls = 0
+        self.errors = 0
+        self.resolved = 0
+        self.abandoned = 0
+        self.callback_errors = 0
+
+    def track(self, x_reference_id, callback=None):
+        """
+        Starts tracking a pending transaction.
+
+        :param x_reference_id: The reference ID returned by create_transaction.
+        :param callback: Optional; Called with (x_reference_id, transaction) once the transaction reaches a terminal
+                         status, or with (x_reference_id, exception) if polling it was given up on.
+        """
+
+        with self.condition:
+            if x_reference_id in self.tracked:
+                return
+            transaction = TrackedTransaction(x_reference_id, callback, self.initial_delay)
+            self.tracked[x_reference_id] = transaction
+            self.schedule(transaction, self.initial_delay)
+
+    def untrack(self, x_reference_id):
+        """
+        Stops tracking a transaction, e.g. because its outcome arrived by another channel.
+
+        :param x_reference_id: The reference ID of the transaction.
+        :return: True if the transaction was being tracked, False otherwise.
+        """
+
+        with self.condition:
+            return self.tracked.pop(x_reference_id, None) is not None
+
+    def pending(self):
+        """
+        Returns the number of transactions still being tracked.
+        """
+
+        return len(self.tracked)
+
+    @property
+    def calls_per_resolved(self):
+        """
+        The average number of get_transaction calls spent per resolved transaction.
+        """
+
+        return self.api_calls / self.resolved if self.resolved else 0.0
+
+    def stats(self):
+        """
+        Returns a snapshot of the poller counters.
+
+        :return: A dictionary with 'pending', 'api_calls', 'errors', 'resolved', 'abandoned',
+                 'callback_errors' and 'calls_per_resolved'.
+        """
+
+        return {
+            'pending': self.pending(),
+            'api_calls': self.api_calls,
+            'errors': self.errors,
+            'resolved': self.resolved,
+            'abandoned': self.abandoned,
+            'callback_errors': self.callback_errors,
+            'calls_per_resolved': self.calls_per_resolved
+        }
+
+    def results(self, timeout=None):
+        """
+        Iterates over terminal results as they arrive.
+
+        The iterator ends once nothing is tracked anymore, or when no result arrives within `timeout` seconds.
+
+        :param timeout: Optional; Seconds to wait for the next result.
+        :return: A generator of (x_reference_id, transaction) tuples; the transaction is the
+                 exception of the last check for a transaction that was given up on.
+        :raises RuntimeError: If transactions are tracked but the poller is not running, as no result would ever come.
+        """
+
+        while True:
+            if not self.running and self.tracked and self.results_queue.empty():
+                raise RuntimeError("The poller is not running: call start() before waiting for results")
+            if self.results_queue.empty() and not self.tracked:
+                return
+            try:
+                yield self.results_queue.get(timeout=timeout if timeout is not None else 0.5)
+            except queue.Empty:
+                if timeout is not None:
+                    return
+
+    def start(self):
+        """
+        Starts the scheduler thread and the worker pool.
+        """
+
+        with self.condition:
+            if self.running:
+                return self
+            self.running = True
+
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops scheduling new checks and waits for the ones in flight.
+        """
+
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+        if self.thread is not None:
+            self.thread.join()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def schedule(self, transaction, delay):
+        """
+        Queues the next check of a transaction. Must be called with the condition held.
+        """
+
+        delay *= 1 + random.uniform(0, self.jitter)
+        heapq.heappush(self.heap, (time.monotonic() + delay, next(self.sequence), transaction.x_reference_id))
+        self.condition.notify()
+
+    def run(self):
+        """
+        Scheduler loop dispatching due checks to the worker pool.
+        """
+
+        with self.condition:
+            while self.running:
+                if not self.heap or self.in_flight >= self.workers:
+                    self.condition.wait()
+                    continue
+
+                due_at, _, x_reference_id = self.heap[0]
+                now = time.monotonic()
+                if due_at > now:
+                    self.condition.wait(due_at - now)
+                    continue
+
+                heapq.heappop(self.heap)
+                transaction = self.tracked.get(x_reference_id)
+                if transaction is None:
+                    continue
+
+                self.in_flight += 1
+                self.executor.submit(self.check, transaction)
+
+    def check(self, transaction):
+        """
+        Fetches the status of a transaction and either resolves or reschedules it.
+        """
+
+        # The status is read here too, so a malformed response is counted and rescheduled
+        # rather than escaping the worker with the transaction never checked again.
+        error = None
+        try:
+            data = self.collection.get_transaction(transaction.x_reference_id)
+            status = data.get('status')
+        except Exception as e:
+            data = status = None
+            error = e
+
+        with self.condition:
+            self.in_flight -= 1
+            self.api_calls += 1
+            transaction.attempts += 1
+
+            if error is not None:
+                self.errors += 1
+                transaction.errors += 1
+            else:
+                transaction.errors = 0
+
+            terminal = status in self.TERMINAL_STATUSES
+            abandoned = error is not None and (isinstance(error, self.PERMANENT_ERRORS) or transaction.errors >= self.max_errors)
+            if transaction.x_reference_id not in self.tracked:
+                self.condition.notify()
+                return
+
+            if not terminal and not abandoned:
+                transaction.delay = min(transaction.delay * self.backoff, self.max_delay)
+                self.schedule(transaction, transaction.delay)
+                return
+
+            del self.tracked[transaction.x_reference_id]
+            if terminal:
+                self.resolved += 1
+            else:
+                self.abandoned += 1
+                data = error
+            self.condition.notify()
+
+        self.results_queue.put((transaction.x_reference_id, data))
+        if transaction.callback is not None:
+            try:
+                transaction.callback(transaction.x_reference_id, data)
+            except Exception:
+                # Callbacks run on the worker pool, where an exception would otherwise vanish.
+                with self.condition:
+                    self.callback_errors += 1
+                logger.exception("Transaction poller callback failed for %s", transaction.x_reference_id)
@@ -1,4 +1,6 @@
 import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from .deadline import Deadline, bind
 
 class Helpers:
     """
@@ -25,3 +27,51 @@ class Helpers:
         """
         
         return response
+
+    @staticmethod
+    def imap_unordered(fn, iterable, concurrency=10, timeout=None):
+        """
+        Apply a function to every item of an iterable on a thread pool, yielding results as they complete.
+
+        At most `concurrency` items are pulled from the iterable and in flight at any time, so
+        memory stays flat however large (or lazy) the input is. Calls run under the caller's
+        Deadline, if any.
+
+        With a `timeout`, the whole run gets a Deadline: once it passes, no further item is pulled
+        from the iterable, queued calls fail with a TimeoutException without starting and running
+        calls are cut short by their capped HTTP timeouts.
+
+        :param fn : The function to call with each item.
+        :param iterable : The items to process.
+        :param concurrency : The maximum number of calls running at once.
+        :param timeout : Optional; Seconds the whole run may take.
+        :return : A generator of (item, future) pairs in completion order.
+        """
+
+        items = iter(iterable)
+        pending = {}
+        current = Deadline.current()
+        deadline = Deadline(timeout) if timeout is not None else current
+        if current is not None and current.expires_at < deadline.expires_at:
+            deadline = current
+        fn = bind(fn, deadline)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            def fill():
+                if deadline is not None and deadline.expired:
+                    return
+                for item in items:
+                    pending[executor.submit(fn, item)] = item
+                    if len(pending) >= concurrency:
+                        return
+
+            try:
+                fill()
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield pending.pop(future), future
+                    fill()
+            finally:
+                for future in pending:
+                    future.cancel()
@@ -0,0 +1,205 @@
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from raapimtnmomo import cache as cache_module
+from raapimtnmomo.cache import TTLCache
+from raapimtnmomo.deadline import Deadline
+from raapimtnmomo.exceptions import NotFoundException, TimeoutException
+
+class Clock:
+    """
+    Stands in for the time module of the cache, so entries expire when the test says so.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, 'time', clock)
+    return clock
+
+
+class Loader:
+    """
+    Counts its calls and returns a value, or raises an exception, optionally waiting for a release.
+    """
+
+    def __init__(self, value='value', error=None, release=None):
+        self.value = value
+        self.error = error
+        self.release = release
+        self.calls = 0
+        self.started = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        if self.release is not None:
+            self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_values_are_served_until_they_expire(clock):
+    cache = TTLCache(ttl=10)
+    loader = Loader()
+
+    assert cache.get_or_load('key', loader) == 'value'
+    clock.now += 9
+    assert cache.get_or_load('key', loader) == 'value'
+    assert loader.calls == 1
+
+    clock.now += 2
+    assert cache.get_or_load('key', loader) == 'value'
+    assert loader.calls == 2
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 2
+
+
+def test_failures_are_cached_for_negative_ttl(clock):
+    cache = TTLCache(ttl=10, negative_ttl=1, negative_exceptions=(NotFoundException,))
+    loader = Loader(error=NotFoundException("Not found"))
+
+    for _ in range(3):
+        with pytest.raises(NotFoundException):
+            cache.get_or_load('key', loader)
+    assert loader.calls == 1 and cache.stats()['negative_hits'] == 2
+
+    clock.now += 2
+    with pytest.raises(NotFoundException):
+        cache.get_or_load('key', loader)
+    assert loader.calls == 2
+
+
+def test_other_failures_are_not_cached():
+    cache = TTLCache(negative_exceptions=(NotFoundException,))
+    loader = Loader(error=ValueError("boom"))
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            cache.get_or_load('key', loader)
+    assert loader.calls == 2 and cache.stats()['size'] == 0
+
+
+def test_each_negative_hit_raises_a_fresh_failure():
+    cache = TTLCache(negative_exceptions=(NotFoundException,))
+    loader = Loader(error=NotFoundException("Not found"))
+    raised = []
+
+    for _ in range(100):
+        try:
+            cache.get_or_load('key', loader)
+        except NotFoundException as e:
+            raised.append(e)
+
+    assert len({id(e) for e in raised}) == len(raised)
+    assert all(e.args == ("Not found",) for e in raised)
+    # A shared instance would collect one more frame on every raise.
+    depths = {len(traceback.extract_tb(e.__traceback__)) for e in raised[1:]}
+    assert len(depths) == 1 and depths.pop() <= 3
+
+
+def test_concurrent_misses_share_one_load():
+    cache = TTLCache()
+    release = threading.Event()
+    loader = Loader(release=release)
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        futures = [executor.submit(cache.get_or_load, 'key', loader) for _ in range(10)]
+        wait_until(lambda: cache.stats()['coalesced'] == 9)
+        release.set()
+        values = [future.result() for future in futures]
+
+    assert values == ['value'] * 10
+    assert loader.calls == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_concurrent_misses_share_a_failure_as_fresh_copies():
+    cache = TTLCache()
+    release = threading.Event()
+    loader = Loader(error=ValueError("boom"), release=release)
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        futures = [executor.submit(cache.get_or_load, 'key', loader) for _ in range(5)]
+        wait_until(lambda: cache.stats()['coalesced'] == 4)
+        release.set()
+        errors = [future.exception() for future in futures]
+
+    assert loader.calls == 1
+    assert all(isinstance(e, ValueError) for e in errors)
+    assert len({id(e) for e in errors}) == 5
+
+
+def test_waiting_for_a_concurrent_load_is_bounded_by_the_deadline():
+    cache = TTLCache()
+    release = threading.Event()
+    loader = Loader(release=release)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        leader = executor.submit(cache.get_or_load, 'key', loader)
+        loader.started.wait(5)
+        with Deadline(0.05), pytest.raises(TimeoutException):
+            cache.get_or_load('key', loader)
+        release.set()
+        assert leader.result() == 'value'
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2)
+
+    cache.get_or_load('a', Loader('a'))
+    cache.get_or_load('b', Loader('b'))
+    cache.get_or_load('a', Loader('unused'))
+    cache.get_or_load('c', Loader('c'))
+
+    assert list(cache.entries) == ['a', 'c']
+    loader = Loader('b2')
+    assert cache.get_or_load('b', loader) == 'b2' and loader.calls == 1
+
+
+def test_invalidate_drops_entries():
+    cache = TTLCache()
+    cache.get_or_load('a', Loader('a'))
+    cache.get_or_load('b', Loader('b'))
+
+    cache.invalidate('a')
+    assert list(cache.entries) == ['b']
+    cache.invalidate()
+    assert cache.stats()['size'] == 0
+
+
+def test_load_in_flight_during_invalidate_is_not_cached():
+    cache = TTLCache()
+    release = threading.Event()
+    stale = Loader('stale', release=release)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        leader = executor.submit(cache.get_or_load, 'key', stale)
+        stale.started.wait(5)
+        cache.invalidate()
+
+        # A caller arriving after the invalidation starts its own load instead of joining.
+        fresh = Loader('fresh')
+        assert cache.get_or_load('key', fresh) == 'fresh'
+
+        release.set()
+        assert leader.result() == 'stale'
+
+    assert stale.calls == 1 and fresh.calls == 1
+    assert cache.get_or_load('key', Loader('unused')) == 'fresh'
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import pytest
+from raapimtnmomo.callback_receiver import CallbackReceiver
+from raapimtnmomo.exceptions import NotFoundException
+
+class Poller:
+    def __init__(self):
+        self.untracked = []
+
+    def untrack(self, reference_id):
+        self.untracked.append(reference_id)
+
+
+class Verifier:
+    """
+    Stands in for a collection client: get_transaction reports the statuses it was given.
+    """
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+
+    def get_transaction(self, reference_id):
+        if reference_id not in self.statuses:
+            raise NotFoundException("Not found")
+        return {'status': self.statuses[reference_id]}
+
+
+async def post(receiver, body=b'', target='/callback', headers=None):
+    """
+    Sends one request over a fresh connection and returns the response status code.
+    """
+
+    host, port = receiver.server.sockets[0].getsockname()[:2]
+    reader, writer = await asyncio.open_connection(host, port)
+    headers = {'Content-Length': str(len(body)), **(headers or {})}
+    head = ''.join(f"{name}: {value}\r\n" for name, value in headers.items())
+    writer.write(f"PUT {target} HTTP/1.1\r\nHost: {host}\r\n{head}\r\n".encode() + body)
+    await writer.drain()
+    status_line = await reader.readline()
+    writer.close()
+    return int(status_line.split()[1])
+
+
+def callback(reference_id, status):
+    return json.dumps({'referenceId': reference_id, 'status': status}).encode()
+
+
+def run(receiver, scenario):
+    async def main():
+        events = []
+        receiver.add_handler(lambda event: events.append((event.reference_id, event.status)))
+        async with receiver:
+            await scenario(receiver)
+        # Handlers run concurrently, so the dispatch order is not the arrival order.
+        return sorted(events)
+
+    return asyncio.run(main())
+
+
+def test_only_final_callbacks_are_deduplicated_and_untracked():
+    poller = Poller()
+
+    async def scenario(receiver):
+        for status in ('PENDING', 'PENDING', 'SUCCESSFUL', 'SUCCESSFUL', 'PENDING'):
+            assert await post(receiver, callback('ref-1', status)) == 200
+
+    receiver = CallbackReceiver(port=0, poller=poller)
+    events = run(receiver, scenario)
+
+    assert events == [('ref-1', 'PENDING'), ('ref-1', 'PENDING'), ('ref-1', 'SUCCESSFUL')]
+    assert poller.untracked == ['ref-1']
+    assert receiver.stats()['duplicates'] == 2
+
+
+def test_malformed_requests_are_rejected():
+    async def scenario(receiver):
+        assert await post(receiver, b'{"status": "SUCCESSFUL"}') == 400
+        assert await post(receiver, b'x' * 2000) == 413
+        assert await post(receiver, b'5\r\nhello\r\n0\r\n\r\n', headers={'Transfer-Encoding': 'chunked', 'Content-Length': '0'}) == 411
+
+    receiver = CallbackReceiver(port=0, max_body_size=1000)
+    assert run(receiver, scenario) == []
+    assert receiver.stats()['too_large'] == 1
+
+
+def test_callbacks_without_the_secret_are_refused():
+    poller = Poller()
+
+    async def scenario(receiver):
+        assert await post(receiver, callback('ref-1', 'SUCCESSFUL')) == 401
+        assert await post(receiver, callback('ref-1', 'SUCCESSFUL'), target='/callback?token=wrong') == 401
+        assert await post(receiver, callback('ref-1', 'SUCCESSFUL'), target='/callback?token=s3cret') == 200
+        assert await post(receiver, callback('ref-2', 'FAILED'), headers={'X-Callback-Token': 's3cret'}) == 200
+
+    receiver = CallbackReceiver(port=0, poller=poller, secret='s3cret')
+    assert run(receiver, scenario) == [('ref-1', 'SUCCESSFUL'), ('ref-2', 'FAILED')]
+    assert poller.untracked == ['ref-1', 'ref-2']
+    assert receiver.stats()['unauthorized'] == 2
+
+
+def test_unconfirmed_final_callbacks_keep_the_transaction_polled():
+    poller = Poller()
+    verifier = Verifier({'ref-1': 'PENDING', 'ref-2': 'SUCCESSFUL'})
+
+    async def scenario(receiver):
+        # A forged success, then one for an unknown reference: both are dropped.
+        assert await post(receiver, callback('ref-1', 'SUCCESSFUL')) == 200
+        assert await post(receiver, callback('ref-3', 'SUCCESSFUL')) == 200
+        assert await post(receiver, callback('ref-2', 'SUCCESSFUL')) == 200
+
+        # Once the provider agrees, the real final callback still goes through.
+        verifier.statuses['ref-1'] = 'FAILED'
+        assert await post(receiver, callback('ref-1', 'FAILED')) == 200
+
+    receiver = CallbackReceiver(port=0, poller=poller, verifier=verifier)
+    assert run(receiver, scenario) == [('ref-1', 'FAILED'), ('ref-2', 'SUCCESSFUL')]
+    assert poller.untracked == ['ref-2', 'ref-1']
+    assert receiver.stats()['unconfirmed'] == 2
@@ -0,0 +1,38 @@
+import tempfile
+from raapimtnmomo.config import MTNMoMoConfig
+from raapimtnmomo.mtn_momo_collection import MTNMoMoCollection
+from raapimtnmomo.stub_server import StubServer
+
+REQUEST_TO_PAY = ('POST', '/v1_0/requesttopay')
+
+def params(external_id):
+    return {'amount': '10', 'referenceExternalID': external_id, 'numberMoMo': '46733123450',
+            'description': 'payment', 'note': 'note'}
+
+
+class CountingCollection(MTNMoMoCollection):
+    """
+    Counts the validations of transaction parameters.
+    """
+
+    validations = 0
+
+    def validate_transaction_params(self, params):
+        type(self).validations += 1
+        super().validate_transaction_params(params)
+
+
+def test_create_transactions_validates_each_item_once():
+    invalid = params('external-2')
+    del invalid['note']
+
+    with StubServer() as server:
+        client = CountingCollection(MTNMoMoConfig(host=server.host, token_dir=tempfile.mkdtemp()))
+        results = sorted(client.create_transactions([params('external-1'), invalid, params('external-3')]),
+                         key=lambda result: result.index)
+
+        assert server.counts[REQUEST_TO_PAY] == 2
+
+    assert [result.error is None for result in results] == [True, False, True]
+    assert isinstance(results[1].error, ValueError)
+    assert CountingCollection.validations == 3
@@ -0,0 +1,101 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import pytest
+from raapimtnmomo.cache import TTLCache
+from raapimtnmomo.config import MTNMoMoConfig
+from raapimtnmomo.deadline import Deadline
+from raapimtnmomo.exceptions import TimeoutException
+from raapimtnmomo.ledger import SQLiteLedger
+from raapimtnmomo.mtn_momo_collection import MTNMoMoCollection
+from raapimtnmomo.requestss import Transport
+from raapimtnmomo.resilience import RateLimiter, ResilientTransport, TokenBucket
+from raapimtnmomo.stub_server import StubServer
+
+TRANSACTION = {'amount': '10', 'referenceExternalID': 'deadline', 'numberMoMo': '46733123450',
+               'description': 'payment', 'note': 'note'}
+
+def collection(server, timeout, transport):
+    config = MTNMoMoConfig(host=server.host, token_dir=tempfile.mkdtemp())
+    return MTNMoMoCollection(config, transport=transport, timeout=timeout)
+
+
+def test_token_bucket_wait_is_bounded_by_deadline():
+    bucket = TokenBucket(rate=1)
+    bucket.acquire()
+
+    start = time.monotonic()
+    with Deadline(0.1), pytest.raises(TimeoutException):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.1
+
+    # The token was given back: the next caller does not inherit the timed out caller's debt.
+    assert bucket.reserve() <= 1.0
+
+
+def test_rate_limited_client_call_is_bounded_by_timeout():
+    with StubServer() as server, Transport() as transport:
+        # The burst covers the token fetch, the creation and the read; the next call must wait a second.
+        resilient = ResilientTransport(transport, limiter=RateLimiter(rate=1, burst=3))
+        client = collection(server, 0.3, resilient)
+        client.get_transaction(client.create_transaction(TRANSACTION)['transactionId'])
+
+        start = time.monotonic()
+        with pytest.raises(TimeoutException):
+            client.get_account_balance()
+        assert time.monotonic() - start < 0.5
+
+
+def test_slow_server_call_is_bounded_by_timeout():
+    with StubServer(latency=2.0) as server, Transport() as transport:
+        client = collection(server, 0.3, transport)
+
+        start = time.monotonic()
+        with pytest.raises(TimeoutException):
+            client.get_account_balance()
+        assert time.monotonic() - start < 1.0
+
+
+def test_cache_waiter_is_bounded_by_deadline():
+    cache = TTLCache()
+    loading = threading.Event()
+
+    def slow_loader():
+        loading.set()
+        time.sleep(1.0)
+        return 'value'
+
+    leader = threading.Thread(target=cache.get_or_load, args=('key', slow_loader))
+    leader.start()
+    loading.wait()
+
+    start = time.monotonic()
+    with Deadline(0.1), pytest.raises(TimeoutException):
+        cache.get_or_load('key', slow_loader)
+    assert time.monotonic() - start < 0.5
+
+    leader.join()
+    assert cache.get_or_load('key', slow_loader) == 'value'
+
+
+def test_ledger_write_is_bounded_by_deadline(tmp_path):
+    path = os.path.join(tmp_path, 'ledger.db')
+    ledger = SQLiteLedger(path)
+
+    # Another writer holding the database lock keeps the ledger's commit waiting.
+    blocker = sqlite3.connect(path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        start = time.monotonic()
+        with Deadline(0.1), pytest.raises(TimeoutException):
+            ledger.reserve('external-1')
+        assert time.monotonic() - start < 0.5
+    finally:
+        blocker.execute("ROLLBACK")
+        blocker.close()
+
+    reference_id, status = ledger.reserve('external-1')
+    assert status == SQLiteLedger.RESERVED
+    ledger.close()
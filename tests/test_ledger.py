@@ -0,0 +1,106 @@
+import gc
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from raapimtnmomo.config import MTNMoMoConfig
+from raapimtnmomo.exceptions import ConflictException
+from raapimtnmomo.ledger import MemoryLedger, SQLiteLedger
+from raapimtnmomo.mtn_momo_collection import MTNMoMoCollection
+from raapimtnmomo.stub_server import StubHandler, StubServer
+
+REQUEST_TO_PAY = ('POST', '/v1_0/requesttopay')
+
+def params(external_id):
+    return {'amount': '10', 'referenceExternalID': external_id, 'numberMoMo': '46733123450',
+            'description': 'payment', 'note': 'note'}
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def ledger(request, tmp_path):
+    ledger = MemoryLedger() if request.param == 'memory' else SQLiteLedger(os.path.join(tmp_path, 'ledger.db'))
+    yield ledger
+    ledger.close()
+
+
+def test_reserve_is_idempotent_under_concurrency(ledger):
+    with ThreadPoolExecutor(max_workers=20) as executor:
+        entries = set(executor.map(lambda _: ledger.reserve('external-1'), range(100)))
+
+    assert len(entries) == 1
+    reference_id, status = entries.pop()
+    assert status == ledger.RESERVED
+    assert ledger.get_by_reference(reference_id) == ('external-1', ledger.RESERVED)
+
+    ledger.update('external-1', ledger.PENDING)
+    assert ledger.reserve('external-1') == (reference_id, ledger.PENDING)
+
+
+def test_concurrent_writes_are_group_committed(tmp_path):
+    path = os.path.join(tmp_path, 'ledger.db')
+    with SQLiteLedger(path) as ledger:
+        with ThreadPoolExecutor(max_workers=50) as executor:
+            references = list(executor.map(lambda i: ledger.reserve(f"external-{i}")[0], range(500)))
+        assert ledger.writes_committed == 500
+        assert ledger.commits < ledger.writes_committed
+
+    # Every write returned only once durable: a fresh ledger on the same file sees them all.
+    with SQLiteLedger(path) as ledger:
+        assert [ledger.get(f"external-{i}")[0] for i in range(500)] == references
+
+
+def test_reader_connections_are_closed_with_their_threads(tmp_path):
+    with SQLiteLedger(os.path.join(tmp_path, 'ledger.db')) as ledger:
+        ledger.reserve('external-1')
+        for _ in range(5):
+            with ThreadPoolExecutor(max_workers=10) as executor:
+                list(executor.map(lambda _: ledger.get('external-1'), range(50)))
+        gc.collect()
+        # Only the connection of the main thread, which reserved the entry, is left.
+        assert len(ledger.readers) == 1
+
+
+def test_reserved_reference_is_reused_when_the_creation_is_retried(ledger):
+    with StubServer() as server:
+        client = MTNMoMoCollection(MTNMoMoConfig(host=server.host, token_dir=tempfile.mkdtemp()), ledger=ledger)
+
+        # A crash after the reservation but before the request leaves the entry RESERVED.
+        reference_id, _ = ledger.reserve('external-1')
+        assert client.create_transaction(params('external-1'))['transactionId'] == reference_id
+        assert ledger.get('external-1') == (reference_id, ledger.PENDING)
+
+        # Once the provider accepted it, a retry is not sent again.
+        assert client.create_transaction(params('external-1'))['transactionId'] == reference_id
+        assert server.counts[REQUEST_TO_PAY] == 1
+
+
+class ConflictHandler(StubHandler):
+    """
+    Answers every request-to-pay with 409, as the provider does for a reference it already accepted.
+    """
+
+    def do_POST(self):
+        if self.path.endswith('/requesttopay'):
+            self.read_body()
+            self.server.count(self.command, '/v1_0/requesttopay')
+            self.send_json(409, {'code': 'RESOURCE_ALREADY_EXIST', 'message': 'Duplicated reference id'})
+        else:
+            super().do_POST()
+
+
+def test_conflict_for_a_reserved_reference_is_an_earlier_acceptance(ledger):
+    with StubServer(handler=ConflictHandler) as server:
+        client = MTNMoMoCollection(MTNMoMoConfig(host=server.host, token_dir=tempfile.mkdtemp()), ledger=ledger)
+
+        reference_id = client.create_transaction(params('external-1'))['transactionId']
+
+        assert ledger.get('external-1') == (reference_id, ledger.PENDING)
+
+
+def test_conflict_without_a_ledger_is_an_error():
+    with StubServer(handler=ConflictHandler) as server:
+        client = MTNMoMoCollection(MTNMoMoConfig(host=server.host, token_dir=tempfile.mkdtemp()))
+
+        with pytest.raises(ConflictException):
+            client.create_transaction(params('external-1'))
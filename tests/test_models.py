@@ -0,0 +1,57 @@
+import json
+import sys
+import threading
+import pytest
+from raapimtnmomo.models import Transaction
+
+BODY = json.dumps({
+    'amount': '100', 'currency': 'EUR', 'financialTransactionId': '123', 'externalId': 'ext-1',
+    'payer': {'partyIdType': 'MSISDN', 'partyId': '46733123450'}, 'payerMessage': 'message',
+    'payeeNote': 'note', 'status': 'FAILED', 'reason': 'PAYER_NOT_FOUND'
+}).encode()
+
+
+def test_lazy_model_reads_like_the_response_dictionary():
+    transaction = Transaction(BODY)
+
+    assert transaction.get('status') == 'FAILED'
+    assert transaction['externalId'] == transaction.external_id == 'ext-1'
+    assert transaction.party_id == '46733123450'
+    assert transaction.get('unknown', 'default') == 'default'
+    with pytest.raises(AttributeError):
+        transaction.unknown
+
+
+@pytest.fixture
+def frequent_switches():
+    # Switching threads every microsecond makes them interleave inside a parse.
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_shared_model_is_parsed_once_across_threads(frequent_switches):
+    threads, iterations = 8, 2000
+    models = [Transaction(BODY) for _ in range(iterations)]
+    barrier = threading.Barrier(threads)
+    errors = []
+
+    def read(attribute):
+        barrier.wait()
+        for model in models:
+            try:
+                assert getattr(model, attribute) is not None
+            except Exception as e:
+                errors.append(e)
+
+    # Every thread reads a different field first, so they race on the parse of the same models.
+    attributes = ['reason', 'status', 'amount', 'external_id', 'currency', 'payer_id', 'payee_note', 'financial_transaction_id']
+    workers = [threading.Thread(target=read, args=(attribute,)) for attribute in attributes[:threads]]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert errors == []
+    assert all(model.to_dict() == models[0].to_dict() for model in models)
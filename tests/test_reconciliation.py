@@ -0,0 +1,123 @@
+import json
+import os
+import threading
+import requests
+from raapimtnmomo.exceptions import BadRequestException, InternalServerErrorException, NotFoundException
+from raapimtnmomo.models import Transaction
+from raapimtnmomo.reconciliation import Discrepancy, Reconciler
+
+class Collection:
+    """
+    Answers get_transaction from a script per reference: transactions, or exceptions to raise.
+    The last outcome of a script repeats.
+    """
+
+    def __init__(self, scripts):
+        self.scripts = scripts
+        self.calls = {reference_id: 0 for reference_id in scripts}
+        self.lock = threading.Lock()
+
+    def get_transaction(self, x_reference_id):
+        with self.lock:
+            script = self.scripts[x_reference_id]
+            outcome = script[min(self.calls[x_reference_id], len(script) - 1)]
+            self.calls[x_reference_id] += 1
+        if isinstance(outcome, Exception):
+            raise outcome
+        return Transaction.from_dict(outcome)
+
+
+def record(reference_id, status='SUCCESSFUL', amount='10'):
+    return {'referenceId': reference_id, 'status': status, 'amount': amount}
+
+
+def transaction(status='SUCCESSFUL', amount='10'):
+    return [{'status': status, 'amount': amount}]
+
+
+def kinds(discrepancies):
+    return {d.record['referenceId']: d.kind for d in discrepancies}
+
+
+def test_differences_are_reported_by_kind():
+    collection = Collection({
+        'ref-ok': transaction(amount='10.00'),
+        'ref-status': transaction(status='FAILED'),
+        'ref-amount': transaction(amount='12'),
+        'ref-missing': [NotFoundException("Not found")],
+        'ref-error': [BadRequestException("Bad request")],
+    })
+    reconciler = Reconciler(collection, concurrency=3)
+
+    result = kinds(reconciler.run(record(reference_id) for reference_id in collection.scripts))
+
+    assert result == {'ref-status': Discrepancy.STATUS_MISMATCH, 'ref-amount': Discrepancy.AMOUNT_MISMATCH,
+                      'ref-missing': Discrepancy.MISSING, 'ref-error': Discrepancy.ERROR}
+    assert reconciler.checked == 5 and reconciler.discrepancies == 4 and reconciler.unreachable == 0
+    assert collection.calls['ref-error'] == 1
+
+
+def test_transient_errors_are_retried():
+    collection = Collection({'ref-1': [requests.ConnectionError("reset"), InternalServerErrorException("500"),
+                                       transaction()[0]]})
+    reconciler = Reconciler(collection, retries=3, retry_delay=0.001)
+
+    assert list(reconciler.run([record('ref-1')])) == []
+    assert collection.calls['ref-1'] == 3
+    assert reconciler.discrepancies == 0 and reconciler.unreachable == 0
+
+
+def test_persistent_transient_errors_are_not_counted_as_discrepancies():
+    collection = Collection({'ref-1': [requests.Timeout("timed out")], 'ref-2': transaction(status='FAILED')})
+    reconciler = Reconciler(collection, retries=2, retry_delay=0.001)
+
+    result = kinds(reconciler.run([record('ref-1'), record('ref-2')]))
+
+    assert result == {'ref-1': Discrepancy.UNREACHABLE, 'ref-2': Discrepancy.STATUS_MISMATCH}
+    assert collection.calls['ref-1'] == 3
+    assert reconciler.discrepancies == 1 and reconciler.unreachable == 1
+
+
+def test_checkpoint_resumes_after_processed_records(tmp_path):
+    path = os.path.join(tmp_path, 'checkpoint.json')
+    scripts = {f'ref-{i}': transaction(status='FAILED' if i % 2 else 'SUCCESSFUL') for i in range(10)}
+    records = [record(reference_id) for reference_id in scripts]
+
+    first = Reconciler(Collection(scripts), concurrency=1, checkpoint_path=path, checkpoint_every=2)
+    for discrepancy in first.run(records):
+        if discrepancy.record['referenceId'] == 'ref-5':
+            break
+    with open(path) as f:
+        assert json.load(f) == {'processed': 4}
+
+    collection = Collection(scripts)
+    second = Reconciler(collection, concurrency=4, checkpoint_path=path, checkpoint_every=2)
+
+    assert set(kinds(second.run(records))) == {'ref-5', 'ref-7', 'ref-9'}
+    assert {reference_id for reference_id, calls in collection.calls.items() if calls} == \
+        {f'ref-{i}' for i in range(4, 10)}
+    with open(path) as f:
+        assert json.load(f) == {'processed': 10}
+
+
+def test_checkpoint_does_not_pass_a_record_still_in_flight(tmp_path):
+    path = os.path.join(tmp_path, 'checkpoint.json')
+    scripts = {f'ref-{i}': transaction(status='FAILED' if i % 2 else 'SUCCESSFUL') for i in range(10)}
+    records = [record(reference_id) for reference_id in scripts]
+    release = threading.Event()
+
+    class SlowFirst(Collection):
+        def get_transaction(self, x_reference_id):
+            if x_reference_id == 'ref-0':
+                release.wait(5)
+            return super().get_transaction(x_reference_id)
+
+    first = Reconciler(SlowFirst(scripts), concurrency=4, checkpoint_path=path, checkpoint_every=2)
+    for discrepancy in first.run(records):
+        if discrepancy.record['referenceId'] == 'ref-5':
+            release.set()
+            break
+
+    # Records 1 to 5 were checked while record 0 was still in flight.
+    assert first.checked >= 3
+    assert not os.path.exists(path)
@@ -0,0 +1,66 @@
+import base64
+import os
+import tempfile
+from raapimtnmomo.config import MTNMoMoConfig
+from raapimtnmomo.mtn_momo_collection import MTNMoMoCollection
+from raapimtnmomo.recording import RecordingTransport, Replayer, read_recording
+from raapimtnmomo.requestss import Transport
+from raapimtnmomo.stub_server import StubServer
+
+MSISDN = '22997000111'
+CALLBACK_SECRET = 'callback-s3cret'
+
+def test_recording_contains_no_secrets_or_personal_data(tmp_path):
+    path = os.path.join(tmp_path, 'traffic.jsonl')
+
+    with StubServer() as server, Transport() as transport:
+        config = MTNMoMoConfig(host=server.host, token_dir=tempfile.mkdtemp())
+        recorder = RecordingTransport(path, transport)
+        client = MTNMoMoCollection(config, transport=recorder)
+
+        reference_id = client.create_transaction({
+            'amount': '10', 'referenceExternalID': 'ext-1', 'numberMoMo': MSISDN, 'description': 'payment',
+            'note': 'note', 'callbackUrl': f"https://example.com/momo?token={CALLBACK_SECRET}"
+        })['transactionId']
+        client.get_transaction(reference_id)
+        client.get_basic_user_info(MSISDN)
+        # Header names sent in another case are redacted too.
+        recorder.get(f"{server.host}collection/v1_0/account/balance",
+                     {'authorization': 'Bearer lower-case-token', 'ocp-apim-subscription-key': 'lower-case-key'})
+        recorder.close()
+
+    with open(path) as f:
+        log = f.read()
+
+    user_id = config.retrieve_value('collection', 'userId')
+    api_key_secret = config.retrieve_value('collection', 'ApiKeySecret')
+    secrets = [
+        config.retrieve_value('collection', 'PrimaryKey'), api_key_secret,
+        base64.b64encode(f"{user_id}:{api_key_secret}".encode()).decode(), 'stub-token',
+        'lower-case-token', 'lower-case-key', CALLBACK_SECRET,
+        MSISDN, 'Sand', 'Box'
+    ]
+    assert [secret for secret in secrets if secret in log] == []
+
+    entries = list(read_recording(path))
+    assert len(entries) == 5
+    assert any('/accountholder/MSISDN/<redacted>/basicuserinfo' in entry['path'] for entry in entries)
+
+
+def test_redacted_recording_replays(tmp_path):
+    path = os.path.join(tmp_path, 'traffic.jsonl')
+
+    with StubServer() as server, Transport() as transport:
+        recorder = RecordingTransport(path, transport)
+        client = MTNMoMoCollection(MTNMoMoConfig(host=server.host, token_dir=tempfile.mkdtemp()), transport=recorder)
+        reference_id = client.create_transaction({'amount': '10', 'referenceExternalID': 'ext-1', 'numberMoMo': MSISDN,
+                                                  'description': 'payment', 'note': 'note'})['transactionId']
+        client.get_transaction(reference_id)
+        client.get_basic_user_info(MSISDN)
+        recorder.close()
+
+        client = MTNMoMoCollection(MTNMoMoConfig(host=server.host, token_dir=tempfile.mkdtemp()), transport=transport)
+        report = Replayer(client, speed=100).run(read_recording(path))
+
+    assert report['replayed'] == 3
+    assert report['total']['errors'] == 0
@@ -0,0 +1,137 @@
+import time
+import pytest
+import requests
+from raapimtnmomo.deadline import Deadline
+from raapimtnmomo.exceptions import CircuitOpenException, TimeoutException
+from raapimtnmomo.requestss import BaseTransport
+from raapimtnmomo.resilience import CircuitBreaker, HedgingTransport, ResilientTransport, RetryPolicy
+
+URL = 'http://momo.test/collection/v1_0/account/balance'
+
+def response(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = b'{}'
+    return response
+
+
+class ScriptedTransport(BaseTransport):
+    """
+    Answers each request with the next outcome of a script: a status code, or an exception to raise.
+    """
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.sent = 0
+        self.closed = False
+
+    def send(self, method, url, headers, body=None):
+        self.sent += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return response(outcome)
+
+    def close(self):
+        self.closed = True
+
+
+def resilient(transport, breaker):
+    return ResilientTransport(transport, retry=RetryPolicy(max_attempts=1), breaker=breaker)
+
+
+def test_breaker_opens_then_half_opens_then_closes():
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.05)
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(CircuitOpenException):
+        breaker.allow()
+
+    time.sleep(0.06)
+    breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # A single trial at a time.
+    with pytest.raises(CircuitOpenException):
+        breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.allow()
+
+
+def test_failed_trial_reopens_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    breaker.allow()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenException):
+        breaker.allow()
+
+
+def test_trial_failing_with_an_expired_deadline_does_not_wedge_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+    transport = ScriptedTransport(requests.ConnectionError(), TimeoutException('Deadline exceeded'), 200)
+    client = resilient(transport, breaker)
+
+    with pytest.raises(requests.ConnectionError):
+        client.get(URL, {})
+    assert breaker.state == CircuitBreaker.OPEN
+
+    time.sleep(0.06)
+    with pytest.raises(TimeoutException):
+        client.get(URL, {})
+    assert not breaker.trial_in_flight
+
+    assert client.get(URL, {})[0] == 200
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_trial_failing_with_an_unexpected_error_reopens_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+    transport = ScriptedTransport(requests.ConnectionError(), ValueError('bad response'), 200)
+    client = resilient(transport, breaker)
+
+    with pytest.raises(requests.ConnectionError):
+        client.get(URL, {})
+    time.sleep(0.06)
+    with pytest.raises(ValueError):
+        client.get(URL, {})
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.trial_in_flight
+
+    time.sleep(0.06)
+    assert client.get(URL, {})[0] == 200
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_deadline_expired_before_sending_releases_the_trial():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.0)
+    breaker.record_failure()
+
+    class DeadlineTransport(ScriptedTransport):
+        def send(self, method, url, headers, body=None):
+            deadline = Deadline.current()
+            if deadline is not None:
+                deadline.check()
+            return super().send(method, url, headers, body)
+
+    client = resilient(DeadlineTransport(200), breaker)
+    with Deadline(0.0), pytest.raises(TimeoutException):
+        client.get(URL, {})
+
+    assert client.get(URL, {})[0] == 200
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.parametrize('wrapper', [ResilientTransport, HedgingTransport])
+def test_closing_a_wrapper_leaves_the_wrapped_transport_open(wrapper):
+    transport = ScriptedTransport()
+    wrapper(transport).close()
+    assert not transport.closed
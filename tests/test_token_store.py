@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+import stat
+import tempfile
+import threading
+import time
+import pytest
+from raapimtnmomo.benchmark import _token_worker
+from raapimtnmomo.stub_server import StubHandler, StubServer
+from raapimtnmomo.token_store import FileTokenStore, default_token_directory
+
+posix_only = pytest.mark.skipif(not hasattr(os, 'getuid'), reason='per-user directories rely on POSIX ownership')
+
+@pytest.fixture
+def tempdir(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    return tmp_path
+
+
+@posix_only
+def test_default_directory_is_private_to_the_user(tempdir):
+    store = FileTokenStore()
+
+    st = os.stat(store.directory)
+    assert store.directory == os.path.join(tempdir, f'raapimtnmomo-{os.getuid()}')
+    assert st.st_uid == os.getuid()
+    assert stat.S_IMODE(st.st_mode) == 0o700
+
+
+@posix_only
+def test_default_directory_permissions_are_tightened(tempdir):
+    directory = os.path.join(tempdir, f'raapimtnmomo-{os.getuid()}')
+    os.mkdir(directory)
+    os.chmod(directory, 0o777)
+
+    default_token_directory()
+
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+
+
+@posix_only
+def test_default_directory_planted_as_symlink_is_rejected(tempdir):
+    target = os.path.join(tempdir, 'elsewhere')
+    os.mkdir(target)
+    os.symlink(target, os.path.join(tempdir, f'raapimtnmomo-{os.getuid()}'))
+
+    with pytest.raises(PermissionError):
+        default_token_directory()
+
+
+@pytest.mark.skipif(not hasattr(os, 'getuid') or os.getuid() != 0, reason='changing ownership requires root')
+def test_default_directory_owned_by_another_user_is_rejected(tempdir):
+    directory = os.path.join(tempdir, f'raapimtnmomo-{os.getuid()}')
+    os.mkdir(directory, 0o700)
+    os.chown(directory, 12345, 12345)
+
+    with pytest.raises(PermissionError):
+        default_token_directory()
+
+
+class FetchRecordingHandler(StubHandler):
+    token_expires_in = 1
+    fetches = []
+    lock = threading.Lock()
+
+    def do_POST(self):
+        if self.path.endswith('/token/'):
+            with self.lock:
+                self.fetches.append(time.monotonic())
+        super().do_POST()
+
+
+def test_processes_sharing_a_store_fetch_exactly_one_token_per_window(tmp_path):
+    expires_in = FetchRecordingHandler.token_expires_in
+    FetchRecordingHandler.fetches = []
+
+    with StubServer(handler=FetchRecordingHandler) as server:
+        workers = [multiprocessing.Process(target=_token_worker, args=(server.host, str(tmp_path), 3.5)) for _ in range(6)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert all(worker.exitcode == 0 for worker in workers)
+
+    fetches = sorted(FetchRecordingHandler.fetches)
+    gaps = [later - earlier for earlier, later in zip(fetches, fetches[1:])]
+
+    # Workers refresh only once the token expired: a second fetch within one token lifetime
+    # means two processes fetched for the same window, and a longer gap that a window was skipped.
+    assert len(fetches) >= 3
+    assert all(gap >= expires_in * 0.99 for gap in gaps), gaps
+    assert all(gap < expires_in * 1.5 for gap in gaps), gaps
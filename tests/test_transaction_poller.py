@@ -0,0 +1,99 @@
+import logging
+import threading
+import pytest
+import requests
+from raapimtnmomo.exceptions import NotFoundException
+from raapimtnmomo.models import Transaction
+from raapimtnmomo.transaction_poller import TransactionPoller
+
+class Collection:
+    """
+    Answers get_transaction from a script per reference: statuses, or exceptions to raise.
+    The last outcome of a script repeats.
+    """
+
+    def __init__(self, scripts):
+        self.scripts = scripts
+        self.calls = {reference_id: 0 for reference_id in scripts}
+        self.lock = threading.Lock()
+
+    def get_transaction(self, x_reference_id):
+        with self.lock:
+            script = self.scripts[x_reference_id]
+            outcome = script[min(self.calls[x_reference_id], len(script) - 1)]
+            self.calls[x_reference_id] += 1
+        if isinstance(outcome, Exception):
+            raise outcome
+        return Transaction.from_dict({'status': outcome, 'externalId': x_reference_id})
+
+
+def poller(collection, **kwargs):
+    return TransactionPoller(collection, initial_delay=0.001, max_delay=0.005, jitter=0.0, **kwargs)
+
+
+def test_pending_transactions_resolve_after_backoff():
+    collection = Collection({'ref-1': ['PENDING', 'PENDING', 'SUCCESSFUL'], 'ref-2': ['FAILED']})
+
+    with poller(collection) as p:
+        p.track('ref-1')
+        p.track('ref-2')
+        results = dict(p.results(timeout=2))
+
+    assert {reference_id: transaction.status for reference_id, transaction in results.items()} == \
+        {'ref-1': 'SUCCESSFUL', 'ref-2': 'FAILED'}
+    assert collection.calls == {'ref-1': 3, 'ref-2': 1}
+    assert p.stats()['resolved'] == 2
+
+
+def test_unknown_transaction_is_given_up_on_at_once():
+    collection = Collection({'ref-1': [NotFoundException("Not found")]})
+
+    with poller(collection) as p:
+        p.track('ref-1')
+        results = list(p.results(timeout=2))
+
+    assert len(results) == 1 and isinstance(results[0][1], NotFoundException)
+    assert collection.calls['ref-1'] == 1
+    assert p.stats()['abandoned'] == 1 and p.pending() == 0
+
+
+def test_transient_errors_are_retried_up_to_max_errors():
+    collection = Collection({
+        'flaky': [requests.ConnectionError(), requests.ConnectionError(), 'SUCCESSFUL'],
+        'down': [requests.ConnectionError()]
+    })
+
+    with poller(collection, max_errors=3) as p:
+        p.track('flaky')
+        p.track('down')
+        results = dict(p.results(timeout=2))
+
+    assert results['flaky'].status == 'SUCCESSFUL'
+    assert isinstance(results['down'], requests.ConnectionError)
+    assert collection.calls['down'] == 3
+    assert p.stats()['errors'] == 5
+
+
+def test_callback_exceptions_are_logged(caplog):
+    collection = Collection({'ref-1': ['SUCCESSFUL']})
+    delivered = threading.Event()
+
+    def callback(x_reference_id, transaction):
+        delivered.set()
+        raise ValueError("handler bug")
+
+    with caplog.at_level(logging.ERROR, logger='raapimtnmomo.transaction_poller'):
+        with poller(collection) as p:
+            p.track('ref-1', callback)
+            assert delivered.wait(2)
+        assert p.stats()['callback_errors'] == 1
+
+    assert 'ref-1' in caplog.text and 'handler bug' in caplog.text
+
+
+def test_results_without_starting_the_poller_raises():
+    p = poller(Collection({'ref-1': ['SUCCESSFUL']}))
+    p.track('ref-1')
+
+    with pytest.raises(RuntimeError):
+        next(p.results())